@@ -1,56 +1,196 @@
+import asyncio
+import hashlib
 import json
+import os
+import time
 import uvicorn
 import uuid
 import redis
+from contextlib import AsyncExitStack
+from typing import Optional
 from fastapi import FastAPI, Request
-from src.cache.redis_cache import delete_from_redis, flush_redis_cache, get_state_from_redis, save_state_to_redis
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from src.cache.llm_cache import TieredLLMCache
+from src.cache.state_store import StateStore
+from src.cache.task_lock import StaleLeaseError, TaskBusyError, TaskLease, TaskLock
 from src.graph.graph_builder import GraphBuilder
-from src.llm.groq_llm import GroqLLM
-from src.state.sdlc_state import StartWorkflowRequest, StartWorkflowResponse
+from src.jobs.job_runner import JobRunner
+from src.jobs.run_registry import RunCancelledError, RunRegistry
+from src.jobs.speculation import SpeculativeExecutor
+from src.llm.resilient_llm import ResilientChatModel
+from src.llm.router_llm import RouterLLM, llm_step
+from src.metrics.workflow_metrics import RuntimeCollector, WorkflowMetrics
+from src.state.sdlc_state import (
+    BatchItemResult, BatchRequirementsRequest, BatchResponse, BatchReviewRequest, BatchStartRequest,
+    StartWorkflowRequest, StartWorkflowResponse
+)
+from src.streaming.sse import SSE_HEADERS, format_sse, stream_graph_events
 
 app = FastAPI()
 
 # Initialize the LLM and GraphBuilder instances once and store them in the app state
 @app.on_event("startup")
 async def startup_event():
-    llm = GroqLLM().get_llm()
+    llm_cache = TieredLLMCache()
+    # Spreads the LLM calls over every configured provider and API key,
+    # with per-step deadlines, retries and hedged requests on top. The cache sits on the
+    # outside so hits skip rate limiting; its key covers every backend's model and params
+    llm = ResilientChatModel(model=RouterLLM().get_llm(), cache=llm_cache)
     graph_builder = GraphBuilder(llm=llm)
     graph = graph_builder.setup_graph()
     app.state.llm = llm
+    app.state.llm_cache = llm_cache
     app.state.graph = graph
+    app.state.test_sandbox = graph_builder.design_node.test_sandbox
+    app.state.state_store = StateStore()
+    app.state.task_lock = TaskLock(app.state.state_store.client)
+    app.state.job_runner = JobRunner(app.state.state_store)
+    app.state.run_registry = RunRegistry(app.state.state_store.client)
+    await app.state.job_runner.start()
+    app.state.metrics_collector = RuntimeCollector(llm, llm_cache, app.state.job_runner)
+    REGISTRY.register(app.state.metrics_collector)
+    # Opt-in: run the next stage while a task waits for a review
+    app.state.speculator = None
+    if os.getenv("SPECULATIVE_EXECUTION", "0") == "1":
+        app.state.speculator = SpeculativeExecutor(graph, graph_builder.speculation_targets(), app.state.state_store)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    REGISTRY.unregister(app.state.metrics_collector)
+    await app.state.job_runner.stop()
+    if app.state.speculator is not None:
+        await app.state.speculator.stop()
+    await app.state.state_store.close()
+    app.state.test_sandbox.shutdown()
+
+@app.exception_handler(TaskBusyError)
+async def task_busy_handler(request: Request, exc: TaskBusyError):
+    return JSONResponse(status_code=409, content={"task_id": exc.task_id, "detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(StaleLeaseError)
+async def stale_lease_handler(request: Request, exc: StaleLeaseError):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(RunCancelledError)
+async def run_cancelled_handler(request: Request, exc: RunCancelledError):
+    return JSONResponse(status_code=409, content={"task_id": exc.task_id, "detail": str(exc)})
 
 @app.post("/sdlc/workflow/start", response_model=StartWorkflowResponse)
 async def start_workflow(request: StartWorkflowRequest):
     """
         starts the workflow of the SDLC 
     """
-    flush_redis_cache()
+    task_id, state = await start_task(request.project_name)
+    await app.state.state_store.save(task_id, state)
+
+    response = StartWorkflowResponse(
+        task_id=task_id,
+        status=state['status'],
+        next_required_input=state['next_required_input'],
+        progress=state['progress'],
+        current_node=state['current_node']
+    )
+    return response
     
+
+async def start_task(project_name: str) -> tuple[str, dict]:
+    """
+        Creates a task and runs its graph to the first interrupt.
+        Returns the task id and the state values; the caller saves them.
+    """
     # Generate a unique task id
     task_id = f"sdlc-task-{uuid.uuid4().hex[:8]}"
 
     # Get the graph instance from the app state
     graph = app.state.graph
 
-    # result = graph.invoke({'project_name': request.project_name})
+    # result = graph.invoke({'project_name': project_name})
     thread = {"configurable": {"thread_id": task_id}}
-    for event in graph.stream({'project_name': request.project_name}, thread, stream_mode="values"):
+    metrics = WorkflowMetrics()
+    async for event in graph.astream({'project_name': project_name}, run_config(thread, metrics), stream_mode="values"):
         print(event)
 
-    current_state = graph.get_state(thread)
+    await record_timings(task_id, metrics)
+    return task_id, (await graph.aget_state(thread)).values
 
-    save_state_to_redis(task_id, current_state)
 
-    state = current_state[0]
-    response = StartWorkflowResponse(
-        task_id=task_id,
-        status=state['status'],
-        next_required_input=state['next_required_input'],
-        progress=state['progress'],
-        current_node=state['current_node']
-    )
-    return response
-    
+def run_config(thread: dict, metrics: WorkflowMetrics) -> dict:
+    """
+        The config of a graph run on the thread, with the callback recording its metrics
+    """
+    return {**thread, "callbacks": [metrics]}
+
+
+async def record_timings(task_id: str, metrics: WorkflowMetrics):
+    """
+        Adds the node and LLM call timings of a run to the task's summary
+    """
+    try:
+        await app.state.state_store.add_timings(task_id, metrics.counters())
+    except Exception as e:
+        print(f"Could not record the timings of {task_id}: {e}")
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+        Prometheus metrics: node and LLM call latencies, tokens, cost, cache hits,
+        retries and queue waits of this worker process
+    """
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/sdlc/llm/metrics")
+async def llm_metrics():
+    """
+        LLM call counters per step (retries, timeouts, hedges and which request won)
+        and the state of the router backends
+    """
+    llm = app.state.llm
+    return {
+        "calls": llm.metrics() if hasattr(llm, "metrics") else {},
+        "backends": llm.model.status() if hasattr(getattr(llm, "model", None), "status") else [],
+    }
+
+
+@app.get("/sdlc/workflow/{task_id}/timings")
+async def get_workflow_timings(task_id: str):
+    """
+        Returns the time, LLM calls and tokens the task spent per graph node and LLM step
+    """
+    if not await app.state.state_store.exists(task_id):
+        return JSONResponse(status_code=404, content={"task_id": task_id, "detail": "Unknown task"})
+    return {"task_id": task_id, **await app.state.state_store.get_timings(task_id)}
+
+
+@app.delete("/sdlc/workflow/{task_id}/run")
+async def cancel_workflow_run(task_id: str):
+    """
+        Cancels the work in progress on a task: a queued background job is dropped, a
+        running stage is stopped wherever it runs, a speculative run is discarded.
+        The task keeps the state of its last completed node and can be resumed.
+    """
+    queued = app.state.job_runner.cancel_queued(task_id)
+    running = await app.state.run_registry.cancel(task_id)
+    speculator = getattr(app.state, "speculator", None)
+    speculating = await speculator.discard(task_id) if speculator is not None else False
+    if not (queued or running or speculating):
+        return JSONResponse(status_code=404, content={"task_id": task_id, "detail": "No run in progress"})
+    return JSONResponse(status_code=202, content={"task_id": task_id, "status": "cancelling"})
+
+
+@app.get("/sdlc/workflow/{task_id}")
+async def get_workflow_status(task_id: str):
+    """
+        Returns the status, current node and progress of a task
+    """
+    status = await app.state.state_store.get_status(task_id)
+    if status is None:
+        return JSONResponse(status_code=404, content={"task_id": task_id, "detail": "Unknown task"})
+    return {"task_id": task_id, **status}
+
 
 @app.post("/sdlc/workflow/{task_id}/requirements")
 async def get_project_requirements(task_id: str, request: Request):
@@ -60,32 +200,193 @@ async def get_project_requirements(task_id: str, request: Request):
     data = await request.json()
     task = data.get('task', '')
 
-     # Get the graph instance from the app state
-    graph = app.state.graph
+    async def process_requirements(client: Optional[Request] = None):
+        return await run_requirements(task_id, task, client)
 
-     # TODO:: we can do in much better way.
-    requirements = split_task_to_requirements(task_statement=task)
-    #requirements = data.get('requirements', '')
+    async def respond():
+        if wants_async(request):
+            if not await app.state.state_store.exists(task_id):
+                return JSONResponse(status_code=404, content={"task_id": task_id, "detail": "Unknown task"})
+            return await enqueue_job(task_id, process_requirements)
 
-    saved_state = get_state_from_redis(task_id)
-    if saved_state:
-        saved_state['requirements'] = requirements
+        # The run is cancelled if the client goes away before the answer
+        state = await process_requirements(request)
+        return {"task_id": task_id, "data": state} if state is not None else {"task_id": task_id}
+
+    return await idempotent(task_id, request, respond)
+
+
+async def idempotent(task_id: str, request: Request, respond) -> Response:
+    """
+        Runs `respond` once per `Idempotency-Key` header: the response is stored and
+        replayed for retries of the same request, a duplicate arriving while the first
+        one still runs gets 409. Requests without the header always run.
+    """
+    key = request.headers.get("Idempotency-Key")
+    if not key:
+        return await respond()
+
+    state_store = app.state.state_store
+    # The query string selects the mode (`async_mode`), so it is part of the request
+    fingerprint = hashlib.sha256(
+        request.url.path.encode() + b"?" + request.url.query.encode() + b"\n" + await request.body()
+    ).hexdigest()
+    earlier = await state_store.claim_idempotency_key(task_id, key, fingerprint)
+    if earlier is not None:
+        if earlier["fingerprint"] != fingerprint:
+            return JSONResponse(status_code=422, content={"task_id": task_id, "detail": "Idempotency-Key was already used for a different request"})
+        if earlier["status"] == "processing":
+            return JSONResponse(status_code=409, content={"task_id": task_id, "detail": "A request with this Idempotency-Key is in progress"}, headers={"Retry-After": "1"})
+        return JSONResponse(status_code=earlier["status_code"], content=earlier["body"], headers={"Idempotent-Replayed": "true"})
+
+    try:
+        response = await respond()
+    except BaseException:
+        await state_store.release_idempotency_key(task_id, key)
+        raise
+    if not isinstance(response, Response):
+        response = JSONResponse(content=jsonable_encoder(response))
+
+    # Conflicts and server errors are worth retrying, everything else is replayed
+    if response.status_code == 409 or response.status_code >= 500:
+        await state_store.release_idempotency_key(task_id, key)
+    else:
+        await state_store.save_idempotent_response(task_id, key, fingerprint, response.status_code, json.loads(response.body))
+    return response
+
+
+async def run_requirements(task_id: str, task: str, client: Optional[Request] = None) -> Optional[dict]:
+    """
+        Records the requirements and resumes the graph under the task lease.
+        Returns the state, or None when the task is unknown. The run stops when it
+        is cancelled or `client` disconnects.
+    """
+    async with app.state.task_lock.hold(task_id) as lease, app.state.run_registry.track(task_id, lease, client):
+        thread = await update_requirements(task_id, task, lease)
+        if thread is None:
+            return None
+
+        # Resume the graph, saving the state before asking the product owner for review
+        return await resume_workflow(task_id, thread, lease, label="Requirements")
+
+
+def wants_async(request: Request) -> bool:
+    """
+        Whether the client opted in to background execution (`?async_mode=true`)
+    """
+    return request.query_params.get("async_mode", "").lower() in ("1", "true", "yes")
 
-    # update the graph with thread
-    thread = {"configurable": {"thread_id": task_id}} 
-    graph.update_state(thread, saved_state, as_node="get_requirements")
 
-     # Resume the graph
+async def enqueue_job(task_id: str, job):
+    """
+        Runs the job on the background worker pool and answers 202 right away
+    """
+    if not await app.state.job_runner.submit(task_id, job):
+        return JSONResponse(status_code=409, content={"task_id": task_id, "detail": "A job is already running for this task"})
+    return JSONResponse(status_code=202, content={"task_id": task_id, "job_status": "queued", "status_url": f"/sdlc/workflow/{task_id}"})
+
+
+async def resume_workflow(task_id: str, thread: dict, lease: TaskLease, label: str = "") -> dict:
+    """
+        Resumes the graph until the next interrupt and saves the fields the nodes wrote.
+        The save is fenced by the task lease.
+    """
+    graph = app.state.graph
     state = None
-    async for event in graph.astream(None, thread, stream_mode="values"):
-        print(f"Event Received: {event}")
-        state = event
+    changed = set()
+    metrics = WorkflowMetrics()
+    try:
+        if not await waiting_for_review(thread):
+            async for mode, event in graph.astream(None, run_config(thread, metrics), stream_mode=["updates", "values"]):
+                if mode == "updates":
+                    changed.update(updated_fields(event))
+                else:
+                    print(f"{label} Event Received: {event}")
+                    state = event
+    except asyncio.CancelledError:
+        await save_completed(task_id, thread, changed, lease)
+        await record_timings(task_id, metrics)
+        raise
+    await record_timings(task_id, metrics)
+
+    if state is None:
+        state = (await graph.aget_state(thread)).values
+    await app.state.state_store.save_fields(task_id, {field: state[field] for field in changed if field in state}, fencing_token=lease.token)
+    await schedule_speculation(task_id, thread)
+    return state
+
+
+async def save_completed(task_id: str, thread: dict, changed: set, lease: TaskLease):
+    """
+        Saves the fields written by the nodes that completed before the run was
+        cancelled. The cancelled node wrote nothing, so the checkpoint still holds
+        the state after the last completed node and the task resumes from there.
+    """
+    try:
+        state = (await app.state.graph.aget_state(thread)).values
+        await app.state.state_store.save_fields(task_id, {field: state[field] for field in changed if field in state}, fencing_token=lease.token)
+        print(f"Run of {task_id} cancelled, state saved at the last completed node")
+    except Exception as e:
+        print(f"Could not save the state of the cancelled run of {task_id}: {e}")
+
+
+async def waiting_for_review(thread: dict) -> bool:
+    """
+        Whether the thread already stopped at its next review interrupt, which happens
+        when a committed speculative result ran the stage after the approval.
+        Resuming it would run the review node without the reviewer's decision.
+    """
+    snapshot = await app.state.graph.aget_state(thread)
+    return bool(snapshot.next) and all(node in app.state.graph.interrupt_before_nodes for node in snapshot.next)
+
+
+async def schedule_speculation(task_id: str, thread: dict):
+    """
+        Starts the speculative run of the next stage when speculative execution is enabled
+    """
+    speculator = getattr(app.state, "speculator", None)
+    if speculator is None:
+        return
+    try:
+        await speculator.schedule(task_id, thread)
+    except Exception as e:
+        print(f"Speculation for {task_id} not started: {e}")
+
+
+def updated_fields(update: dict) -> set:
+    """
+        Names of the state fields written by the nodes of an `updates` stream event
+    """
+    fields = set()
+    for node_update in update.values():
+        if isinstance(node_update, dict):
+            fields.update(node_update.keys())
+    return fields
+
+
+async def update_requirements(task_id: str, task: str, lease: TaskLease) -> dict:
+    """
+        Splits the task into requirements and records them on the task's graph thread
+    """
+    graph = app.state.graph
 
-    # saving the state before asking the product owner for review
-    current_state = graph.get_state(thread)
-    save_state_to_redis(task_id, current_state)
+    # Unknown tasks must not cost an LLM call
+    if not await app.state.state_store.exists(task_id):
+        return None
 
-    return {"task_id": task_id, "data": state}
+     # TODO:: we can do in much better way.
+    metrics = WorkflowMetrics()
+    requirements = await split_task_to_requirements(task_statement=task, callbacks=[metrics])
+    #requirements = data.get('requirements', '')
+    await record_timings(task_id, metrics)
+
+    # update the graph with thread, only the requirements change
+    thread = {"configurable": {"thread_id": task_id}} 
+    update = {'requirements': requirements}
+    await app.state.task_lock.check(lease)
+    await graph.aupdate_state(thread, update, as_node="get_requirements")
+    await app.state.state_store.save_fields(task_id, update, fencing_token=lease.token)
+    return thread
 
 
 @app.post("/sdlc/workflow/{task_id}/product_owner_review")
@@ -154,12 +455,13 @@ async def qa_testing_review(task_id: str, request: Request):
         review_type='qa'
     )
 
-def split_task_to_requirements(task_statement: str) -> list[str]:
+async def split_task_to_requirements(task_statement: str, callbacks: Optional[list] = None) -> list[str]:
         """
         Extracts clear and concise requirements from a given task statement.
 
         Args:
             task_statement (str): The input task statement.
+            callbacks (list, optional): Callbacks of the LLM call.
 
         Returns:
             list[str]: A list of extracted requirements as strings.
@@ -185,7 +487,7 @@ def split_task_to_requirements(task_statement: str) -> list[str]:
         system_message = prompt
         try:
             # Invoke the LLM to process the prompt
-            response = app.state.llm.invoke(system_message)
+            response = await app.state.llm.ainvoke(system_message, config={**llm_step("split_task_to_requirements"), "callbacks": callbacks or []})
             # Split the response into individual requirements
             requirements = [line.strip() for line in response.content.splitlines() if line.strip()]
             return requirements
@@ -207,55 +509,275 @@ async def generic_workflow_review(
     review_status = data.get('review_status', '')
     feedback_reason = data.get('feedback_reason', '')
 
-    # Get the graph instance from the app state
-    graph = app.state.graph
+    async def process_review(client: Optional[Request] = None):
+        return await run_review(task_id, review_type, review_status, feedback_reason, client)
+
+    async def respond():
+        if wants_async(request):
+            if not await app.state.state_store.exists(task_id):
+                return JSONResponse(status_code=404, content={"task_id": task_id, "detail": "Unknown task"})
+            return await enqueue_job(task_id, process_review)
 
-    # Fetch the saved state from the redis cache
-    saved_state = get_state_from_redis(task_id)
-    if saved_state:
-        # Dynamically update state based on review type
-        if review_type == 'product_owner':
-            saved_state['product_decision'] = review_status
-            saved_state['feedback_reason'] = feedback_reason
-            node_name = "product_owner_review_decision"
-        elif review_type == 'design':
-            saved_state['design_documents']['review_status'] = review_status
-            saved_state['design_documents']['feedback_reason'] = feedback_reason
-            node_name = "design_review"
-        elif review_type == 'code':
-            saved_state['code_review_status'] = review_status
-            saved_state['code_review_feedback'] = feedback_reason
-            node_name = "code_review"
-        elif review_type == 'security':
-            saved_state['security_review_status'] = review_status
-            saved_state['security_review_feedback'] = feedback_reason
-            node_name = "security_review"
-        elif review_type == "testcase":
-            saved_state['test_case_review_status'] = review_status
-            saved_state['test_case_review_feedback'] = feedback_reason
-            node_name = "test_cases_review"
-        elif review_type == "qa":
-            saved_state['qa_testing_status'] = review_status
-            saved_state['qa_testing_feedback'] = feedback_reason
-            node_name = "qa_testing_review"
+        # The run is cancelled if the client goes away before the answer
+        state = await process_review(request)
+        return {"task_id": task_id, "data": state} if state is not None else {"task_id": task_id}
+
+    return await idempotent(task_id, request, respond)
+
+async def run_review(task_id: str, review_type: str, review_status: str, feedback_reason: str, client: Optional[Request] = None) -> Optional[dict]:
+    """
+        Records the review and resumes the graph under the task lease.
+        Returns the state, or None when the task is unknown. The run stops when it
+        is cancelled or `client` disconnects.
+    """
+    async with app.state.task_lock.hold(task_id) as lease, app.state.run_registry.track(task_id, lease, client):
+        thread = await apply_review(task_id, review_type, review_status, feedback_reason, lease)
+        if thread is None:
+            return None
+        # Resume the graph stream and save the state
+        return await resume_workflow(task_id, thread, lease, label=f"{review_type.capitalize()} Review")
+
+async def apply_review(task_id: str, review_type: str, review_status: str, feedback_reason: str, lease: TaskLease):
+    """
+        Records the review decision on the task's graph thread, under the task lease.
+        Returns the thread to resume, or None when the task is unknown.
+    """
+    graph = app.state.graph
+    state_store = app.state.state_store
+
+    # Only the review fields are read and written, the graph checkpoint holds the rest
+    update = {}
+    if review_type == 'product_owner':
+        update['product_decision'] = review_status
+        update['feedback_reason'] = feedback_reason
+        node_name = "product_owner_review_decision"
+    elif review_type == 'design':
+        saved_state = await state_store.get(task_id, fields=['design_documents'])
+        if not saved_state or not saved_state.get('design_documents'):
+            return None
+        design_documents = saved_state['design_documents']
+        design_documents['review_status'] = review_status
+        design_documents['feedback_reason'] = feedback_reason
+        update['design_documents'] = design_documents
+        node_name = "design_review"
+    elif review_type == 'code':
+        update['code_review_status'] = review_status
+        update['code_review_feedback'] = feedback_reason
+        node_name = "code_review"
+    elif review_type == 'security':
+        update['security_review_status'] = review_status
+        update['security_review_feedback'] = feedback_reason
+        node_name = "security_review"
+    elif review_type == "testcase":
+        update['test_case_review_status'] = review_status
+        update['test_case_review_feedback'] = feedback_reason
+        node_name = "test_cases_review"
+    elif review_type == "qa":
+        update['qa_testing_status'] = review_status
+        update['qa_testing_feedback'] = feedback_reason
+        node_name = "qa_testing_review"
+    else:
+        raise ValueError(f"Unsupported review type: {review_type}")
+
+    if review_type != 'design' and not await state_store.exists(task_id):
+        return None
+
+    # Update the graph with thread
+    thread = {"configurable": {"thread_id": task_id}}
+    speculator = getattr(app.state, "speculator", None)
+    checkpoint_id = None
+    if speculator is not None:
+        checkpoint_id = (await graph.aget_state(thread)).config["configurable"].get("checkpoint_id")
+    await app.state.task_lock.check(lease)
+    await graph.aupdate_state(thread, update, as_node=node_name)
+    await state_store.save_fields(task_id, update, fencing_token=lease.token)
+
+    if speculator is not None:
+        # On approval commit the stage computed while waiting, on feedback drop it
+        record = await speculator.take(task_id, checkpoint_id, node_name) if review_status == "approved" else None
+        if record is not None:
+            await graph.aupdate_state(thread, record["update"], as_node=record["next_node"])
+            await state_store.save_fields(task_id, record["update"], fencing_token=lease.token)
         else:
-            raise ValueError(f"Unsupported review type: {review_type}")
-
-        # Update the graph with thread
-        thread = {"configurable": {"thread_id": task_id}}
-        graph.update_state(thread, saved_state, as_node=node_name)
-
-        # Resume the graph stream
-        state = None
-        async for event in graph.astream(None, thread, stream_mode="values"):
-            print(f"{review_type.capitalize()} Review Event Received: {event}")
-            state = event
-        
-        # Saving the state 
-        current_state = graph.get_state(thread)
-        save_state_to_redis(task_id, current_state)
-    
-    return {"task_id": task_id, "data": state} if saved_state else {"task_id": task_id}
+            await speculator.discard(task_id)
+    return thread
+
+REVIEW_ENDPOINTS = {
+    "product_owner_review": "product_owner",
+    "design_review": "design",
+    "code_review": "code",
+    "security_review": "security",
+    "test_cases_review": "testcase",
+    "qa_testing_review": "qa",
+}
+
+# Batch variants of the workflow endpoints: items run concurrently, at most
+# BATCH_CONCURRENCY at a time, and every item gets its own result
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+async def run_batch(items: list, handler) -> list[BatchItemResult]:
+    """
+        Runs `handler` on every item with bounded concurrency. A failing item is
+        reported in its result and never fails the other items.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(item):
+        async with semaphore:
+            try:
+                return await handler(item)
+            except (TaskBusyError, StaleLeaseError, RunCancelledError) as e:
+                return BatchItemResult(task_id=getattr(item, "task_id", None), status_code=409, detail=str(e))
+            except Exception as e:
+                print(f"Batch item {getattr(item, 'task_id', item)} failed: {e}")
+                return BatchItemResult(task_id=getattr(item, "task_id", None), status_code=500, detail=str(e))
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+def batch_item_result(task_id: str, state: Optional[dict]) -> BatchItemResult:
+    if state is None:
+        return BatchItemResult(task_id=task_id, status_code=404, detail="Unknown task")
+    return BatchItemResult(task_id=task_id, status_code=200, data=StateStore.project_status(state))
+
+
+def batch_response(results: list[BatchItemResult], started: float) -> BatchResponse:
+    succeeded = sum(1 for result in results if result.status_code < 300)
+    return BatchResponse(succeeded=succeeded, failed=len(results) - succeeded, duration=round(time.monotonic() - started, 3), results=results)
+
+
+@app.post("/sdlc/batch/start", response_model=BatchResponse)
+async def batch_start_workflows(request: BatchStartRequest):
+    """
+        Starts the workflow of every project. The states are written to Redis
+        in one pipelined round trip once the graphs reached their first interrupt.
+    """
+    started = time.monotonic()
+    states = {}
+
+    async def start(project):
+        task_id, state = await start_task(project.project_name)
+        states[task_id] = state
+        return batch_item_result(task_id, state)
+
+    results = await run_batch(request.projects, start)
+    if states:
+        await app.state.state_store.save_many(states)
+    return batch_response(results, started)
+
+@app.post("/sdlc/batch/requirements", response_model=BatchResponse)
+async def batch_project_requirements(request: BatchRequirementsRequest):
+    """
+        Submits the requirements of several tasks
+    """
+    started = time.monotonic()
+
+    async def submit(item):
+        return batch_item_result(item.task_id, await run_requirements(item.task_id, item.task))
+
+    return batch_response(await run_batch(request.items, submit), started)
+
+@app.post("/sdlc/batch/reviews", response_model=BatchResponse)
+async def batch_reviews(request: BatchReviewRequest):
+    """
+        Submits reviews of several tasks, each item names its review endpoint
+    """
+    started = time.monotonic()
+
+    async def submit(item):
+        review_type = REVIEW_ENDPOINTS.get(item.review)
+        if review_type is None:
+            return BatchItemResult(task_id=item.task_id, status_code=422, detail=f"Unknown review: {item.review}")
+        return batch_item_result(item.task_id, await run_review(item.task_id, review_type, item.review_status, item.feedback_reason))
+
+    return batch_response(await run_batch(request.items, submit), started)
+
+# Streaming (Server-Sent Events) variants of the workflow endpoints
+
+@app.post("/sdlc/workflow/{task_id}/requirements/stream")
+async def stream_project_requirements(task_id: str, request: Request):
+    """
+        Gets the project requirements and streams node updates and LLM tokens
+    """
+    data = await request.json()
+    if not await app.state.state_store.exists(task_id):
+        return JSONResponse(status_code=404, content={"task_id": task_id, "detail": "Unknown task"})
+    held = AsyncExitStack()
+    lease = await held.enter_async_context(app.state.task_lock.hold(task_id))
+
+    # The requirements are split inside the stream, so the client gets its first event right away
+    async def prepare():
+        thread = await update_requirements(task_id, data.get('task', ''), lease)
+        if thread is None:
+            return None, None
+        requirements = (await app.state.graph.aget_state(thread)).values.get('requirements', [])
+        return thread, {"node": "get_requirements", "update": {"requirements": requirements}}
+
+    return StreamingResponse(workflow_event_stream(task_id, None, lease, held, prepare), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/sdlc/workflow/{task_id}/{review_name}/stream")
+async def stream_review(task_id: str, review_name: str, request: Request):
+    """
+        Submits a review and streams node updates and LLM tokens
+    """
+    review_type = REVIEW_ENDPOINTS.get(review_name)
+    if review_type is None:
+        return JSONResponse(status_code=404, content={"detail": f"Unknown review endpoint: {review_name}"})
+
+    data = await request.json()
+    held = AsyncExitStack()
+    lease = await held.enter_async_context(app.state.task_lock.hold(task_id))
+    try:
+        thread = await apply_review(task_id, review_type, data.get('review_status', ''), data.get('feedback_reason', ''), lease)
+    except BaseException:
+        await held.aclose()
+        raise
+    if thread is None:
+        await held.aclose()
+        return JSONResponse(status_code=404, content={"task_id": task_id, "detail": "Unknown task"})
+    return StreamingResponse(workflow_event_stream(task_id, thread, lease, held), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def workflow_event_stream(task_id: str, thread: Optional[dict], lease: TaskLease, held: AsyncExitStack, prepare=None):
+    """
+        Resumes the graph and yields SSE frames, ending with the saved state.
+        When given, `prepare` records the stage input after the `start` event and returns
+        the thread with the update to report. The task lease in `held` is released when
+        the stream ends.
+    """
+    graph = app.state.graph
+    changed = set()
+    metrics = WorkflowMetrics()
+    try:
+        yield format_sse("start", {"task_id": task_id})
+        # A disconnecting client cancels the response, and with it this run
+        async with app.state.run_registry.track(task_id, lease):
+            if prepare is not None:
+                thread, update = await prepare()
+                if thread is None:
+                    yield format_sse("error", {"task_id": task_id, "detail": "Unknown task"})
+                    return
+                yield format_sse("update", update)
+            try:
+                if not await waiting_for_review(thread):
+                    async for event, data in stream_graph_events(graph, None, run_config(thread, metrics)):
+                        if event == "update" and isinstance(data["update"], dict):
+                            changed.update(data["update"].keys())
+                        yield format_sse(event, data)
+            except asyncio.CancelledError:
+                await save_completed(task_id, thread, changed, lease)
+                await record_timings(task_id, metrics)
+                raise
+        await record_timings(task_id, metrics)
+
+        state = (await graph.aget_state(thread)).values
+        await app.state.state_store.save_fields(task_id, {field: state[field] for field in changed if field in state}, fencing_token=lease.token)
+        await schedule_speculation(task_id, thread)
+        yield format_sse("done", {"task_id": task_id, "data": state})
+    except Exception as e:
+        print(f"Workflow stream for {task_id} failed: {e}")
+        yield format_sse("error", {"task_id": task_id, "detail": str(e)})
+    finally:
+        await held.aclose()
 
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field
+
+from src.context.context_builder import count_tokens
+from src.llm.router_llm import call_step
+
+CODE = '''```python
+# Reference {ref}
+
+
+def add(a, b):
+    """ Adds two numbers """
+    return a + b
+
+
+def main():
+    return add(2, 3)
+```'''
+
+TEST_CASES = '''```python
+import unittest
+
+from main import add
+
+
+class TestAdd(unittest.TestCase):
+    def test_add(self):
+        self.assertEqual(add(2, 3), 5)
+
+    def test_add_negative(self):
+        self.assertEqual(add(-1, 1), 0)
+```'''
+
+REVIEW = "Reviewed reference {ref}. The code follows the design. NO_ISSUES\n\nAPPROVED"
+
+DEPLOYMENT = "Deployment simulated for reference {ref}.\n- Deployment Status: Success\n- Feedback: ready to ship"
+
+QA_REPORT = "QA run for reference {ref}: every test case passed.\n\nQA Status: Passed"
+
+TEST_FAILURE_EXPLANATION = "The failing assertions of reference {ref} expect the documented behaviour; fix the code, not the tests."
+
+# Structured output requests, answered with a tool call whatever the step
+TOOL_CALL = "tool_call"
+
+
+class FakeChatModel(BaseChatModel):
+    """
+        Chat model answering every step of the SDLC workflow with canned output, after the
+        delay a provider would take: a time to first token drawn from a lognormal
+        distribution (median `latency_median`, shape `latency_sigma`), then the completion
+        at `tokens_per_second`.
+
+        Answers and delays are derived from the prompt (and `seed`), so a run is repeatable
+        and distinct workflows produce distinct downstream prompts. Structured output
+        requests get a `UserStories` tool call. Calls whose step has no canned reply get a
+        generic document and are counted in `unmatched`.
+    """
+    latency_median: float = 0.5
+    latency_sigma: float = 0.5
+    tokens_per_second: float = 200.0
+    requirements_per_task: int = 3
+    document_words: int = 300
+    seed: int = 0
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Replies per step, and the steps that got the generic reply because no canned one matched
+    replies: dict[str, int] = Field(default_factory=dict)
+    unmatched: dict[str, int] = Field(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"seed": self.seed}
+
+    def bind_tools(self, tools: Sequence[Any], tool_choice: Optional[Any] = None, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    # ----- Canned output -----
+
+    def _document(self, ref: str, title: str) -> str:
+        sections = []
+        words_per_section = max(self.document_words // 5, 1)
+        for index in range(1, 6):
+            body = " ".join(f"detail{(index * 7 + word) % 97}" for word in range(words_per_section))
+            sections.append(f"## {index}. {title} section {index}\n{body}")
+        return f"# {title} ({ref})\n\n" + "\n\n".join(sections)
+
+    def _reply(self, step: Optional[str], prompt: str, tools: Optional[list]) -> AIMessage:
+        ref = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+        if tools:
+            self.replies[TOOL_CALL] = self.replies.get(TOOL_CALL, 0) + 1
+            index = re.search(r"unique identifier:\s*(\d+)", prompt)
+            requirement = re.search(r"requirement:\s*\n\s*-\s*(.+)", prompt)
+            args = {
+                "id": int(index.group(1)) if index else 1,
+                "title": f"Story {ref}",
+                "description": f"As a user I want to {requirement.group(1).strip() if requirement else 'use the product'}",
+                "status": "To Do",
+            }
+            name = tools[0]["function"]["name"]
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{ref}"}])
+
+        self.replies[step or "none"] = self.replies.get(step or "none", 0) + 1
+        if step == "split_task_to_requirements":
+            content = "\n".join(f"Requirement {index} of task {ref}." for index in range(1, self.requirements_per_task + 1))
+        elif step in ("generate_code", "generate_module", "merge_modules", "update_code_incrementally"):
+            content = CODE.format(ref=ref)
+        elif step in ("get_code_review_comments", "review_chunk_security"):
+            content = REVIEW.format(ref=ref)
+        elif step == "generate_test_cases":
+            content = TEST_CASES
+        elif step == "simulate_qa_testing":
+            content = QA_REPORT.format(ref=ref)
+        elif step == "explain_test_failures":
+            content = TEST_FAILURE_EXPLANATION.format(ref=ref)
+        elif step == "deployment":
+            content = DEPLOYMENT.format(ref=ref)
+        elif step == "generate_functional_design":
+            content = self._document(ref, "Functional Design")
+        elif step == "generate_technical_design":
+            content = self._document(ref, "Technical Design")
+        elif step == "summarize_context":
+            content = self._document(ref, "Summary")
+        else:
+            self.unmatched[step or "none"] = self.unmatched.get(step or "none", 0) + 1
+            content = self._document(ref, "Notes")
+        return AIMessage(content=content)
+
+    def _answer(self, messages: list[BaseMessage], run_manager, kwargs: dict) -> tuple[AIMessage, float, float]:
+        """ The reply, the time to its first token and the time per completion token """
+        prompt = "\n".join(str(message.content) for message in messages)
+        message = self._reply(call_step(run_manager), prompt, kwargs.get("tools"))
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(message.content) if message.content else 30
+        message.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        message.response_metadata = {"model_name": "fake"}
+
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        rng = random.Random(f"{self.seed}:{prompt}")
+        first_token = rng.lognormvariate(0, self.latency_sigma) * self.latency_median
+        return message, first_token, 1 / self.tokens_per_second
+
+    # ----- Calls -----
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message, first_token, per_token = self._answer(messages, run_manager, kwargs)
+        await asyncio.sleep(first_token + per_token * message.usage_metadata["output_tokens"])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        message, first_token, per_token = self._answer(messages, run_manager, kwargs)
+        await asyncio.sleep(first_token)
+        if message.tool_calls:
+            call = message.tool_calls[0]
+            await asyncio.sleep(per_token * message.usage_metadata["output_tokens"])
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="", usage_metadata=message.usage_metadata,
+                tool_call_chunks=[{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}],
+            ))
+            return
+        for word in re.findall(r"\S+\s*", message.content):
+            await asyncio.sleep(per_token * count_tokens(word))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                await run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=message.usage_metadata, response_metadata=message.response_metadata))
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message, first_token, per_token = self._answer(messages, run_manager, kwargs)
+        time.sleep(first_token + per_token * message.usage_metadata["output_tokens"])
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,23 @@
+import fakeredis
+import fakeredis.aioredis
+import redis
+import redis.asyncio as aioredis
+
+
+def use_fake_redis(server: fakeredis.FakeServer = None) -> fakeredis.FakeServer:
+    """
+        Points every Redis client created from a URL (the checkpointer, the LLM cache, the
+        StateStore pool) at one in-process fakeredis server. Lua scripts need `lupa`,
+        installed by `fakeredis[lua]`.
+    """
+    server = server or fakeredis.FakeServer()
+
+    def sync_pool(cls, url, **kwargs):
+        return redis.ConnectionPool(connection_class=fakeredis.FakeConnection, server=server, max_connections=kwargs.get("max_connections"))
+
+    def async_pool(cls, url, **kwargs):
+        return aioredis.ConnectionPool(connection_class=fakeredis.aioredis.FakeConnection, server=server, max_connections=kwargs.get("max_connections"))
+
+    redis.ConnectionPool.from_url = classmethod(sync_pool)
+    aioredis.ConnectionPool.from_url = classmethod(async_pool)
+    return server
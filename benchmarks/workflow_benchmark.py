@@ -0,0 +1,333 @@
+"""
+    Load test of the SDLC workflow API without real LLM providers or Redis.
+
+    Runs the real FastAPI app (startup included) in process, with every LLM backend
+    answered by FakeChatModel and Redis replaced by fakeredis, and drives workflows
+    through start -> requirements -> every review endpoint at the given concurrency.
+
+    python -m benchmarks.workflow_benchmark --workflows 50 --concurrency 10 --output bench.json
+    python -m benchmarks.workflow_benchmark --baseline bench.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+import httpx
+
+from benchmarks.fake_llm import TOOL_CALL, FakeChatModel
+from benchmarks.fake_redis import use_fake_redis
+
+REVIEWS = ["product_owner_review", "design_review", "code_review", "security_review", "test_cases_review", "qa_testing_review"]
+
+TASKS = [
+    "Users should be able to browse movies, select seats, and make payments through the platform.",
+    "Write an e-commerce application to choose products from a catalog, add payments and submit the order.",
+    "Build a library system where members search books, borrow them and get reminders before the due date.",
+]
+
+FINISHED_JOB = ("completed", "failed", "cancelled")
+
+# Steps an approved workflow goes through, each answered with its own canned reply.
+# The canned code has no static analysis findings, so the LLM code review is skipped.
+EXPECTED_STEPS = (
+    "split_task_to_requirements", TOOL_CALL, "generate_functional_design", "generate_technical_design",
+    "generate_code", "review_chunk_security", "generate_test_cases", "deployment",
+)
+
+
+def percentile(samples: list[float], quantile: float) -> Optional[float]:
+    """ Nearest-rank percentile """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(quantile * len(ordered)), len(ordered) - 1)]
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class LoopLagMonitor:
+    """ Measures how late the event loop wakes up a task sleeping for `interval` """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    def report(self) -> dict:
+        return {
+            "p50_ms": round((percentile(self.samples, 0.5) or 0) * 1000, 2),
+            "p99_ms": round((percentile(self.samples, 0.99) or 0) * 1000, 2),
+            "max_ms": round(max(self.samples, default=0) * 1000, 2),
+        }
+
+
+def install_fake_backends(args):
+    """ Routes every LLM call to FakeChatModel backends (provider "fake") """
+    from src.llm.router_llm import RouterLLM
+
+    options = {
+        "latency_median": args.latency_median,
+        "latency_sigma": args.latency_sigma,
+        "tokens_per_second": args.tokens_per_second,
+        "requirements_per_task": args.requirements,
+        "seed": args.seed,
+    }
+    os.environ["LLM_BACKENDS"] = json.dumps([
+        {"name": f"fake-{index}", "provider": "fake", "model": "fake", "rpm": args.rpm, "tpm": args.tpm, "tags": ["fast", "strong"]}
+        for index in range(args.backends)
+    ])
+    build_model = RouterLLM.build_model
+
+    def build_fake_model(config: dict):
+        if config["provider"] == "fake":
+            return FakeChatModel(**options)
+        return build_model(config)
+
+    RouterLLM.build_model = staticmethod(build_fake_model)
+
+
+class WorkflowBenchmark:
+    """ Drives workflows through the API and records the latency of every request """
+
+    def __init__(self, client: httpx.AsyncClient, async_mode: bool = False, poll_interval: float = 0.02):
+        self.client = client
+        self.async_mode = async_mode
+        self.poll_interval = poll_interval
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.node_seconds: dict[str, list[float]] = defaultdict(list)
+        self.completed = 0
+        self.failed = 0
+
+    async def _wait_for_job(self, task_id: str) -> bool:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            status = (await self.client.get(f"/sdlc/workflow/{task_id}")).json()
+            if status.get("job_status") in FINISHED_JOB:
+                return status["job_status"] == "completed"
+
+    async def _call(self, endpoint: str, path: str, body: dict, task_id: Optional[str] = None, record: bool = True) -> Optional[dict]:
+        started = time.perf_counter()
+        background = self.async_mode and task_id is not None
+        response = await self.client.post(f"{path}?async_mode=true" if background else path, json=body)
+        ok = response.status_code < 300
+        if ok and background:
+            # The request is done when its background job is
+            ok = await self._wait_for_job(task_id)
+        if record:
+            self.latencies[endpoint].append(time.perf_counter() - started)
+            if not ok:
+                self.errors[endpoint] += 1
+        if not ok:
+            print(f"{endpoint} failed for {task_id}: {response.status_code} {response.text[:200]}")
+            return None
+        return response.json()
+
+    async def run_workflow(self, number: int, record: bool = True) -> bool:
+        started = await self._call("start", "/sdlc/workflow/start", {"project_name": f"Benchmark project {number}"}, record=record)
+        if started is None:
+            return False
+        task_id = started["task_id"]
+        task = f"{TASKS[number % len(TASKS)]} (workflow {number})"
+        if await self._call("requirements", f"/sdlc/workflow/{task_id}/requirements", {"task": task}, task_id, record) is None:
+            return False
+        for review in REVIEWS:
+            body = {"review_status": "approved", "feedback_reason": ""}
+            if await self._call(review, f"/sdlc/workflow/{task_id}/{review}", body, task_id, record) is None:
+                return False
+        if record:
+            timings = (await self.client.get(f"/sdlc/workflow/{task_id}/timings")).json()
+            for node, stats in timings.get("nodes", {}).items():
+                self.node_seconds[node].append(stats.get("seconds", 0))
+        return True
+
+    async def run(self, workflows: int, concurrency: int):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(number: int):
+            async with semaphore:
+                if await self.run_workflow(number):
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+        await asyncio.gather(*(one(number) for number in range(workflows)))
+
+    def endpoint_report(self) -> dict:
+        report = {}
+        for endpoint in ["start", "requirements", *REVIEWS]:
+            samples = self.latencies.get(endpoint, [])
+            report[endpoint] = {
+                "count": len(samples),
+                "errors": self.errors.get(endpoint, 0),
+                **{
+                    f"p{int(quantile * 100)}_ms": round(percentile(samples, quantile) * 1000, 1) if samples else None
+                    for quantile in (0.5, 0.95, 0.99)
+                },
+            }
+        return report
+
+    def node_report(self) -> dict:
+        return {
+            node: {"mean_s": round(sum(seconds) / len(seconds), 3), "p95_s": round(percentile(seconds, 0.95), 3)}
+            for node, seconds in sorted(self.node_seconds.items(), key=lambda item: -sum(item[1]))
+        }
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """ Regressions of `results` against `baseline`: slower p95s, lower throughput, higher peak RSS """
+    regressions = []
+    for endpoint, stats in results["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint, {}).get("p95_ms")
+        if before and stats["p95_ms"] and stats["p95_ms"] > before * (1 + max_regression):
+            regressions.append(f"{endpoint} p95 {stats['p95_ms']}ms > {before}ms")
+    before = baseline.get("throughput", {}).get("workflows_per_s")
+    if before and results["throughput"]["workflows_per_s"] < before * (1 - max_regression):
+        regressions.append(f"throughput {results['throughput']['workflows_per_s']}/s < {before}/s")
+    before = baseline.get("memory", {}).get("peak_rss_mb")
+    if before and results["memory"]["peak_rss_mb"] > before * (1 + max_regression):
+        regressions.append(f"peak RSS {results['memory']['peak_rss_mb']}MB > {before}MB")
+    return regressions
+
+
+def check_fake_replies(llm: dict) -> list[str]:
+    """
+        Problems with the canned replies: a step that never reached the fake LLM, or a
+        call whose step had no canned reply (the step was lost on the way to the model)
+    """
+    problems = [f"step {step} was never called" for step in EXPECTED_STEPS if not llm["replies"].get(step)]
+    problems += [f"{count} calls of step {step} got the generic reply" for step, count in llm["unmatched"].items()]
+    return problems
+
+
+def print_report(results: dict):
+    print(f"\n{'endpoint':<22}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, stats in results["endpoints"].items():
+        print(f"{endpoint:<22}{stats['count']:>7}{stats['errors']:>8}"
+              + "".join(f"{stats[key] if stats[key] is not None else '-':>10}" for key in ("p50_ms", "p95_ms", "p99_ms")))
+    throughput, llm = results["throughput"], results["llm"]
+    print(f"\nworkflows: {throughput['completed']} completed, {throughput['failed']} failed in {throughput['duration_s']}s"
+          f" -> {throughput['workflows_per_s']} workflows/s, {throughput['requests_per_s']} requests/s")
+    print(f"llm: {llm['calls']} calls, {llm['prompt_tokens']} prompt / {llm['completion_tokens']} completion tokens")
+    print("llm replies:", ", ".join(f"{step} {count}" for step, count in sorted(llm["replies"].items())))
+    print(f"event loop lag: {results['event_loop_lag']}")
+    print(f"memory: {results['memory']}")
+    print("slowest nodes:", ", ".join(f"{node} {stats['mean_s']}s" for node, stats in list(results["nodes"].items())[:5]))
+
+
+async def benchmark(args) -> dict:
+    use_fake_redis()
+    install_fake_backends(args)
+    from app import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            runner = WorkflowBenchmark(client, async_mode=args.async_mode)
+            for number in range(args.warmup):
+                await runner.run_workflow(-1 - number, record=False)
+
+            monitor = LoopLagMonitor()
+            monitor.start()
+            started = time.perf_counter()
+            await runner.run(args.workflows, args.concurrency)
+            duration = time.perf_counter() - started
+            await monitor.stop()
+
+        backends = app.state.llm.model.backends
+        llm = {
+            "calls": sum(backend.model.calls for backend in backends),
+            "prompt_tokens": sum(backend.model.prompt_tokens for backend in backends),
+            "completion_tokens": sum(backend.model.completion_tokens for backend in backends),
+            "replies": dict(sum((Counter(backend.model.replies) for backend in backends), Counter())),
+            "unmatched": dict(sum((Counter(backend.model.unmatched) for backend in backends), Counter())),
+        }
+
+    requests = sum(len(samples) for samples in runner.latencies.values())
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "endpoints": runner.endpoint_report(),
+        "throughput": {
+            "completed": runner.completed,
+            "failed": runner.failed,
+            "duration_s": round(duration, 3),
+            "workflows_per_s": round(runner.completed / duration, 3),
+            "requests_per_s": round(requests / duration, 2),
+        },
+        "llm": llm,
+        "event_loop_lag": monitor.report(),
+        "memory": {"peak_rss_mb": peak_rss_mb(), "children_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN)},
+        "nodes": runner.node_report(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflows", type=int, default=20, help="workflows to run")
+    parser.add_argument("--concurrency", type=int, default=5, help="workflows in flight at once")
+    parser.add_argument("--warmup", type=int, default=1, help="unrecorded workflows run first")
+    parser.add_argument("--async-mode", action="store_true", help="submit stages as background jobs and poll them")
+    parser.add_argument("--latency-median", type=float, default=0.2, help="median time to first token of the fake LLM (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal shape of the time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=300, help="completion speed of the fake LLM")
+    parser.add_argument("--requirements", type=int, default=3, help="requirements (and user stories) per workflow")
+    parser.add_argument("--backends", type=int, default=2, help="fake LLM backends behind the router")
+    parser.add_argument("--rpm", type=int, default=100000, help="requests per minute of each fake backend")
+    parser.add_argument("--tpm", type=int, default=100000000, help="tokens per minute of each fake backend")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed slowdown against the baseline (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(benchmark(args))
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    problems = check_fake_replies(results["llm"])
+    if problems:
+        # The run did not exercise the workflow it claims to measure
+        print("\nFake LLM replies do not cover the workflow:\n  " + "\n  ".join(problems))
+        return 1
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.max_regression)
+        if regressions:
+            print("\nRegressions against the baseline:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nNo regression against the baseline")
+    return 0 if results["throughput"]["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
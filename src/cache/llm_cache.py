@@ -0,0 +1,244 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+import redis
+import redis.asyncio as aioredis
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class TieredLLMCache(BaseCache):
+    """
+        Two tier LLM response cache: a bounded in-process LRU in front of a shared Redis tier.
+
+        Pass it to the chat model (`GroqLLM().get_llm(cache=TieredLLMCache())`) and LangChain
+        consults it before every completion. Keys cover the model, its parameters (including
+        bound tools / structured output schemas) and the whitespace-normalized prompt.
+
+        The Redis tier expires entries after `ttl` seconds and keeps at most
+        `max_redis_entries`, evicting the least recently used ones; responses larger than
+        `max_entry_bytes` are only kept in memory.
+
+        Redis errors never fail the LLM call: they are counted, and the lookup is a miss
+        or the write is skipped.
+    """
+
+    def __init__(
+        self,
+        client: Optional[redis.Redis] = None,
+        async_client: Optional[aioredis.Redis] = None,
+        max_memory_entries: int = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256")),
+        max_redis_entries: int = int(os.getenv("LLM_CACHE_REDIS_ENTRIES", "10000")),
+        max_entry_bytes: int = int(os.getenv("LLM_CACHE_MAX_ENTRY_BYTES", str(512 * 1024))),
+        ttl: int = int(os.getenv("LLM_CACHE_TTL", "86400")),
+        prefix: str = "llm_cache",
+    ):
+        self.client = client or redis.Redis.from_url(REDIS_URL)
+        self.async_client = async_client or aioredis.Redis.from_url(REDIS_URL)
+        self.max_memory_entries = max_memory_entries
+        self.max_redis_entries = max_redis_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.prefix = prefix
+        self._memory: OrderedDict[str, RETURN_VAL_TYPE] = OrderedDict()
+        # Sync lookups can run on executor threads
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.redis_errors = 0
+
+    # ----- Keys -----
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """ Collapses whitespace so prompts that only differ in indentation share an entry """
+        return " ".join(prompt.split())
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        digest = hashlib.sha256(
+            f"{llm_string}\x00{self.normalize_prompt(prompt)}".encode()
+        ).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    @property
+    def _lru_key(self) -> str:
+        return f"{self.prefix}:lru"
+
+    # ----- In-process tier -----
+
+    def _memory_get(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            return value
+
+    def _memory_put(self, key: str, value: RETURN_VAL_TYPE):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    # ----- Stats -----
+
+    def _record(self, tier: Optional[str]):
+        with self._lock:
+            if tier == "memory":
+                self.memory_hits += 1
+            elif tier == "redis":
+                self.redis_hits += 1
+            else:
+                self.misses += 1
+
+    def _redis_error(self, operation: str, error: redis.RedisError):
+        with self._lock:
+            self.redis_errors += 1
+        print(f"LLM cache {operation} skipped, redis unavailable: {error}")
+
+    def stats(self) -> dict:
+        """ Hit/miss counters of both tiers """
+        with self._lock:
+            lookups = self.memory_hits + self.redis_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "redis_errors": self.redis_errors,
+                "hit_rate": (self.memory_hits + self.redis_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    # ----- Redis tier helpers -----
+
+    @staticmethod
+    def _serialize(return_val: Sequence[Any]) -> str:
+        return dumps(list(return_val))
+
+    @staticmethod
+    def _deserialize(payload) -> Optional[RETURN_VAL_TYPE]:
+        try:
+            return loads(payload.decode() if isinstance(payload, bytes) else payload)
+        except Exception as e:
+            print(f"Discarding unreadable LLM cache entry: {e}")
+            return None
+
+    def _queue_store(self, pipe, key: str, payload: str):
+        pipe.set(key, payload, ex=self.ttl)
+        pipe.zadd(self._lru_key, {key: time.time()})
+        pipe.expire(self._lru_key, self.ttl)
+        pipe.zcard(self._lru_key)
+
+    def _overflow(self, size: int) -> int:
+        return max(0, size - self.max_redis_entries)
+
+    # ----- Sync API -----
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """ Looks up the memory tier, then redis (promoting hits into memory) """
+        key = self._key(prompt, llm_string)
+        value = self._memory_get(key)
+        if value is not None:
+            self._record("memory")
+            return value
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.zadd(self._lru_key, {key: time.time()}, xx=True)
+            payload, _ = pipe.execute()
+        except redis.RedisError as e:
+            self._redis_error("lookup", e)
+            payload = None
+        value = self._deserialize(payload) if payload else None
+        if value is None:
+            self._record(None)
+            return None
+        self._record("redis")
+        self._memory_put(key, value)
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """ Stores the response in both tiers """
+        key = self._key(prompt, llm_string)
+        self._memory_put(key, return_val)
+        payload = self._serialize(return_val)
+        if len(payload) > self.max_entry_bytes:
+            return
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            self._queue_store(pipe, key, payload)
+            size = pipe.execute()[-1]
+            if overflow := self._overflow(size):
+                evicted = [member for member, _ in self.client.zpopmin(self._lru_key, overflow)]
+                if evicted:
+                    self.client.delete(*evicted)
+        except redis.RedisError as e:
+            self._redis_error("write", e)
+
+    def clear(self, **kwargs: Any) -> None:
+        """ Clears both tiers """
+        with self._lock:
+            self._memory.clear()
+        keys = self.client.zrange(self._lru_key, 0, -1)
+        self.client.delete(self._lru_key, *keys)
+
+    # ----- Async API -----
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """ Async version of lookup """
+        key = self._key(prompt, llm_string)
+        value = self._memory_get(key)
+        if value is not None:
+            self._record("memory")
+            return value
+
+        try:
+            pipe = self.async_client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.zadd(self._lru_key, {key: time.time()}, xx=True)
+            payload, _ = await pipe.execute()
+        except redis.RedisError as e:
+            self._redis_error("lookup", e)
+            payload = None
+        value = self._deserialize(payload) if payload else None
+        if value is None:
+            self._record(None)
+            return None
+        self._record("redis")
+        self._memory_put(key, value)
+        return value
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """ Async version of update """
+        key = self._key(prompt, llm_string)
+        self._memory_put(key, return_val)
+        payload = self._serialize(return_val)
+        if len(payload) > self.max_entry_bytes:
+            return
+
+        try:
+            pipe = self.async_client.pipeline(transaction=False)
+            self._queue_store(pipe, key, payload)
+            size = (await pipe.execute())[-1]
+            if overflow := self._overflow(size):
+                evicted = [member for member, _ in await self.async_client.zpopmin(self._lru_key, overflow)]
+                if evicted:
+                    await self.async_client.delete(*evicted)
+        except redis.RedisError as e:
+            self._redis_error("write", e)
+
+    async def aclear(self, **kwargs: Any) -> None:
+        """ Async version of clear """
+        with self._lock:
+            self._memory.clear()
+        keys = await self.async_client.zrange(self._lru_key, 0, -1)
+        await self.async_client.delete(self._lru_key, *keys)
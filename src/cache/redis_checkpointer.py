@@ -0,0 +1,440 @@
+import json
+import os
+import random
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence
+
+import redis
+import redis.asyncio as aioredis
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Checkpoints expire together with the cached task state (24 hours)
+CHECKPOINT_TTL = 86400
+
+
+class RedisSaver(BaseCheckpointSaver[str]):
+    """
+        LangGraph checkpointer that persists checkpoints, channel blobs and pending
+        writes in Redis so that any worker can resume any task.
+
+        Key layout (per thread and checkpoint namespace):
+            checkpoint:{thread}:{ns}:{checkpoint_id}           hash with checkpoint + metadata
+            checkpoint_index:{thread}:{ns}                     sorted set of checkpoint ids
+            checkpoint_blob:{thread}:{ns}:{channel}:{version}  hash with one channel value
+            checkpoint_writes:{thread}:{ns}:{checkpoint_id}    hash of pending writes
+
+        Channel values are stored once per version, so large artifacts such as the design
+        documents are not rewritten by checkpoints that did not change them.
+    """
+
+    def __init__(
+        self,
+        client: Optional[redis.Redis] = None,
+        async_client: Optional[aioredis.Redis] = None,
+        ttl: Optional[int] = CHECKPOINT_TTL,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.client = client or redis.Redis.from_url(REDIS_URL)
+        self.async_client = async_client or aioredis.Redis.from_url(REDIS_URL)
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url: str, ttl: Optional[int] = CHECKPOINT_TTL) -> "RedisSaver":
+        """ Creates the saver with sync and async clients for the given redis url """
+        return cls(
+            client=redis.Redis.from_url(url),
+            async_client=aioredis.Redis.from_url(url),
+            ttl=ttl,
+        )
+
+    # ----- Keys -----
+
+    @staticmethod
+    def _checkpoint_key(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"checkpoint:{thread_id}:{checkpoint_ns}:{checkpoint_id}"
+
+    @staticmethod
+    def _index_key(thread_id: str, checkpoint_ns: str) -> str:
+        return f"checkpoint_index:{thread_id}:{checkpoint_ns}"
+
+    @staticmethod
+    def _blob_key(thread_id: str, checkpoint_ns: str, channel: str, version) -> str:
+        return f"checkpoint_blob:{thread_id}:{checkpoint_ns}:{channel}:{version}"
+
+    @staticmethod
+    def _writes_key(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"checkpoint_writes:{thread_id}:{checkpoint_ns}:{checkpoint_id}"
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+    # ----- Encoding -----
+
+    def _pack_write(self, task_id: str, channel: str, value: Any, task_path: str) -> bytes:
+        """ Packs a pending write as a JSON header line followed by the serialized value """
+        type_, payload = self.serde.dumps_typed(value)
+        header = json.dumps([task_id, channel, type_, task_path]).encode()
+        return header + b"\n" + payload
+
+    def _unpack_write(self, packed: bytes) -> tuple[str, str, Any]:
+        header, payload = packed.split(b"\n", 1)
+        task_id, channel, type_, _ = json.loads(header)
+        return task_id, channel, self.serde.loads_typed((type_, payload))
+
+    def _prepare_put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ):
+        """ Builds the hashes written by put/aput """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+
+        c = checkpoint.copy()
+        values: dict[str, Any] = c.pop("channel_values")
+        blobs = {}
+        for channel, version in new_versions.items():
+            if channel in values:
+                type_, payload = self.serde.dumps_typed(values[channel])
+            else:
+                type_, payload = "empty", b""
+            blobs[self._blob_key(thread_id, checkpoint_ns, channel, version)] = {
+                "type": type_,
+                "value": payload,
+            }
+
+        checkpoint_type, checkpoint_payload = self.serde.dumps_typed(c)
+        metadata_type, metadata_payload = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        record = {
+            "checkpoint_type": checkpoint_type,
+            "checkpoint": checkpoint_payload,
+            "metadata_type": metadata_type,
+            "metadata": metadata_payload,
+            "parent_checkpoint_id": parent_checkpoint_id or "",
+        }
+        # Unchanged channels keep pointing at older blobs, keep them alive with the checkpoint
+        live_blob_keys = [
+            self._blob_key(thread_id, checkpoint_ns, channel, version)
+            for channel, version in checkpoint["channel_versions"].items()
+        ]
+        next_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+        return thread_id, checkpoint_ns, record, blobs, live_blob_keys, next_config
+
+    def _queue_put(self, pipe, thread_id, checkpoint_ns, checkpoint_id, record, blobs, live_blob_keys):
+        """ Queues the commands of a put on a (sync or async) pipeline """
+        for key, blob in blobs.items():
+            pipe.hset(key, mapping=blob)
+        checkpoint_key = self._checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
+        index_key = self._index_key(thread_id, checkpoint_ns)
+        pipe.hset(checkpoint_key, mapping=record)
+        # All ids share score 0 so the set is ordered lexicographically (ids are time ordered)
+        pipe.zadd(index_key, {checkpoint_id: 0})
+        if self.ttl:
+            for key in [checkpoint_key, index_key, *live_blob_keys]:
+                pipe.expire(key, self.ttl)
+
+    def _queue_put_writes(self, pipe, config, writes, task_id, task_path):
+        """ Queues the commands of a put_writes on a (sync or async) pipeline """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        writes_key = self._writes_key(thread_id, checkpoint_ns, checkpoint_id)
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            field = f"{task_id}:{write_idx}"
+            packed = self._pack_write(task_id, channel, value, task_path)
+            if write_idx >= 0:
+                # Regular writes are idempotent, the first one recorded wins
+                pipe.hsetnx(writes_key, field, packed)
+            else:
+                pipe.hset(writes_key, field, packed)
+        if self.ttl:
+            pipe.expire(writes_key, self.ttl)
+
+    def _pending_writes(self, raw_writes: dict) -> list[tuple[str, str, Any]]:
+        def order(item):
+            task_id, idx = self._decode(item[0]).rsplit(":", 1)
+            return task_id, int(idx)
+
+        return [self._unpack_write(packed) for _, packed in sorted(raw_writes.items(), key=order)]
+
+    def _checkpoint_blob_keys(self, thread_id, checkpoint_ns, record) -> tuple[dict, list[str]]:
+        checkpoint = self.serde.loads_typed(
+            (self._decode(record[b"checkpoint_type"]), record[b"checkpoint"])
+        )
+        channels = list(checkpoint["channel_versions"].items())
+        keys = [self._blob_key(thread_id, checkpoint_ns, channel, version) for channel, version in channels]
+        return checkpoint, keys
+
+    def _build_tuple(self, thread_id, checkpoint_ns, checkpoint_id, record, checkpoint, blobs, raw_writes):
+        channel_values = {}
+        for channel, blob in zip(checkpoint["channel_versions"], blobs):
+            if not blob or self._decode(blob[b"type"]) == "empty":
+                continue
+            channel_values[channel] = self.serde.loads_typed(
+                (self._decode(blob[b"type"]), blob[b"value"])
+            )
+        metadata = self.serde.loads_typed(
+            (self._decode(record[b"metadata_type"]), record[b"metadata"])
+        )
+        parent_checkpoint_id = self._decode(record.get(b"parent_checkpoint_id", b""))
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=metadata,
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=self._pending_writes(raw_writes),
+        )
+
+    @staticmethod
+    def _matches(metadata: dict, filter: Optional[dict]) -> bool:
+        return not filter or all(metadata.get(key) == value for key, value in filter.items())
+
+    @staticmethod
+    def _lex_range(before: Optional[RunnableConfig]):
+        before_id = get_checkpoint_id(before) if before else None
+        return f"({before_id}" if before_id else "+"
+
+    # ----- Sync API -----
+
+    def _load_tuple(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Optional[CheckpointTuple]:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(self._checkpoint_key(thread_id, checkpoint_ns, checkpoint_id))
+        pipe.hgetall(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+        record, raw_writes = pipe.execute()
+        if not record:
+            return None
+
+        checkpoint, blob_keys = self._checkpoint_blob_keys(thread_id, checkpoint_ns, record)
+        pipe = self.client.pipeline(transaction=False)
+        for key in blob_keys:
+            pipe.hgetall(key)
+        blobs = pipe.execute() if blob_keys else []
+        return self._build_tuple(thread_id, checkpoint_ns, checkpoint_id, record, checkpoint, blobs, raw_writes)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """ Returns the requested checkpoint, or the latest one of the thread """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            latest = self.client.zrevrangebylex(self._index_key(thread_id, checkpoint_ns), "+", "-", start=0, num=1)
+            if not latest:
+                return None
+            checkpoint_id = self._decode(latest[0])
+        return self._load_tuple(thread_id, checkpoint_ns, checkpoint_id)
+
+    def _index_keys(self, config: Optional[RunnableConfig]) -> List[str]:
+        if config and config["configurable"].get("checkpoint_ns") is not None:
+            return [self._index_key(config["configurable"]["thread_id"], config["configurable"]["checkpoint_ns"])]
+        thread_id = config["configurable"]["thread_id"] if config else "*"
+        return [self._decode(key) for key in self.client.scan_iter(match=f"checkpoint_index:{thread_id}:*")]
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """ Lists checkpoints newest first, filtered by config, metadata and `before` """
+        config_checkpoint_id = get_checkpoint_id(config) if config else None
+        for index_key in self._index_keys(config):
+            _, thread_id, checkpoint_ns = index_key.split(":", 2)
+            for raw_id in self.client.zrevrangebylex(index_key, self._lex_range(before), "-"):
+                checkpoint_id = self._decode(raw_id)
+                if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
+                    continue
+                checkpoint_tuple = self._load_tuple(thread_id, checkpoint_ns, checkpoint_id)
+                if checkpoint_tuple is None or not self._matches(checkpoint_tuple.metadata, filter):
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """ Saves the checkpoint and its changed channel blobs in a single pipeline """
+        thread_id, checkpoint_ns, record, blobs, live_blob_keys, next_config = self._prepare_put(
+            config, checkpoint, metadata, new_versions
+        )
+        pipe = self.client.pipeline(transaction=True)
+        self._queue_put(pipe, thread_id, checkpoint_ns, checkpoint["id"], record, blobs, live_blob_keys)
+        pipe.execute()
+        return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """ Saves the pending writes of a task in a single pipeline """
+        pipe = self.client.pipeline(transaction=True)
+        self._queue_put_writes(pipe, config, writes, task_id, task_path)
+        pipe.execute()
+
+    def delete_thread(self, thread_id: str) -> None:
+        """ Deletes every checkpoint, blob and write of the thread """
+        keys = []
+        for prefix in ("checkpoint", "checkpoint_index", "checkpoint_blob", "checkpoint_writes"):
+            keys.extend(self.client.scan_iter(match=f"{prefix}:{thread_id}:*"))
+        if keys:
+            self.client.delete(*keys)
+
+    # ----- Async API -----
+
+    async def _aload_tuple(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Optional[CheckpointTuple]:
+        pipe = self.async_client.pipeline(transaction=False)
+        pipe.hgetall(self._checkpoint_key(thread_id, checkpoint_ns, checkpoint_id))
+        pipe.hgetall(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+        record, raw_writes = await pipe.execute()
+        if not record:
+            return None
+
+        checkpoint, blob_keys = self._checkpoint_blob_keys(thread_id, checkpoint_ns, record)
+        pipe = self.async_client.pipeline(transaction=False)
+        for key in blob_keys:
+            pipe.hgetall(key)
+        blobs = await pipe.execute() if blob_keys else []
+        return self._build_tuple(thread_id, checkpoint_ns, checkpoint_id, record, checkpoint, blobs, raw_writes)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """ Async version of get_tuple """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            latest = await self.async_client.zrevrangebylex(
+                self._index_key(thread_id, checkpoint_ns), "+", "-", start=0, num=1
+            )
+            if not latest:
+                return None
+            checkpoint_id = self._decode(latest[0])
+        return await self._aload_tuple(thread_id, checkpoint_ns, checkpoint_id)
+
+    async def _aindex_keys(self, config: Optional[RunnableConfig]) -> List[str]:
+        if config and config["configurable"].get("checkpoint_ns") is not None:
+            return [self._index_key(config["configurable"]["thread_id"], config["configurable"]["checkpoint_ns"])]
+        thread_id = config["configurable"]["thread_id"] if config else "*"
+        return [self._decode(key) async for key in self.async_client.scan_iter(match=f"checkpoint_index:{thread_id}:*")]
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """ Async version of list """
+        config_checkpoint_id = get_checkpoint_id(config) if config else None
+        for index_key in await self._aindex_keys(config):
+            _, thread_id, checkpoint_ns = index_key.split(":", 2)
+            for raw_id in await self.async_client.zrevrangebylex(index_key, self._lex_range(before), "-"):
+                checkpoint_id = self._decode(raw_id)
+                if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
+                    continue
+                checkpoint_tuple = await self._aload_tuple(thread_id, checkpoint_ns, checkpoint_id)
+                if checkpoint_tuple is None or not self._matches(checkpoint_tuple.metadata, filter):
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """ Async version of put """
+        thread_id, checkpoint_ns, record, blobs, live_blob_keys, next_config = self._prepare_put(
+            config, checkpoint, metadata, new_versions
+        )
+        pipe = self.async_client.pipeline(transaction=True)
+        self._queue_put(pipe, thread_id, checkpoint_ns, checkpoint["id"], record, blobs, live_blob_keys)
+        await pipe.execute()
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """ Async version of put_writes """
+        pipe = self.async_client.pipeline(transaction=True)
+        self._queue_put_writes(pipe, config, writes, task_id, task_path)
+        await pipe.execute()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """ Async version of delete_thread """
+        keys = []
+        for prefix in ("checkpoint", "checkpoint_index", "checkpoint_blob", "checkpoint_writes"):
+            keys.extend([key async for key in self.async_client.scan_iter(match=f"{prefix}:{thread_id}:*")])
+        if keys:
+            await self.async_client.delete(*keys)
+
+    def get_next_version(self, current: Optional[str], channel) -> str:
+        """ Monotonic, string sortable channel versions (same scheme as MemorySaver) """
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
@@ -0,0 +1,190 @@
+import json
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+# Every encoded state starts with MAGIC + version + codec id + compression id
+MAGIC = b"SD"
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+# Payloads below this size are stored uncompressed
+COMPRESSION_THRESHOLD = 1024
+
+
+def to_plain(value: Any) -> Any:
+    """
+        Converts pydantic models (UserStories, DesignDocument, ...) into plain
+        dicts/lists so every codec can encode the state values
+    """
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    return value
+
+
+class StateCodec(ABC):
+    """
+        Serializes plain state values to bytes
+    """
+    codec_id = 0
+    name = ""
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        ...
+
+    @abstractmethod
+    def loads(self, payload: bytes) -> Any:
+        ...
+
+
+class JsonCodec(StateCodec):
+    codec_id = 1
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def loads(self, payload: bytes) -> Any:
+        return json.loads(payload)
+
+
+class MsgpackCodec(StateCodec):
+    codec_id = 2
+    name = "msgpack"
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return self.msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, payload: bytes) -> Any:
+        return self.msgpack.unpackb(payload, raw=False)
+
+
+class Compressor:
+    """
+        Compresses encoded payloads
+    """
+    compression_id = 0
+    name = "none"
+
+    def compress(self, payload: bytes) -> bytes:
+        return payload
+
+    def decompress(self, payload: bytes) -> bytes:
+        return payload
+
+
+class ZlibCompressor(Compressor):
+    compression_id = 1
+    name = "zlib"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, payload: bytes) -> bytes:
+        return zlib.compress(payload, self.level)
+
+    def decompress(self, payload: bytes) -> bytes:
+        return zlib.decompress(payload)
+
+
+class ZstdCompressor(Compressor):
+    compression_id = 2
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        import zstandard
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, payload: bytes) -> bytes:
+        return self.compressor.compress(payload)
+
+    def decompress(self, payload: bytes) -> bytes:
+        return self.decompressor.decompress(payload)
+
+
+CODECS = {codec.codec_id: codec for codec in (JsonCodec, MsgpackCodec)}
+COMPRESSORS = {compressor.compression_id: compressor for compressor in (Compressor, ZlibCompressor, ZstdCompressor)}
+
+
+def default_codec() -> StateCodec:
+    """ msgpack when installed, JSON otherwise """
+    try:
+        return MsgpackCodec()
+    except ImportError:
+        return JsonCodec()
+
+
+def default_compressor() -> Compressor:
+    """ zstd when installed, zlib otherwise """
+    try:
+        return ZstdCompressor()
+    except ImportError:
+        return ZlibCompressor()
+
+
+class StateSerializer:
+    """
+        Encodes SDLC state values as: header (magic, format version, codec, compression)
+        followed by the codec payload, compressed when it is larger than `threshold`.
+
+        Payloads written by other codecs/compressors are still readable as long as they
+        are installed, and states saved before the header existed (the JSON encoded
+        StateSnapshot) are migrated on read.
+    """
+
+    def __init__(
+        self,
+        codec: Optional[StateCodec] = None,
+        compressor: Optional[Compressor] = None,
+        threshold: int = COMPRESSION_THRESHOLD,
+    ):
+        self.codec = codec or default_codec()
+        self.compressor = compressor or default_compressor()
+        self.threshold = threshold
+        self._codecs = {self.codec.codec_id: self.codec}
+        self._compressors = {self.compressor.compression_id: self.compressor, 0: Compressor()}
+
+    def encode(self, value: Any) -> bytes:
+        """ Encodes the state values (or a single state field) """
+        payload = self.codec.dumps(to_plain(value))
+        compressor = self.compressor if len(payload) > self.threshold else self._compressors[0]
+        header = MAGIC + bytes([FORMAT_VERSION, self.codec.codec_id, compressor.compression_id])
+        return header + compressor.compress(payload)
+
+    def decode(self, data: bytes) -> Any:
+        """ Decodes values written by any supported format version """
+        if not data.startswith(MAGIC):
+            return self._migrate_legacy(data)
+
+        version, codec_id, compression_id = data[len(MAGIC):HEADER_SIZE]
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported state format version: {version}")
+        payload = self._compressor(compression_id).decompress(data[HEADER_SIZE:])
+        return self._codec(codec_id).loads(payload)
+
+    def _codec(self, codec_id: int) -> StateCodec:
+        if codec_id not in self._codecs:
+            self._codecs[codec_id] = CODECS[codec_id]()
+        return self._codecs[codec_id]
+
+    def _compressor(self, compression_id: int) -> Compressor:
+        if compression_id not in self._compressors:
+            self._compressors[compression_id] = COMPRESSORS[compression_id]()
+        return self._compressors[compression_id]
+
+    @staticmethod
+    def _migrate_legacy(data: bytes) -> dict:
+        """ Version 0: the whole StateSnapshot as JSON, values in element [0] """
+        return json.loads(data)[0]
@@ -0,0 +1,350 @@
+import json
+import os
+from typing import Iterable, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import WatchError
+
+from src.cache.state_codec import StateSerializer
+from src.cache.task_lock import StaleLeaseError, fence_key, lock_key
+from src.state.sdlc_state import SDLCState
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Task state expires after 24 hours
+STATE_TTL = 86400
+
+# Fields read by status checks
+STATUS_FIELDS = ("status", "current_node", "progress", "next_required_input")
+
+# Encoded fields above this size are stored under their own key
+ARTIFACT_THRESHOLD = int(os.getenv("STATE_ARTIFACT_THRESHOLD", "4096"))
+
+# Hash value marking a field whose value lives in an artifact key
+ARTIFACT_MARKER = b"@artifact"
+
+# Fields that may be stored as artifacts
+ARTIFACT_FIELDS = tuple(SDLCState.__annotations__)
+
+# Responses stored for Idempotency-Key replays expire after 24 hours
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+
+# Prefix of the timing counters of a task -> section of the summary
+TIMING_SECTIONS = {"node": "nodes", "llm": "llm", "queue": "queue"}
+
+
+class StateStore:
+    """
+        Non-blocking task state store on top of a pooled redis.asyncio client.
+
+        Each task is a Redis hash (`{task_id}:state`) with one encoded field per SDLCState
+        key. Large artifacts (design documents, generated code, test cases, ...) are stored
+        under `{task_id}:artifact:{field}` so reads and writes of the small fields never
+        move them. Reads can be projected to a few fields and writes can be partial.
+    """
+
+    def __init__(
+        self,
+        client: Optional[aioredis.Redis] = None,
+        redis_url: str = REDIS_URL,
+        max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+        ttl: int = STATE_TTL,
+        serializer: Optional[StateSerializer] = None,
+        artifact_threshold: int = ARTIFACT_THRESHOLD,
+    ):
+        if client is None:
+            pool = aioredis.ConnectionPool.from_url(redis_url, max_connections=max_connections)
+            client = aioredis.Redis(connection_pool=pool)
+        self.client = client
+        self.ttl = ttl
+        self.serializer = serializer or StateSerializer()
+        self.artifact_threshold = artifact_threshold
+
+    # ----- Keys -----
+
+    @staticmethod
+    def _state_key(task_id: str) -> str:
+        return f"{task_id}:state"
+
+    @staticmethod
+    def _artifact_key(task_id: str, field: str) -> str:
+        return f"{task_id}:artifact:{field}"
+
+    @staticmethod
+    def _job_key(task_id: str) -> str:
+        return f"{task_id}:job"
+
+    @staticmethod
+    def _speculation_key(task_id: str) -> str:
+        return f"{task_id}:speculation"
+
+    @staticmethod
+    def _idempotency_key(task_id: str, key: str) -> str:
+        return f"{task_id}:idempotency:{key}"
+
+    @staticmethod
+    def _timings_key(task_id: str) -> str:
+        return f"{task_id}:timings"
+
+    # ----- Encoding -----
+
+    @staticmethod
+    def _values(state) -> dict:
+        """ Accepts either the state values or a LangGraph StateSnapshot """
+        return state if isinstance(state, dict) else state.values
+
+    @staticmethod
+    def project_status(values: dict) -> dict:
+        """ Projects the fields needed to answer status checks """
+        return {field: values.get(field) for field in STATUS_FIELDS}
+
+    def _queue_fields(self, pipe, task_id: str, values: dict):
+        """
+            Queues the writes of the given fields, moving large ones to artifact keys.
+            Every write refreshes the TTL of the hash and of the artifacts written
+            earlier, so an artifact never expires while its hash still points at it.
+        """
+        state_key = self._state_key(task_id)
+        mapping = {}
+        for field, value in values.items():
+            encoded = self.serializer.encode(value)
+            artifact_key = self._artifact_key(task_id, field)
+            if len(encoded) > self.artifact_threshold:
+                pipe.set(artifact_key, encoded, ex=self.ttl)
+                mapping[field] = ARTIFACT_MARKER
+            else:
+                pipe.delete(artifact_key)
+                mapping[field] = encoded
+        if mapping:
+            pipe.hset(state_key, mapping=mapping)
+        pipe.expire(state_key, self.ttl)
+        for field in ARTIFACT_FIELDS:
+            if field not in values:
+                pipe.expire(self._artifact_key(task_id, field), self.ttl)
+
+    async def _resolve_artifacts(self, task_id: str, raw: dict) -> dict:
+        """ Decodes raw hash fields, loading artifact keys in one pipelined round trip """
+        artifacts = [field for field, value in raw.items() if value == ARTIFACT_MARKER]
+        if artifacts:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for field in artifacts:
+                    pipe.get(self._artifact_key(task_id, field))
+                raw.update(zip(artifacts, await pipe.execute()))
+        return {field: self.serializer.decode(value) for field, value in raw.items() if value is not None}
+
+    # ----- Writes -----
+
+    async def save(self, task_id: str, state):
+        """ Saves every field of the state """
+        async with self.client.pipeline(transaction=True) as pipe:
+            self._queue_fields(pipe, task_id, self._values(state))
+            await pipe.execute()
+
+    async def save_fields(self, task_id: str, values: dict, fencing_token: Optional[int] = None):
+        """
+            Partial write: only the given fields are encoded and sent.
+            With `fencing_token`, the write only goes through while that token holds
+            the task lock, otherwise StaleLeaseError is raised.
+        """
+        if not values:
+            return
+        if fencing_token is None:
+            async with self.client.pipeline(transaction=True) as pipe:
+                self._queue_fields(pipe, task_id, values)
+                await pipe.execute()
+            return
+
+        # Lease renewals touch the lock key and abort the transaction, so retry a few times
+        for _ in range(5):
+            async with self.client.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(lock_key(task_id))
+                    holder = await pipe.get(lock_key(task_id))
+                    if holder is None or int(holder) != fencing_token:
+                        raise StaleLeaseError(f"Write to {task_id} with stale fencing token {fencing_token}")
+                    pipe.multi()
+                    self._queue_fields(pipe, task_id, values)
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+        raise StaleLeaseError(f"Write to {task_id} kept conflicting with the task lock")
+
+    async def save_many(self, states: dict):
+        """ Saves the states of several tasks in one pipelined round trip """
+        async with self.client.pipeline(transaction=False) as pipe:
+            for task_id, state in states.items():
+                self._queue_fields(pipe, task_id, self._values(state))
+            await pipe.execute()
+
+    # ----- Reads -----
+
+    async def get(self, task_id: str, fields: Optional[Iterable[str]] = None) -> Optional[SDLCState]:
+        """
+            Retrieves the state of a task. With `fields`, only those fields are
+            read (HMGET) and returned.
+        """
+        state_key = self._state_key(task_id)
+        if fields is None:
+            raw = await self.client.hgetall(state_key)
+            if not raw:
+                return await self._migrate_legacy_key(task_id)
+            raw = {field.decode(): value for field, value in raw.items()}
+        else:
+            fields = list(fields)
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.exists(state_key)
+                pipe.hmget(state_key, fields)
+                exists, values = await pipe.execute()
+            if not exists:
+                state = await self._migrate_legacy_key(task_id)
+                return SDLCState(**{field: state[field] for field in fields if field in state}) if state else None
+            raw = dict(zip(fields, values))
+        return SDLCState(**await self._resolve_artifacts(task_id, raw))
+
+    async def _migrate_legacy_key(self, task_id: str) -> Optional[SDLCState]:
+        """ Moves a state saved as a single value under `{task_id}` into the hash layout """
+        data = await self.client.get(task_id)
+        if not data:
+            return None
+        values = self.serializer.decode(data)
+        await self.save(task_id, values)
+        await self.client.delete(task_id)
+        return SDLCState(**values)
+
+    async def get_many(self, task_ids: list[str], fields: Optional[Iterable[str]] = None) -> dict[str, Optional[SDLCState]]:
+        """ Retrieves the (projected) states of several tasks """
+        if not task_ids:
+            return {}
+        fields = list(fields) if fields is not None else None
+        async with self.client.pipeline(transaction=False) as pipe:
+            for task_id in task_ids:
+                if fields is None:
+                    pipe.hgetall(self._state_key(task_id))
+                else:
+                    pipe.hmget(self._state_key(task_id), fields)
+            results = await pipe.execute()
+
+        states = {}
+        for task_id, result in zip(task_ids, results):
+            if fields is None:
+                raw = {field.decode(): value for field, value in result.items()}
+            else:
+                raw = dict(zip(fields, result))
+            if all(value is None for value in raw.values()):
+                states[task_id] = None
+                continue
+            states[task_id] = SDLCState(**await self._resolve_artifacts(task_id, raw))
+        return states
+
+    async def exists(self, task_id: str) -> bool:
+        """ Whether a state is stored for the task, migrating a legacy single-key state """
+        if await self.client.exists(self._state_key(task_id)):
+            return True
+        return await self._migrate_legacy_key(task_id) is not None
+
+    # ----- Status -----
+
+    async def save_job_status(self, task_id: str, job_status: str, error: Optional[str] = None):
+        """ Records the state of the background job working on the task """
+        job = {"job_status": job_status, "error": error}
+        await self.client.set(self._job_key(task_id), json.dumps(job), ex=self.ttl)
+
+    async def get_status(self, task_id: str) -> Optional[dict]:
+        """ Reads the status fields and job status without loading the rest of the state """
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hmget(self._state_key(task_id), STATUS_FIELDS)
+            pipe.get(self._job_key(task_id))
+            status_values, job_json = await pipe.execute()
+        if all(value is None for value in status_values) and not job_json:
+            return None
+        status = {
+            field: self.serializer.decode(value) if value is not None else None
+            for field, value in zip(STATUS_FIELDS, status_values)
+        }
+        status.update(json.loads(job_json) if job_json else {})
+        return status
+
+    # ----- Timings -----
+
+    async def add_timings(self, task_id: str, counters: dict[str, float]):
+        """
+            Adds the node and LLM call counters of a run (see WorkflowMetrics.counters)
+            to the task's totals. Increments are atomic, concurrent runs never lose counts.
+        """
+        if not counters:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for field, value in counters.items():
+                pipe.hincrbyfloat(self._timings_key(task_id), field, value)
+            pipe.expire(self._timings_key(task_id), self.ttl)
+            await pipe.execute()
+
+    async def get_timings(self, task_id: str) -> dict:
+        """ The task's totals per graph node and per LLM step """
+        raw = await self.client.hgetall(self._timings_key(task_id))
+        timings = {"nodes": {}, "llm": {}, "queue": {}}
+        for field, value in raw.items():
+            section, name, counter = (field.decode() if isinstance(field, bytes) else field).split(":")
+            timings[TIMING_SECTIONS[section]].setdefault(name, {})[counter] = round(float(value), 6)
+        timings["totals"] = {
+            "node_seconds": round(sum(node.get("seconds", 0) for node in timings["nodes"].values()), 3),
+            **{
+                counter: round(sum(step.get(field, 0) for step in timings["llm"].values()), 6)
+                for counter, field in (("llm_calls", "calls"), ("llm_seconds", "seconds"), ("prompt_tokens", "prompt_tokens"),
+                                       ("completion_tokens", "completion_tokens"), ("cache_hits", "cache_hits"), ("cost", "cost"))
+            },
+        }
+        return timings
+
+    # ----- Speculative results -----
+
+    async def save_speculation(self, task_id: str, record: dict):
+        """ Stores the speculative result of the node following the task's interrupt """
+        await self.client.set(self._speculation_key(task_id), self.serializer.encode(record), ex=self.ttl)
+
+    async def pop_speculation(self, task_id: str) -> Optional[dict]:
+        """ Reads and removes the speculative result of the task """
+        data = await self.client.getdel(self._speculation_key(task_id))
+        return self.serializer.decode(data) if data else None
+
+    async def delete_speculation(self, task_id: str):
+        await self.client.delete(self._speculation_key(task_id))
+
+    # ----- Idempotency keys -----
+
+    async def claim_idempotency_key(self, task_id: str, key: str, fingerprint: str) -> Optional[dict]:
+        """
+            Marks the request with the Idempotency-Key as in progress. Returns None when
+            it was claimed, or the record of the earlier request with the same key.
+        """
+        record = json.dumps({"status": "processing", "fingerprint": fingerprint})
+        redis_key = self._idempotency_key(task_id, key)
+        while True:
+            if await self.client.set(redis_key, record, nx=True, ex=IDEMPOTENCY_TTL):
+                return None
+            existing = await self.client.get(redis_key)
+            # Otherwise the earlier request released the key in between, claim it again
+            if existing:
+                return json.loads(existing)
+
+    async def save_idempotent_response(self, task_id: str, key: str, fingerprint: str, status_code: int, body):
+        """ Stores the response replayed for later requests with the Idempotency-Key """
+        record = {"status": "completed", "fingerprint": fingerprint, "status_code": status_code, "body": body}
+        await self.client.set(self._idempotency_key(task_id, key), json.dumps(record), ex=IDEMPOTENCY_TTL)
+
+    async def release_idempotency_key(self, task_id: str, key: str):
+        """ Drops the claim of a request that failed, so it can be retried """
+        await self.client.delete(self._idempotency_key(task_id, key))
+
+    async def delete(self, task_id: str):
+        """ Deletes the state, artifacts, job status, timings, speculative result and fencing counter of a task """
+        artifact_keys = [self._artifact_key(task_id, field) for field in ARTIFACT_FIELDS]
+        await self.client.delete(
+            self._state_key(task_id), self._job_key(task_id), self._timings_key(task_id), self._speculation_key(task_id),
+            fence_key(task_id), *artifact_keys
+        )
+
+    async def close(self):
+        """ Releases the pooled connections """
+        await self.client.aclose()
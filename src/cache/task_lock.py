@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+# A lease not renewed within this many milliseconds is free for another worker
+LOCK_LEASE_MS = int(os.getenv("TASK_LOCK_LEASE_MS", "30000"))
+
+# The fencing counter of a task outlives its state (24 hours), refreshed on every acquisition
+FENCE_TTL = int(os.getenv("TASK_FENCE_TTL", "86400"))
+
+# How long a request waits for a task held by another request before giving up
+LOCK_WAIT_SECONDS = float(os.getenv("TASK_LOCK_WAIT_SECONDS", "0"))
+
+# Extends the lease only while it is still held by the given token
+_RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Deletes the lease only while it is still held by the given token
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def lock_key(task_id: str) -> str:
+    return f"{task_id}:lock"
+
+
+def fence_key(task_id: str) -> str:
+    return f"{task_id}:fence"
+
+
+class TaskBusyError(RuntimeError):
+    """ Raised when another request holds the lease of the task """
+
+    def __init__(self, task_id: str):
+        super().__init__(f"Another request is already working on {task_id}")
+        self.task_id = task_id
+
+
+class StaleLeaseError(RuntimeError):
+    """ Raised when a write is attempted with a lease that expired or was taken over """
+
+
+class TaskLease:
+    """
+        A held task lock. `token` is the fencing token: it increases with every
+        acquisition of the task's lock, so a write carrying an older token can be
+        told apart from the current holder's writes and rejected.
+    """
+
+    def __init__(self, task_id: str, token: int):
+        self.task_id = task_id
+        self.token = token
+        self.lost = False
+
+
+class TaskLock:
+    """
+        Per-task lease lock in Redis.
+
+        The lock key holds the fencing token of the holder and expires after
+        `lease_ms`; `hold()` renews it in the background while the work runs, so a
+        crashed worker frees the task within one lease period. StateStore writes
+        that pass the token are rejected once another holder took over.
+    """
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        lease_ms: int = LOCK_LEASE_MS,
+        wait_seconds: float = LOCK_WAIT_SECONDS,
+        fence_ttl: int = FENCE_TTL,
+    ):
+        self.client = client
+        self.lease_ms = lease_ms
+        self.wait_seconds = wait_seconds
+        self.fence_ttl = fence_ttl
+        self._renew = client.register_script(_RENEW)
+        self._release = client.register_script(_RELEASE)
+
+    async def acquire(self, task_id: str) -> TaskLease:
+        """ Takes the lease of the task, waiting up to `wait_seconds` for the current holder """
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            # The token is drawn first so every holder gets a higher token than the previous one
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.incr(fence_key(task_id))
+                pipe.expire(fence_key(task_id), self.fence_ttl)
+                token, _ = await pipe.execute()
+            if await self.client.set(lock_key(task_id), token, nx=True, px=self.lease_ms):
+                return TaskLease(task_id, token)
+            if time.monotonic() >= deadline:
+                raise TaskBusyError(task_id)
+            await asyncio.sleep(0.1)
+
+    async def renew(self, lease: TaskLease) -> bool:
+        """ Extends the lease, returns False when it was lost """
+        renewed = await self._renew(keys=[lock_key(lease.task_id)], args=[lease.token, self.lease_ms])
+        if not renewed:
+            lease.lost = True
+        return bool(renewed)
+
+    async def release(self, lease: TaskLease):
+        await self._release(keys=[lock_key(lease.task_id)], args=[lease.token])
+
+    async def check(self, lease: TaskLease):
+        """ Raises StaleLeaseError when the lease is no longer held """
+        holder = await self.client.get(lock_key(lease.task_id))
+        if lease.lost or holder is None or int(holder) != lease.token:
+            lease.lost = True
+            raise StaleLeaseError(f"Lease {lease.token} on {lease.task_id} is no longer held")
+
+    async def _keep_alive(self, lease: TaskLease):
+        while True:
+            await asyncio.sleep(self.lease_ms / 3000)
+            if not await self.renew(lease):
+                print(f"Lost the lease of {lease.task_id} (token {lease.token})")
+                return
+
+    @asynccontextmanager
+    async def hold(self, task_id: str, lease: Optional[TaskLease] = None):
+        """
+            Holds the lease of the task for the duration of the block, renewing it in the
+            background. An already acquired `lease` can be handed in.
+        """
+        lease = lease or await self.acquire(task_id)
+        keep_alive = asyncio.create_task(self._keep_alive(lease))
+        try:
+            yield lease
+        finally:
+            keep_alive.cancel()
+            await asyncio.gather(keep_alive, return_exceptions=True)
+            await self.release(lease)
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from pydantic import BaseModel, Field
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+        Counts tokens with tiktoken when its encoding is available, otherwise
+        estimates ~4 characters per token
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def extract_outline(text: str, paragraph_chars: int = 300) -> str:
+    """
+        Section-level extraction: for Markdown keeps every heading with the start of
+        its first paragraph, for code keeps imports, decorators and def/class lines
+    """
+    lines = text.splitlines()
+    if any(line.lstrip().startswith("#") and not line.lstrip().startswith("#!") for line in lines) and not _looks_like_code(lines):
+        outline = []
+        budget = 0
+        for line in lines:
+            if line.lstrip().startswith("#"):
+                outline.append(line)
+                budget = paragraph_chars
+            elif budget > 0 and line.strip():
+                outline.append(line[:budget])
+                budget -= len(line)
+        return "\n".join(outline)
+
+    signature = re.compile(r"^\s*(@|def |async def |class |import |from \S+ import )")
+    return "\n".join(line for line in lines if signature.match(line))
+
+
+def _looks_like_code(lines: list[str]) -> bool:
+    code_lines = sum(1 for line in lines if re.match(r"^\s*(def |class |import |from \S+ import )", line))
+    return code_lines > 0 and code_lines * 10 >= len([line for line in lines if line.strip()])
+
+
+def truncate_to_tokens(text: str, max_tokens: int, token_counter=count_tokens) -> str:
+    """ Cuts the text down to about `max_tokens`, marking the cut """
+    if max_tokens <= 0:
+        return ""
+    tokens = token_counter(text)
+    if tokens <= max_tokens:
+        return text
+    keep = int(len(text) * max_tokens / tokens * 0.95)
+    return text[:keep].rstrip() + "\n... [truncated to fit the context budget]"
+
+
+class SummaryCache:
+    """
+        Least recently used cache of section summaries, keyed by content hash and
+        bounded to `max_entries` so a long-running server does not grow it forever
+    """
+
+    def __init__(self, max_entries: int = int(os.getenv("CONTEXT_SUMMARY_CACHE_ENTRIES", "512"))):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        summary = self._entries.get(key)
+        if summary is not None:
+            self._entries.move_to_end(key)
+        return summary
+
+    def put(self, key: str, summary: str):
+        self._entries[key] = summary
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ContextSection(BaseModel):
+    name: str = Field(..., description="Name of the prompt section")
+    content: str = Field(..., description="Full content of the section")
+    priority: int = Field(1, description="Lower numbers are kept verbatim the longest")
+    compressible: bool = Field(True, description="Whether the section may be summarized, outlined or truncated")
+
+
+class ContextBuilder:
+    """
+        Assembles prompt sections within a token budget.
+
+        When the sections do not fit, the least important compressible sections are
+        replaced by a summary (cached per content hash, produced by `summarizer` when one
+        is configured) or else by their section-level outline, and truncated as a last resort.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int,
+        token_counter: Callable[[str], int] = count_tokens,
+        summary_cache: Optional[SummaryCache] = None,
+        summarizer: Optional[Callable[[str, int], Awaitable[str]]] = None,
+    ):
+        self.budget_tokens = budget_tokens
+        self.token_counter = token_counter
+        self.summary_cache = summary_cache if summary_cache is not None else SummaryCache()
+        self.summarizer = summarizer
+        self.sections: list[ContextSection] = []
+
+    def add(self, name: str, content: str, priority: int = 1, compressible: bool = True) -> "ContextBuilder":
+        """ Adds a section to the prompt context """
+        self.sections.append(ContextSection(name=name, content=content or "", priority=priority, compressible=compressible))
+        return self
+
+    @staticmethod
+    def _digest(content: str) -> str:
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    async def _summary(self, content: str, target_tokens: int) -> Optional[str]:
+        key = self._digest(content)
+        summary = self.summary_cache.get(key)
+        if summary is None and self.summarizer is not None:
+            summary = await self.summarizer(content, target_tokens)
+            self.summary_cache.put(key, summary)
+        return summary
+
+    async def fit(self) -> dict[str, str]:
+        """ Returns the content of every section, reduced so the total fits the budget """
+        fitted = {section.name: section.content for section in self.sections}
+        tokens = {name: self.token_counter(content) for name, content in fitted.items()}
+        if sum(tokens.values()) <= self.budget_tokens:
+            return fitted
+
+        candidates = sorted(
+            (section for section in self.sections if section.compressible),
+            key=lambda section: section.priority,
+            reverse=True,
+        )
+        print(f"----- Context over budget ({sum(tokens.values())} > {self.budget_tokens} tokens), compressing -----")
+
+        for section in candidates:
+            overflow = sum(tokens.values()) - self.budget_tokens
+            if overflow <= 0:
+                return fitted
+            target = max(tokens[section.name] - overflow, 0)
+            summary = await self._summary(section.content, target)
+            reduced = summary if summary is not None else extract_outline(section.content)
+            reduced_tokens = self.token_counter(reduced)
+            if reduced_tokens < tokens[section.name]:
+                fitted[section.name], tokens[section.name] = reduced, reduced_tokens
+
+        for section in candidates:
+            overflow = sum(tokens.values()) - self.budget_tokens
+            if overflow <= 0:
+                break
+            fitted[section.name] = truncate_to_tokens(fitted[section.name], tokens[section.name] - overflow, self.token_counter)
+            tokens[section.name] = self.token_counter(fitted[section.name])
+        return fitted
@@ -0,0 +1,148 @@
+import math
+import re
+from collections import Counter
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Very common words that carry no signal for section retrieval
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "should shall can must user users system".split()
+)
+
+
+# Suffixes stripped by the light stemmer, longest first
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ed", "es", "s")
+
+
+def _stem(term: str) -> str:
+    if term.endswith(("ss", "us", "is")):
+        return term
+    for suffix in _SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            return term[:-len(suffix)] + ("y" if suffix == "ies" else "")
+    return term
+
+
+def tokenize(text: str) -> list[str]:
+    """ Lower-cased, lightly stemmed alphanumeric terms without stop words """
+    return [_stem(term) for term in _TOKEN.findall(text.lower()) if term not in STOP_WORDS and len(term) > 1]
+
+
+class DesignSection(BaseModel):
+    source: str = Field(..., description="Document the section comes from (functional / technical)")
+    heading: str = Field(..., description="The '##' heading of the section")
+    content: str = Field(..., description="Markdown content of the section, heading included")
+
+
+def split_sections(markdown: str, source: str) -> list[DesignSection]:
+    """
+        Splits a design document on its '##' headings. Text before the first
+        section (title, preamble) is kept as its own section.
+    """
+    sections = []
+    heading, lines = "", []
+    for line in (markdown or "").splitlines():
+        if re.match(r"^\s*##\s", line):
+            if any(text.strip() for text in lines):
+                sections.append(DesignSection(source=source, heading=heading, content="\n".join(lines).strip()))
+            heading, lines = line.strip().lstrip("#").strip(), [line]
+        else:
+            lines.append(line)
+    if any(text.strip() for text in lines):
+        sections.append(DesignSection(source=source, heading=heading, content="\n".join(lines).strip()))
+    return sections
+
+
+class SectionIndex:
+    """
+        Okapi BM25 index over the '##' sections of the design documents.
+
+        Built once when the design document is created and kept in the task state
+        as a plain dict (`to_dict` / `from_dict`), so prompts can pull the sections
+        relevant to a user story or module without sending whole documents.
+    """
+
+    def __init__(
+        self,
+        sections: list[DesignSection],
+        term_freqs: Optional[list[dict]] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        heading_boost: int = 2,
+    ):
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+        if term_freqs is None:
+            # Heading terms are counted extra times, they describe the whole section
+            term_freqs = [
+                tokenize(section.content) + tokenize(section.heading) * heading_boost
+                for section in sections
+            ]
+        self.term_freqs = [Counter(freqs) for freqs in term_freqs]
+        self.lengths = [sum(freqs.values()) for freqs in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freqs = Counter(term for freqs in self.term_freqs for term in freqs)
+        self.idf = {
+            term: math.log(1 + (len(sections) - freq + 0.5) / (freq + 0.5))
+            for term, freq in doc_freqs.items()
+        }
+
+    @classmethod
+    def from_documents(cls, documents: dict[str, str], **kwargs) -> "SectionIndex":
+        """ Builds the index from {source: markdown} """
+        sections = [section for source, markdown in documents.items() for section in split_sections(markdown, source)]
+        return cls(sections, **kwargs)
+
+    def score(self, query: str) -> list[float]:
+        """ BM25 score of every section for the query """
+        terms = set(tokenize(query))
+        scores = []
+        for freqs, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            scores.append(sum(
+                self.idf[term] * freqs[term] * (self.k1 + 1) / (freqs[term] + norm)
+                for term in terms if term in freqs
+            ))
+        return scores
+
+    def search(self, query: str, k: int = 3, source: Optional[str] = None) -> list[DesignSection]:
+        """ Top-k sections for the query, optionally restricted to one document """
+        ranked = sorted(
+            ((score, position) for position, score in enumerate(self.score(query))
+             if score > 0 and (source is None or self.sections[position].source == source)),
+            reverse=True,
+        )
+        return [self.sections[position] for _, position in ranked[:k]]
+
+    def retrieve(self, queries: list[str], k: int = 3, source: Optional[str] = None) -> list[DesignSection]:
+        """
+            Union of the top-k sections of every query, in document order
+        """
+        selected = set()
+        for query in queries:
+            selected.update(id(section) for section in self.search(query, k=k, source=source))
+        return [section for section in self.sections if id(section) in selected]
+
+    def to_dict(self) -> dict:
+        """ Plain representation stored with the task state """
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "sections": [section.model_dump() for section in self.sections],
+            "term_freqs": [dict(freqs) for freqs in self.term_freqs],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SectionIndex":
+        """ Restores an index saved with `to_dict` without re-tokenizing the sections """
+        return cls(
+            [DesignSection(**section) for section in data["sections"]],
+            term_freqs=data["term_freqs"],
+            k1=data["k1"],
+            b=data["b"],
+        )
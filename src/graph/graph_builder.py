@@ -3,13 +3,14 @@ from src.llm.groq_llm import GroqLLM
 from src.nodes.design_doc_node import DesignNode
 from src.nodes.sdlc_node import SDLCNode
 from src.state.sdlc_state import SDLCState
-from langgraph.checkpoint.memory import MemorySaver
+from src.cache.redis_checkpointer import RedisSaver
 
 class GraphBuilder:
-    def __init__(self, llm):
+    def __init__(self, llm, checkpointer=None):
         self.llm = llm
         self.builder = StateGraph(SDLCState)
-        self.memory = MemorySaver()
+        # Checkpoints live in redis so any worker can resume any task
+        self.checkpointer = checkpointer or RedisSaver()
 
     def build_graph(self):
         """
@@ -26,6 +27,7 @@ class GraphBuilder:
         self.builder.add_node("create_design_document", self.design_node.create_design_document)
         self.builder.add_node("design_review",self.design_node.design_review) # Routing Node
         self.builder.add_node("generate_code", self.design_node.generate_code)
+        self.builder.add_node("static_analysis", self.design_node.static_analysis)
         self.builder.add_node("code_review", self.design_node.code_review) # Routing Node
         self.builder.add_node("generate_security_recommendations", self.design_node.security_recommendations)
         self.builder.add_node("security_review", self.design_node.security_review) # Routing Node
@@ -58,7 +60,15 @@ class GraphBuilder:
             }
         )
 
-        self.builder.add_edge("generate_code", "code_review")
+        self.builder.add_edge("generate_code", "static_analysis")
+        self.builder.add_conditional_edges(
+            "static_analysis",
+            self.design_node.static_analysis_router,
+            {
+                "syntax_error": "generate_code",
+                "reviewed": "code_review"
+            }
+        )
         self.builder.add_conditional_edges(
             "code_review",
             self.design_node.code_review_router,
@@ -100,6 +110,20 @@ class GraphBuilder:
 
         return self.builder
 
+    def speculation_targets(self):
+        """
+            Node that runs when each review interrupt is approved:
+            {interrupt node: (next node, node function)}
+        """
+        return {
+            "product_owner_review_decision": ("create_design_document", self.design_node.create_design_document),
+            "design_review": ("generate_code", self.design_node.generate_code),
+            "code_review": ("generate_security_recommendations", self.design_node.security_recommendations),
+            "security_review": ("generate_test_cases", self.design_node.generate_test_cases),
+            "test_cases_review": ("qa_testing", self.design_node.qa_testing),
+            "qa_testing_review": ("deployment", self.design_node.deployment),
+        }
+
     def setup_graph(self):
         self.graph = self.build_graph()
         return self.graph.compile(
@@ -111,7 +135,7 @@ class GraphBuilder:
                 'security_review',
                 'test_cases_review',
                 'qa_testing_review'
-            ], checkpointer=self.memory
+            ], checkpointer=self.checkpointer
         )
     
 
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable
+
+from src.cache.state_store import StateStore
+from src.jobs.run_registry import RunCancelledError
+from src.metrics.workflow_metrics import QUEUE_WAIT
+
+
+class JobRunner:
+    """
+        Local pool of asyncio workers that run workflow stages in the background.
+
+        Each job resumes the graph for one task; its progress is recorded in the
+        StateStore (`queued` -> `running` -> `completed` / `failed` / `cancelled`) so
+        clients can poll `GET /sdlc/workflow/{task_id}` instead of holding the connection open.
+    """
+
+    def __init__(self, state_store: StateStore, workers: int = int(os.getenv("WORKFLOW_WORKERS", "4"))):
+        self.state_store = state_store
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.active: set[str] = set()
+        self.running: set[str] = set()
+        self.cancelled: set[str] = set()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        """ Starts the worker tasks """
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+
+    async def stop(self):
+        """ Cancels the worker tasks """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def is_active(self, task_id: str) -> bool:
+        """ True while a job for the task is queued or running """
+        return task_id in self.active
+
+    async def submit(self, task_id: str, job: Callable[[], Awaitable]) -> bool:
+        """
+            Enqueues a job for the task. Returns False when the task already has
+            a queued or running job.
+        """
+        if task_id in self.active:
+            return False
+        self.active.add(task_id)
+        await self.state_store.save_job_status(task_id, "queued")
+        await self.queue.put((task_id, job, time.monotonic()))
+        return True
+
+    def cancel_queued(self, task_id: str) -> bool:
+        """ Drops the queued job of the task before a worker picks it up """
+        if task_id not in self.active or task_id in self.running:
+            return False
+        self.cancelled.add(task_id)
+        return True
+
+    async def _worker(self, index: int):
+        while True:
+            task_id, job, enqueued_at = await self.queue.get()
+            if task_id in self.cancelled:
+                self.cancelled.discard(task_id)
+                self.active.discard(task_id)
+                self.queue.task_done()
+                await self.state_store.save_job_status(task_id, "cancelled")
+                continue
+            self.running.add(task_id)
+            try:
+                waited = time.monotonic() - enqueued_at
+                print(f"Worker {index} picked up {task_id} after {waited:.2f}s in queue")
+                QUEUE_WAIT.labels("jobs").observe(waited)
+                await self.state_store.add_timings(task_id, {"queue:jobs:seconds": waited, "queue:jobs:count": 1})
+                await self.state_store.save_job_status(task_id, "running")
+                await job()
+                await self.state_store.save_job_status(task_id, "completed")
+            except asyncio.CancelledError:
+                await self.state_store.save_job_status(task_id, "cancelled")
+                raise
+            except RunCancelledError as e:
+                print(f"Background job for {task_id} stopped: {e.reason}")
+                await self.state_store.save_job_status(task_id, "cancelled", error=e.reason)
+            except Exception as e:
+                print(f"Background job for {task_id} failed: {e}")
+                await self.state_store.save_job_status(task_id, "failed", error=str(e))
+            finally:
+                self.active.discard(task_id)
+                self.running.discard(task_id)
+                self.queue.task_done()
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from src.cache.task_lock import TaskLease, lock_key
+
+# How often a run checks for a cancel request and for a disconnected client
+WATCH_INTERVAL = float(os.getenv("RUN_WATCH_INTERVAL", "0.5"))
+
+# Cancel requests outlive a few watch intervals, then lapse
+CANCEL_TTL = int(os.getenv("RUN_CANCEL_TTL", "30"))
+
+
+def cancel_key(task_id: str) -> str:
+    return f"{task_id}:cancel"
+
+
+class RunCancelledError(RuntimeError):
+    """ Raised in place of CancelledError when a run was cancelled on purpose """
+
+    def __init__(self, task_id: str, reason: str):
+        super().__init__(f"Run of {task_id} cancelled: {reason}")
+        self.task_id = task_id
+        self.reason = reason
+
+
+class Run:
+    """ A graph run in progress in this process """
+
+    def __init__(self, task_id: str, lease: TaskLease, task: asyncio.Task):
+        self.task_id = task_id
+        self.lease = lease
+        self.task = task
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str):
+        if self.reason is None:
+            self.reason = reason
+            self.task.cancel()
+
+
+class RunRegistry:
+    """
+        Tracks the graph runs of this process so they can be cancelled.
+
+        A run is cancelled when its HTTP client disconnects, or when
+        `DELETE /sdlc/workflow/{task_id}/run` arrives on any worker: the cancel request is
+        a Redis key holding the fencing token of the run's task lease, polled by the run,
+        so it only ever stops the run that held the lease when it was requested.
+
+        Cancellation is plain asyncio cancellation of the run's task: it propagates into
+        the running nodes and their LLM HTTP calls, and the graph checkpoint stays at the
+        last completed node.
+    """
+
+    def __init__(self, client: aioredis.Redis, interval: float = WATCH_INTERVAL):
+        self.client = client
+        self.interval = interval
+        self._runs: dict[str, Run] = {}
+
+    def is_running(self, task_id: str) -> bool:
+        return task_id in self._runs
+
+    async def _watch(self, run: Run, request=None):
+        while True:
+            await asyncio.sleep(self.interval)
+            if request is not None and await request.is_disconnected():
+                print(f"Client of {run.task_id} disconnected, cancelling the run")
+                run.cancel("client disconnected")
+                return
+            requested = await self.client.get(cancel_key(run.task_id))
+            if requested is not None and int(requested) == run.lease.token:
+                print(f"Cancel requested for {run.task_id}, cancelling the run")
+                run.cancel("cancel requested")
+                return
+
+    @asynccontextmanager
+    async def track(self, task_id: str, lease: TaskLease, request=None):
+        """
+            Makes the current asyncio task cancellable as the run of the task. A run
+            cancelled through the registry raises RunCancelledError out of the block.
+        """
+        run = Run(task_id, lease, asyncio.current_task())
+        self._runs[task_id] = run
+        watcher = asyncio.create_task(self._watch(run, request))
+        try:
+            yield run
+        except asyncio.CancelledError:
+            # Only our own cancellation is turned into RunCancelledError
+            if run.reason is None or run.task.uncancel() > 0:
+                raise
+            raise RunCancelledError(task_id, run.reason) from None
+        finally:
+            watcher.cancel()
+            if self._runs.get(task_id) is run:
+                del self._runs[task_id]
+        if run.reason is not None:
+            # The cancel landed as the run finished: absorb it rather than fail the caller's cleanup
+            try:
+                await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                if run.task.uncancel() > 0:
+                    raise
+
+    async def cancel(self, task_id: str) -> bool:
+        """
+            Requests the cancellation of the task's run, wherever it runs.
+            Returns False when no run of the task is in progress.
+        """
+        holder = await self.client.get(lock_key(task_id))
+        if holder is not None:
+            await self.client.set(cancel_key(task_id), holder, ex=CANCEL_TTL)
+        run = self._runs.get(task_id)
+        if run is not None:
+            run.cancel("cancel requested")
+        return holder is not None or run is not None
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from langchain_core.runnables import RunnableLambda
+
+from src.cache.state_codec import to_plain
+from src.cache.state_store import StateStore
+from src.llm.usage_callback import TokenLimitExceeded, TokenUsageCallback
+from src.metrics.workflow_metrics import WorkflowMetrics
+
+# Status field set by the approval of each review interrupt
+APPROVAL_FIELDS = {
+    "product_owner_review_decision": "product_decision",
+    "code_review": "code_review_status",
+    "security_review": "security_review_status",
+    "test_cases_review": "test_case_review_status",
+    "qa_testing_review": "qa_testing_status",
+}
+
+
+def approval_update(interrupt_node: str, values: dict) -> dict:
+    """ The state update recorded when the reviewer approves at `interrupt_node` """
+    if interrupt_node == "design_review":
+        design_documents = to_plain(values.get("design_documents") or {})
+        return {"design_documents": {**design_documents, "review_status": "approved", "feedback_reason": ""}}
+    return {APPROVAL_FIELDS[interrupt_node]: "approved"}
+
+
+class SpeculativeExecutor:
+    """
+        Runs the node that follows an approval while the task waits at a review interrupt.
+
+        The result is stored in the StateStore, keyed by the checkpoint it was computed
+        from. When the reviewer approves at that same checkpoint the result is committed
+        as the node's writes (`aupdate_state(..., as_node=next_node)`) instead of running
+        the node again; on feedback it is discarded.
+
+        Extra spend is bounded by the number of concurrent speculations, a token cap
+        per speculation and a rolling hourly token budget.
+    """
+
+    def __init__(
+        self,
+        graph,
+        targets: dict[str, tuple[str, Callable]],
+        state_store: StateStore,
+        max_concurrency: int = int(os.getenv("SPECULATION_CONCURRENCY", "2")),
+        max_tokens: int = int(os.getenv("SPECULATION_MAX_TOKENS", "20000")),
+        hourly_token_budget: int = int(os.getenv("SPECULATION_TOKEN_BUDGET", "200000")),
+    ):
+        self.graph = graph
+        self.targets = targets
+        self.state_store = state_store
+        self.max_concurrency = max_concurrency
+        self.max_tokens = max_tokens
+        self.hourly_token_budget = hourly_token_budget
+        self._running: dict[str, tuple[str, asyncio.Task]] = {}
+        self._spent: deque = deque()
+
+    def _tokens_spent(self) -> int:
+        """ Tokens spent on speculation during the last hour """
+        cutoff = time.monotonic() - 3600
+        while self._spent and self._spent[0][0] < cutoff:
+            self._spent.popleft()
+        return sum(tokens for _, tokens in self._spent)
+
+    def _active(self) -> int:
+        return sum(1 for _, task in self._running.values() if not task.done())
+
+    async def schedule(self, task_id: str, thread: dict):
+        """ Starts speculating on the task if it stopped at a review interrupt """
+        snapshot = await self.graph.aget_state(thread)
+        if not snapshot.next or snapshot.next[0] not in self.targets:
+            return
+        interrupt_node = snapshot.next[0]
+        if self._active() >= self.max_concurrency:
+            print(f"Speculation for {task_id} skipped: {self.max_concurrency} already running")
+            return
+        if self._tokens_spent() + self.max_tokens > self.hourly_token_budget:
+            print(f"Speculation for {task_id} skipped: hourly token budget spent")
+            return
+
+        await self.discard(task_id)
+        checkpoint_id = snapshot.config["configurable"]["checkpoint_id"]
+        task = asyncio.create_task(self._speculate(task_id, checkpoint_id, interrupt_node, snapshot.values))
+        self._running[task_id] = (checkpoint_id, task)
+
+    async def _speculate(self, task_id: str, checkpoint_id: str, interrupt_node: str, values: dict):
+        next_node, node_function = self.targets[interrupt_node]
+        print(f"----- Speculatively running {next_node} for {task_id} while it waits at {interrupt_node} ----")
+        usage = TokenUsageCallback(limit=self.max_tokens)
+        metrics = WorkflowMetrics()
+        started = time.monotonic()
+        try:
+            update = await RunnableLambda(node_function).ainvoke(
+                {**values, **approval_update(interrupt_node, values)},
+                config={"callbacks": [usage, metrics], "run_name": f"speculative_{next_node}", "metadata": {"speculative": True, "sdlc_step": next_node}},
+            )
+        except TokenLimitExceeded as e:
+            print(f"Speculation for {task_id} aborted: {e}")
+            return
+        except Exception as e:
+            print(f"Speculation for {task_id} failed: {e}")
+            return
+        finally:
+            self._spent.append((time.monotonic(), usage.total_tokens))
+            # Speculative spend counts towards the task whether or not the result gets used
+            await self.state_store.add_timings(task_id, metrics.counters())
+
+        if usage.exceeded:
+            # A node that handles LLM errors itself (e.g. per-chunk reviews) finished with degraded results
+            print(f"Speculation for {task_id} dropped: {usage.total_tokens} tokens over the limit of {self.max_tokens}")
+            return
+
+        await self.state_store.save_speculation(task_id, {
+            "checkpoint_id": checkpoint_id,
+            "interrupt_node": interrupt_node,
+            "next_node": next_node,
+            "update": update,
+            "tokens": usage.total_tokens,
+            "duration": time.monotonic() - started,
+        })
+        print(f"----- Speculative {next_node} for {task_id} ready ({usage.total_tokens} tokens) ----")
+
+    async def take(self, task_id: str, checkpoint_id: str, interrupt_node: str) -> Optional[dict]:
+        """
+            The speculative result computed at `checkpoint_id`, if any. A speculation
+            still running in this process is awaited, it is ahead of a fresh run.
+        """
+        running = self._running.pop(task_id, None)
+        if running is not None:
+            running_checkpoint, task = running
+            if running_checkpoint == checkpoint_id:
+                await asyncio.gather(task, return_exceptions=True)
+            else:
+                task.cancel()
+
+        record = await self.state_store.pop_speculation(task_id)
+        if not record or record["checkpoint_id"] != checkpoint_id or record["interrupt_node"] != interrupt_node:
+            return None
+        print(f"----- Committing speculative {record['next_node']} for {task_id} (saved {record['duration']:.1f}s) ----")
+        return record
+
+    async def discard(self, task_id: str) -> bool:
+        """ Cancels and drops the speculation of the task, returns True when one was still running """
+        running = self._running.pop(task_id, None)
+        if running is not None:
+            running[1].cancel()
+        await self.state_store.delete_speculation(task_id)
+        return running is not None and not running[1].done()
+
+    async def stop(self):
+        """ Cancels every running speculation """
+        tasks = [task for _, task in self._running.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._running.clear()
@@ -1,15 +1,20 @@
 from langchain_groq import ChatGroq
 import os 
+from typing import Optional
+from langchain_core.caches import BaseCache
 from dotenv import load_dotenv
 
 class GroqLLM:
     def __init__(self):
         load_dotenv()
 
-    def get_llm(self):
+    def get_llm(self, cache: Optional[BaseCache] = None):
+        """
+            Returns the chat model, answering repeated prompts from `cache` when given
+        """
         try: 
             self.groq_api_key = os.getenv("GROQ_API_KEY")
-            llm = ChatGroq(api_key=self.groq_api_key, model='qwen-2.5-32b')
+            llm = ChatGroq(api_key=self.groq_api_key, model='qwen-2.5-32b', cache=cache)
             return llm
         except Exception as e:
             raise ValueError(f"Error occurred with exception: {e}")
\ No newline at end of file
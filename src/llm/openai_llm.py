@@ -1,5 +1,7 @@
 from langchain_groq import ChatGroq
 import os 
+from typing import Optional
+from langchain_core.caches import BaseCache
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 
@@ -7,10 +9,13 @@ class OpenAILLM:
     def __init__(self):
         load_dotenv()
 
-    def get_llm(self):
+    def get_llm(self, cache: Optional[BaseCache] = None):
+        """
+            Returns the chat model, answering repeated prompts from `cache` when given
+        """
         try: 
             self.openai_api_key = os.getenv("OPENAI_API_KEY")
-            llm = ChatOpenAI(api_key=self.openai_api_key, model='gpt-4o')
+            llm = ChatOpenAI(api_key=self.openai_api_key, model='gpt-4o', cache=cache)
             return llm
         except Exception as e:
             raise ValueError(f"Error occurred with exception: {e}")
\ No newline at end of file
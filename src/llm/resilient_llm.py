@@ -0,0 +1,277 @@
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+from src.llm.router_llm import RouterChatModel, call_step
+
+# Whole budget of one LLM call, retries included, and the limit of a single attempt
+DEFAULT_DEADLINE = float(os.getenv("LLM_DEADLINE", "180"))
+ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "90"))
+
+# Per step (or graph node) deadlines in seconds, JSON, e.g. {"generate_code": 240}
+STEP_DEADLINES = json.loads(os.getenv("LLM_STEP_DEADLINES", "{}"))
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+# When a duplicate request is sent: "p95" (the step's observed p95 latency), a number of seconds, or "off"
+HEDGE_AFTER = os.getenv("LLM_HEDGE_AFTER", "p95")
+# Latency samples a step needs before its percentile is trusted
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Share of calls allowed to send a duplicate, bounding the extra spend
+HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+
+# Provider status codes worth another attempt
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+def _retryable(error: BaseException) -> bool:
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in _RETRYABLE_STATUS or status >= 500
+    # Programming errors and invalid inputs fail the same way again
+    return not isinstance(error, (ValueError, TypeError, KeyError, AttributeError, NotImplementedError))
+
+
+def backoff_delay(attempt: int) -> float:
+    """ Exponential backoff with full jitter """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class LatencyTracker:
+    """ Rolling window of call latencies per step """
+
+    def __init__(self, window: int = 200):
+        self.samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, step: str, seconds: float):
+        self.samples[step].append(seconds)
+
+    def percentile(self, step: str, quantile: float) -> Optional[float]:
+        samples = sorted(self.samples.get(step, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(int(quantile * len(samples)), len(samples) - 1)]
+
+
+class ResilientChatModel(BaseChatModel):
+    """
+        Wraps a chat model with per-step deadlines, retries and hedged requests.
+
+        Every call gets a deadline (LLM_STEP_DEADLINES for its step, else LLM_DEADLINE);
+        attempts that fail with a retryable error or time out are retried with
+        jittered exponential backoff while the deadline allows.
+
+        When an attempt has not answered after the step's hedge delay, a duplicate is
+        sent (to another backend when the wrapped model is a RouterChatModel); the first
+        answer wins and the other request is cancelled. Streaming calls are retried
+        until their first token but not hedged.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: BaseChatModel
+    deadlines: dict[str, float] = STEP_DEADLINES
+    default_deadline: float = DEFAULT_DEADLINE
+    attempt_timeout: float = ATTEMPT_TIMEOUT
+    max_retries: int = MAX_RETRIES
+    hedge_after: str = HEDGE_AFTER
+    hedge_max_ratio: float = HEDGE_MAX_RATIO
+    _latencies: LatencyTracker = PrivateAttr(default_factory=LatencyTracker)
+    _stats: dict = PrivateAttr(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+
+    @property
+    def _llm_type(self) -> str:
+        return f"resilient-{self.model._llm_type}"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model._identifying_params}
+
+    def bind_tools(self, tools: Sequence[Any], tool_choice: Optional[Any] = None, **kwargs: Any):
+        """ Binds the tools in the format of the wrapped model """
+        return self.bind(**self.model.bind_tools(tools, tool_choice=tool_choice, **kwargs).kwargs)
+
+    # ----- Policy -----
+
+    def _deadline(self, step: Optional[str]) -> float:
+        return float(self.deadlines.get(step, self.default_deadline)) if step else self.default_deadline
+
+    def _hedge_delay(self, step: Optional[str]) -> Optional[float]:
+        if self.hedge_after == "off":
+            return None
+        stats = self._stats["all"]
+        if stats["hedged"] >= self.hedge_max_ratio * max(stats["calls"], 1):
+            return None
+        if self.hedge_after.startswith("p"):
+            return self._latencies.percentile(step or "default", int(self.hedge_after[1:]) / 100)
+        return float(self.hedge_after)
+
+    def _count(self, step: Optional[str], name: str, amount: int = 1):
+        self._stats["all"][name] += amount
+        self._stats[step or "default"][name] += amount
+
+    def metrics(self) -> dict:
+        """ Per step counters and latency percentiles """
+        metrics = {}
+        for step, counters in self._stats.items():
+            metrics[step] = dict(counters)
+            if step != "all":
+                samples = sorted(self._latencies.samples.get(step, ()))
+                if samples:
+                    metrics[step]["p50"] = round(samples[len(samples) // 2], 3)
+                    metrics[step]["p95"] = round(samples[min(int(0.95 * len(samples)), len(samples) - 1)], 3)
+        return metrics
+
+    # ----- Calls -----
+
+    async def _call(self, messages, stop, run_manager, kwargs, chosen: Optional[set] = None, avoid: Optional[set] = None) -> ChatResult:
+        if isinstance(self.model, RouterChatModel):
+            kwargs = {**kwargs, "chosen_backends": chosen, "avoid_backends": avoid}
+        return await self.model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _hedged(self, step, messages, stop, run_manager, kwargs) -> ChatResult:
+        """ One attempt: the primary request plus a duplicate when it is slower than the hedge delay """
+        chosen = set()
+        primary = asyncio.ensure_future(self._call(messages, stop, run_manager, kwargs, chosen=chosen))
+        tasks = {primary: "primary"}
+        try:
+            delay = self._hedge_delay(step)
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done:
+                self._count(step, "hedged")
+                hedge = asyncio.ensure_future(self._call(messages, stop, run_manager, kwargs, avoid=chosen))
+                tasks[hedge] = "hedge"
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1:
+                            self._count(step, f"{tasks[task]}_won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancel the loser (or both, when the deadline cancelled this attempt)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _should_stream(self, *, async_api: bool, run_manager=None, **kwargs: Any) -> bool:
+        """
+            LangChain calls `_astream` without the run manager, so streamed `ainvoke` calls
+            (e.g. graph runs streaming LLM tokens) go through `_agenerate`, which streams with it
+        """
+        if async_api and kwargs.get("stream") is not True:
+            return False
+        return super()._should_stream(async_api=async_api, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if super()._should_stream(async_api=True, run_manager=run_manager, **kwargs):
+            return await agenerate_from_stream(self._astream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+        step = call_step(run_manager)
+        self._count(step, "calls")
+        started = time.monotonic()
+        deadline = started + self._deadline(step)
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                result = await asyncio.wait_for(
+                    self._hedged(step, messages, stop, run_manager, kwargs),
+                    timeout=min(self.attempt_timeout, remaining),
+                )
+                self._latencies.record(step or "default", time.monotonic() - started)
+                return result
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self._count(step, "timeouts")
+                delay = backoff_delay(attempt)
+                if attempt >= self.max_retries or not _retryable(e) or time.monotonic() + delay >= deadline:
+                    self._count(step, "failures")
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise TimeoutError(f"LLM call for step {step} missed its deadline") from e
+                    raise
+                attempt += 1
+                self._count(step, "retries")
+                print(f"LLM call for step {step} failed ({e!r}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        step = call_step(run_manager)
+        self._count(step, "calls")
+        started = time.monotonic()
+        deadline = started + self._deadline(step)
+        attempt = 0
+        while True:
+            # Given a run manager, the wrapped model reports the tokens (LangChain's convention)
+            stream = self.model._astream(messages, stop=stop, run_manager=run_manager, **kwargs).__aiter__()
+            streamed = False
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    # The first token has to arrive within the attempt timeout, later ones within the deadline
+                    timeout = remaining if streamed else min(self.attempt_timeout, remaining)
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        self._latencies.record(step or "default", time.monotonic() - started)
+                        return
+                    streamed = True
+                    yield chunk
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self._count(step, "timeouts")
+                delay = backoff_delay(attempt)
+                # Tokens already streamed cannot be taken back
+                if streamed or attempt >= self.max_retries or not _retryable(e) or time.monotonic() + delay >= deadline:
+                    self._count(step, "failures")
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise TimeoutError(f"LLM stream for step {step} missed its deadline") from e
+                    raise
+                attempt += 1
+                self._count(step, "retries")
+                print(f"LLM stream for step {step} failed ({e!r}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            finally:
+                await stream.aclose()
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """ Synchronous calls go straight to the wrapped model """
+        return self.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
@@ -0,0 +1,417 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from dotenv import load_dotenv
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables.config import ensure_config
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict, Field, PrivateAttr
+
+from src.context.context_builder import count_tokens
+from src.metrics.workflow_metrics import QUEUE_WAIT
+
+# Output tokens reserved in the tokens-per-minute bucket when the call sets no max_tokens
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1000"))
+
+# Longest wait for rate limit capacity before the call fails
+MAX_WAIT_SECONDS = float(os.getenv("LLM_ROUTER_MAX_WAIT", "60"))
+
+# A backend failing this many calls in a row is skipped for COOLDOWN_SECONDS
+FAILURE_THRESHOLD = int(os.getenv("LLM_ROUTER_FAILURE_THRESHOLD", "3"))
+COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTER_COOLDOWN", "30"))
+
+# Backend tag preferred by the LLM calls of each step (`sdlc_step` metadata) or graph node
+DEFAULT_ROUTING_RULES = {
+    "get_code_review_comments": "fast",
+    "static_analysis": "fast",
+    "review_chunk_security": "fast",
+    "explain_test_failures": "fast",
+    "generate_code": "strong",
+    "update_code_incrementally": "strong",
+    "generate_module": "strong",
+    "merge_modules": "strong",
+}
+
+
+def llm_step(name: str) -> dict:
+    """ Run config naming the step of an LLM call, matched by the routing rules """
+    return {"metadata": {"sdlc_step": name}}
+
+
+def call_step(run_manager=None) -> Optional[str]:
+    """
+        Step of the current LLM call: its `sdlc_step` metadata, else the graph node.
+        Calls without a run manager (LangChain's `astream`) get the step of the graph node's config.
+    """
+    metadata = getattr(run_manager, "metadata", None) or ensure_config().get("metadata") or {}
+    return metadata.get("sdlc_step") or metadata.get("langgraph_node")
+
+
+class TokenBucket:
+    """ Per-minute budget refilled continuously, e.g. requests or tokens per minute """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def wait_time(self, amount: float) -> float:
+        """ Seconds until `amount` is available (amounts above the capacity wait for a full bucket) """
+        missing = min(amount, self.capacity) - self.available()
+        return max(missing, 0.0) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def utilization(self) -> float:
+        return 1.0 - self.available() / self.capacity
+
+
+class Backend:
+    """ One chat model (provider, model and API key) with its rate limits and health """
+
+    def __init__(self, name: str, model: BaseChatModel, rpm: int, tpm: int, tags: Sequence[str] = ()):
+        self.name = name
+        self.model = model
+        self.tags = set(tags)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.in_flight = 0
+        self.failures = 0
+        self.unavailable_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unavailable_until
+
+    def wait_time(self, tokens: int) -> float:
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def load(self) -> float:
+        """ Share of the rate limits in use, in-flight calls break ties """
+        return max(self.requests.utilization(), self.tokens.utilization()) + 0.01 * self.in_flight
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self, error: Exception):
+        self.failures += 1
+        if _is_rate_limited(error):
+            # The provider disagrees with our buckets: drain them and back off
+            self.requests.tokens = min(self.requests.tokens, 0)
+            self.unavailable_until = time.monotonic() + _retry_after(error)
+        elif self.failures >= FAILURE_THRESHOLD:
+            self.unavailable_until = time.monotonic() + COOLDOWN_SECONDS
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "tags": sorted(self.tags),
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests_available": round(self.requests.available(), 1),
+            "tokens_available": round(self.tokens.available()),
+            "failures": self.failures,
+        }
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "rate limit" in str(error).lower()
+
+
+def _retry_after(error: Exception) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", COOLDOWN_SECONDS))
+    except (TypeError, ValueError):
+        return COOLDOWN_SECONDS
+
+
+def _message_tokens(messages: list[BaseMessage]) -> int:
+    return sum(count_tokens(message.content if isinstance(message.content, str) else str(message.content)) for message in messages)
+
+
+def _result_tokens(result: ChatResult) -> Optional[int]:
+    """ Tokens reported by the provider, None when it reports none """
+    total = 0
+    for generation in result.generations:
+        usage = getattr(generation.message, "usage_metadata", None)
+        if not usage:
+            return None
+        total += usage.get("total_tokens", 0)
+    return total
+
+
+def model_params(model: BaseChatModel) -> dict:
+    """ Model name and sampling params of a provider model (some only report them in `_default_params`) """
+    return {**getattr(model, "_default_params", {}), **model._identifying_params}
+
+
+class RouterChatModel(BaseChatModel):
+    """
+        Chat model that spreads calls over several backends (providers and API keys).
+
+        Each backend has requests-per-minute and tokens-per-minute token buckets; a call
+        goes to the least loaded healthy backend with capacity for it, and waits for
+        capacity when every backend is saturated. Rate limited or repeatedly failing
+        backends are taken out of rotation for a while and the call fails over to the
+        next backend.
+
+        `rules` map a step name to a backend tag: the step is the `sdlc_step` metadata of
+        the call (set by the DesignNode methods), falling back to the graph node
+        (`langgraph_node`). Steps without a rule, or whose tag has no healthy backend,
+        use every backend.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    backends: list[Any] = Field(default_factory=list)
+    rules: dict[str, str] = Field(default_factory=lambda: dict(DEFAULT_ROUTING_RULES))
+    max_wait: float = MAX_WAIT_SECONDS
+    _lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "sdlc-router"
+
+    @property
+    def _identifying_params(self) -> dict:
+        """ Covers the concrete model and sampling params of every backend, which the LLM cache keys on """
+        backends = [
+            {"name": backend.name, "type": backend.model._llm_type, **model_params(backend.model)}
+            for backend in sorted(self.backends, key=lambda backend: backend.name)
+        ]
+        return {"backends": backends, "rules": self.rules}
+
+    def bind_tools(self, tools: Sequence[Any], tool_choice: Optional[Any] = None, **kwargs: Any):
+        """ Tools in the OpenAI format, understood by every supported provider """
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        if tool_choice == "any" or tool_choice is True:
+            tool_choice = "required"
+        elif isinstance(tool_choice, str) and tool_choice not in ("auto", "none", "required"):
+            tool_choice = {"type": "function", "function": {"name": tool_choice}}
+        if tool_choice:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=formatted, **kwargs)
+
+    # ----- Routing -----
+
+    def _candidates(self, step: Optional[str], excluded: set, avoid: Optional[set] = None) -> list[Backend]:
+        backends = [backend for backend in self.backends if backend.name not in excluded]
+        # Backends to avoid if possible, e.g. the one already serving a hedged call
+        others = [backend for backend in backends if backend.name not in (avoid or ())]
+        if any(backend.healthy for backend in others):
+            backends = others
+        tag = self.rules.get(step) if step else None
+        if tag:
+            tagged = [backend for backend in backends if tag in backend.tags and backend.healthy]
+            if tagged:
+                return tagged
+        healthy = [backend for backend in backends if backend.healthy]
+        # With every backend cooling down, trying one beats failing outright
+        return healthy or sorted(backends, key=lambda backend: backend.unavailable_until)[:1]
+
+    async def _acquire(self, step: Optional[str], tokens: int, excluded: set, avoid: Optional[set] = None) -> Backend:
+        """ Picks the least loaded backend with capacity and charges the call to its buckets """
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        while True:
+            async with self._lock:
+                candidates = self._candidates(step, excluded, avoid)
+                if not candidates:
+                    raise RuntimeError("No LLM backend left to try")
+                ready = [backend for backend in candidates if backend.wait_time(tokens) == 0]
+                if ready:
+                    backend = min(ready, key=lambda backend: backend.load())
+                    backend.requests.consume(1)
+                    backend.tokens.consume(tokens)
+                    backend.in_flight += 1
+                    QUEUE_WAIT.labels("llm").observe(time.monotonic() - started)
+                    return backend
+                wait = min(backend.wait_time(tokens) for backend in candidates)
+            if time.monotonic() + wait > deadline:
+                raise RuntimeError(f"No LLM capacity for step {step!r} within {self.max_wait}s")
+            await asyncio.sleep(min(wait, 1.0))
+
+    def _release(self, backend: Backend, estimated: int, result: Optional[ChatResult]):
+        backend.in_flight -= 1
+        actual = _result_tokens(result) if result is not None else None
+        if actual is not None:
+            # Replace the estimate with the reported usage
+            backend.tokens.consume(actual - estimated)
+
+    def _estimate(self, messages: list[BaseMessage], kwargs: dict) -> int:
+        return _message_tokens(messages) + int(kwargs.get("max_tokens") or EXPECTED_OUTPUT_TOKENS)
+
+    # ----- Calls -----
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        avoid_backends: Optional[set] = None,
+        chosen_backends: Optional[set] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """
+            `avoid_backends` are only used when no other backend can take the call;
+            the names of the backends used are added to `chosen_backends`.
+        """
+        step = call_step(run_manager)
+        estimated = self._estimate(messages, kwargs)
+        tried = set()
+        while True:
+            backend = await self._acquire(step, estimated, tried, avoid_backends)
+            if chosen_backends is not None:
+                chosen_backends.add(backend.name)
+            result = None
+            try:
+                result = await backend.model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                backend.record_success()
+                for generation in result.generations:
+                    generation.message.response_metadata["backend"] = backend.name
+                return result
+            except Exception as e:
+                backend.record_failure(e)
+                tried.add(backend.name)
+                print(f"LLM backend {backend.name} failed for step {step}: {e}")
+                if len(tried) >= len(self.backends):
+                    raise
+            finally:
+                self._release(backend, estimated, result)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        step = call_step(run_manager)
+        estimated = self._estimate(messages, kwargs)
+        tried = set()
+        while True:
+            backend = await self._acquire(step, estimated, tried)
+            started = False
+            try:
+                async for chunk in backend.model._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    started = True
+                    yield chunk
+                backend.record_success()
+                return
+            except Exception as e:
+                backend.record_failure(e)
+                tried.add(backend.name)
+                print(f"LLM backend {backend.name} failed for step {step}: {e}")
+                # Tokens already streamed cannot be taken back
+                if started or len(tried) >= len(self.backends):
+                    raise
+            finally:
+                self._release(backend, estimated, None)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """ Synchronous calls use the least loaded backend without waiting or failover """
+        candidates = self._candidates(call_step(run_manager), set())
+        backend = min(candidates, key=lambda backend: backend.load())
+        estimated = self._estimate(messages, kwargs)
+        backend.requests.consume(1)
+        backend.tokens.consume(estimated)
+        backend.in_flight += 1
+        result = None
+        try:
+            result = backend.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            backend.record_success()
+            return result
+        except Exception as e:
+            backend.record_failure(e)
+            raise
+        finally:
+            self._release(backend, estimated, result)
+
+    def status(self) -> list[dict]:
+        return [backend.status() for backend in self.backends]
+
+
+class RouterLLM:
+    """
+        Builds the router over the configured backends.
+
+        `LLM_BACKENDS` is a JSON list of backends, e.g.
+        `[{"name": "groq-a", "provider": "groq", "model": "qwen-2.5-32b", "api_key_env": "GROQ_API_KEY",
+        "rpm": 30, "tpm": 6000, "tags": ["fast"]}]`. Without it, one Groq backend is created per
+        key in `GROQ_API_KEYS` (or `GROQ_API_KEY`) and one OpenAI backend when `OPENAI_API_KEY` is set.
+        `LLM_ROUTING_RULES` (JSON, step -> tag) replaces the default rules.
+    """
+
+    def __init__(self):
+        load_dotenv()
+
+    def backend_configs(self) -> list[dict]:
+        if os.getenv("LLM_BACKENDS"):
+            return json.loads(os.getenv("LLM_BACKENDS"))
+
+        configs = []
+        groq_keys = [key.strip() for key in os.getenv("GROQ_API_KEYS", os.getenv("GROQ_API_KEY", "")).split(",") if key.strip()]
+        for index, key in enumerate(groq_keys):
+            configs.append({
+                "name": f"groq-{index}", "provider": "groq", "model": "qwen-2.5-32b", "api_key": key,
+                "rpm": int(os.getenv("GROQ_RPM", "30")), "tpm": int(os.getenv("GROQ_TPM", "6000")), "tags": ["fast"],
+            })
+        if os.getenv("OPENAI_API_KEY"):
+            configs.append({
+                "name": "openai-0", "provider": "openai", "model": "gpt-4o", "api_key": os.getenv("OPENAI_API_KEY"),
+                "rpm": int(os.getenv("OPENAI_RPM", "500")), "tpm": int(os.getenv("OPENAI_TPM", "30000")), "tags": ["strong"],
+            })
+        return configs
+
+    @staticmethod
+    def build_model(config: dict) -> BaseChatModel:
+        api_key = config.get("api_key") or os.getenv(config.get("api_key_env", ""))
+        if config["provider"] == "groq":
+            from langchain_groq import ChatGroq
+            return ChatGroq(api_key=api_key, model=config["model"])
+        if config["provider"] == "openai":
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(api_key=api_key, model=config["model"], base_url=config.get("base_url"))
+        raise ValueError(f"Unsupported LLM provider: {config['provider']}")
+
+    def get_llm(self, cache: Optional[BaseCache] = None):
+        """
+            Returns the router chat model, answering repeated prompts from `cache` when given
+        """
+        try:
+            backends = [
+                Backend(config["name"], self.build_model(config), config["rpm"], config["tpm"], config.get("tags", ()))
+                for config in self.backend_configs()
+            ]
+            if not backends:
+                raise ValueError("No LLM backend configured, set GROQ_API_KEY, OPENAI_API_KEY or LLM_BACKENDS")
+            rules = json.loads(os.getenv("LLM_ROUTING_RULES")) if os.getenv("LLM_ROUTING_RULES") else dict(DEFAULT_ROUTING_RULES)
+            return RouterChatModel(backends=backends, rules=rules, cache=cache)
+        except Exception as e:
+            raise ValueError(f"Error occurred with exception: {e}")
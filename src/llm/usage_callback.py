@@ -0,0 +1,50 @@
+from typing import Any, Optional
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.context.context_builder import count_tokens
+
+
+class TokenLimitExceeded(RuntimeError):
+    """ Raised when the LLM calls of a run used more tokens than allowed """
+
+
+def response_tokens(response: LLMResult) -> int:
+    """
+        Total tokens of an LLM response: the provider's usage report when there is one,
+        otherwise an estimate from the generated text
+    """
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage.get("total_tokens"):
+        return usage["total_tokens"]
+    total = 0
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            metadata = getattr(message, "usage_metadata", None) or {}
+            total += metadata.get("total_tokens") or count_tokens(generation.text)
+    return total
+
+
+class TokenUsageCallback(AsyncCallbackHandler):
+    """
+        Counts the tokens of every LLM call made under a run. With `limit`, the call
+        that pushes the total over it raises TokenLimitExceeded, aborting the run.
+    """
+    raise_error = True
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.total_tokens = 0
+        self.calls = 0
+
+    @property
+    def exceeded(self) -> bool:
+        return self.limit is not None and self.total_tokens > self.limit
+
+    async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.calls += 1
+        self.total_tokens += response_tokens(response)
+        if self.exceeded:
+            raise TokenLimitExceeded(f"Token limit of {self.limit} exceeded ({self.total_tokens} tokens)")
@@ -0,0 +1,225 @@
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from src.context.context_builder import count_tokens
+
+# Price per million tokens by model name, JSON, e.g. {"qwen-2.5-32b": [0.79, 0.79]} (prompt, completion)
+TOKEN_PRICES = json.loads(os.getenv("LLM_TOKEN_PRICES", "{}"))
+
+NODE_DURATION = Histogram(
+    "sdlc_node_duration_seconds", "Wall-clock time of graph node runs", ["node"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+NODE_RUNS = Counter("sdlc_node_runs_total", "Graph node runs", ["node", "outcome"])
+
+LLM_DURATION = Histogram(
+    "sdlc_llm_call_duration_seconds", "Duration of LLM calls, retries and hedges included", ["step"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160),
+)
+LLM_CALLS = Counter("sdlc_llm_calls_total", "LLM calls", ["step", "outcome"])
+LLM_TOKENS = Counter("sdlc_llm_tokens_total", "LLM tokens", ["step", "kind"])
+LLM_CACHE_HITS = Counter("sdlc_llm_cache_hits_total", "LLM calls answered from the LLM cache", ["step"])
+LLM_COST = Counter("sdlc_llm_cost_dollars_total", "LLM spend priced with LLM_TOKEN_PRICES", ["step"])
+
+QUEUE_WAIT = Histogram(
+    "sdlc_queue_wait_seconds", "Time spent waiting for a worker (jobs) or for LLM rate limit capacity (llm)", ["queue"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+def _step(metadata: Optional[dict]) -> str:
+    metadata = metadata or {}
+    return metadata.get("sdlc_step") or metadata.get("langgraph_node") or "default"
+
+
+def _usage(response: LLMResult) -> tuple[Optional[int], Optional[int]]:
+    """ Prompt and completion tokens reported by the provider, None when not reported """
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage.get("prompt_tokens") is not None:
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    prompt = completion = None
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            if metadata.get("input_tokens") is not None:
+                prompt = (prompt or 0) + metadata["input_tokens"]
+                completion = (completion or 0) + metadata.get("output_tokens", 0)
+    return prompt, completion
+
+
+def _cached(response: LLMResult) -> bool:
+    """ LangChain zeroes the cost of responses it served from the LLM cache """
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            if metadata.get("total_cost") == 0:
+                return True
+    return False
+
+
+def _model_name(response: LLMResult) -> Optional[str]:
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "response_metadata", None) or {}
+            if metadata.get("model_name") or metadata.get("model"):
+                return metadata.get("model_name") or metadata.get("model")
+    return (response.llm_output or {}).get("model_name")
+
+
+def token_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = TOKEN_PRICES.get(model, (0, 0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class WorkflowMetrics(AsyncCallbackHandler):
+    """
+        Callback recording the graph nodes and LLM calls of a run.
+
+        Every node run (a chain run named after its `langgraph_node`) and LLM call is
+        observed in the Prometheus histograms and counters, and summed per node and per
+        step for the run; `counters()` flattens those sums for StateStore.add_timings.
+        Token counts are the provider's usage report, or estimates when there is none.
+    """
+
+    def __init__(self):
+        self.nodes: dict[str, dict] = defaultdict(lambda: defaultdict(float))
+        self.steps: dict[str, dict] = defaultdict(lambda: defaultdict(float))
+        self._nodes: dict[UUID, tuple[str, float]] = {}
+        self._calls: dict[UUID, tuple[str, float, int]] = {}
+
+    # ----- Graph nodes -----
+
+    async def on_chain_start(self, serialized: Optional[dict], inputs: Any, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        # Chains nested in a node carry its metadata too, the node run is the one named after it
+        if node and kwargs.get("name") == node:
+            self._nodes[run_id] = (node, time.monotonic())
+
+    def _node_done(self, run_id: UUID, outcome: str):
+        node, started = self._nodes.pop(run_id, (None, 0.0))
+        if node is None:
+            return
+        seconds = time.monotonic() - started
+        NODE_DURATION.labels(node).observe(seconds)
+        NODE_RUNS.labels(node, outcome).inc()
+        self.nodes[node]["runs"] += 1
+        self.nodes[node]["seconds"] += seconds
+        if outcome != "ok":
+            self.nodes[node]["errors"] += 1
+
+    async def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._node_done(run_id, "ok")
+
+    async def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._node_done(run_id, "error")
+
+    # ----- LLM calls -----
+
+    async def on_chat_model_start(self, serialized: Optional[dict], messages: list, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        prompt_tokens = sum(count_tokens(str(message.content)) for batch in messages for message in batch)
+        self._calls[run_id] = (_step(metadata), time.monotonic(), prompt_tokens)
+
+    async def on_llm_start(self, serialized: Optional[dict], prompts: list[str], *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        self._calls[run_id] = (_step(metadata), time.monotonic(), sum(count_tokens(prompt) for prompt in prompts))
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        step, started, estimated_prompt = self._calls.pop(run_id, ("default", time.monotonic(), 0))
+        seconds = time.monotonic() - started
+        prompt_tokens, completion_tokens = _usage(response)
+        if prompt_tokens is None:
+            prompt_tokens = estimated_prompt
+            completion_tokens = sum(count_tokens(generation.text) for generations in response.generations for generation in generations)
+        cached = _cached(response)
+
+        LLM_DURATION.labels(step).observe(seconds)
+        LLM_CALLS.labels(step, "ok").inc()
+        stats = self.steps[step]
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        if cached:
+            LLM_CACHE_HITS.labels(step).inc()
+            stats["cache_hits"] += 1
+            return
+        cost = token_cost(_model_name(response), prompt_tokens, completion_tokens or 0)
+        LLM_TOKENS.labels(step, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(step, "completion").inc(completion_tokens or 0)
+        LLM_COST.labels(step).inc(cost)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens or 0
+        stats["cost"] += cost
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        step, started, _ = self._calls.pop(run_id, ("default", time.monotonic(), 0))
+        LLM_DURATION.labels(step).observe(time.monotonic() - started)
+        LLM_CALLS.labels(step, "error").inc()
+        self.steps[step]["calls"] += 1
+        self.steps[step]["errors"] += 1
+
+    # ----- Summary -----
+
+    def counters(self) -> dict[str, float]:
+        """ The run's sums as `node:<node>:<field>` and `llm:<step>:<field>` counters """
+        counters = {}
+        for section, entries in (("node", self.nodes), ("llm", self.steps)):
+            for name, fields in entries.items():
+                for field, value in fields.items():
+                    counters[f"{section}:{name}:{field}"] = value
+        return counters
+
+
+class RuntimeCollector:
+    """
+        Prometheus collector exposing, at scrape time, the counters other components
+        already keep: LLM cache lookups, retries / timeouts / hedges of the resilient
+        model, router backend load and the background job queue.
+    """
+
+    def __init__(self, llm=None, llm_cache=None, job_runner=None):
+        self.llm = llm
+        self.llm_cache = llm_cache
+        self.job_runner = job_runner
+
+    def collect(self):
+        if self.llm_cache is not None:
+            stats = self.llm_cache.stats()
+            lookups = CounterMetricFamily("sdlc_llm_cache_lookups", "LLM cache lookups by the tier that answered", labels=["result"])
+            for result in ("memory_hits", "redis_hits", "misses"):
+                lookups.add_metric([result], stats[result])
+            yield lookups
+            yield CounterMetricFamily("sdlc_llm_cache_redis_errors", "LLM cache lookups and writes that skipped redis on an error", value=stats["redis_errors"])
+            yield GaugeMetricFamily("sdlc_llm_cache_memory_entries", "Entries in the in-process LLM cache tier", value=stats["memory_entries"])
+
+        if hasattr(self.llm, "metrics"):
+            families = {
+                name: CounterMetricFamily(f"sdlc_llm_{name}", f"LLM call {name.replace('_', ' ')} per step", labels=["step"])
+                for name in ("retries", "timeouts", "failures", "hedged", "primary_won", "hedge_won")
+            }
+            for step, counters in self.llm.metrics().items():
+                if step == "all":
+                    continue
+                for name, family in families.items():
+                    family.add_metric([step], counters.get(name, 0))
+            yield from families.values()
+
+        model = getattr(self.llm, "model", None)
+        if hasattr(model, "status"):
+            in_flight = GaugeMetricFamily("sdlc_llm_backend_in_flight", "LLM calls in flight per backend", labels=["backend"])
+            healthy = GaugeMetricFamily("sdlc_llm_backend_healthy", "Whether the backend takes calls (1) or cools down (0)", labels=["backend"])
+            for backend in model.status():
+                in_flight.add_metric([backend["name"]], backend["in_flight"])
+                healthy.add_metric([backend["name"]], int(backend["healthy"]))
+            yield in_flight
+            yield healthy
+
+        if self.job_runner is not None:
+            yield GaugeMetricFamily("sdlc_jobs_queued", "Background jobs waiting for a worker", value=self.job_runner.queue.qsize())
+            yield GaugeMetricFamily("sdlc_jobs_running", "Background jobs being run", value=len(self.job_runner.running))
@@ -3,16 +3,102 @@ from src.llm.openai_llm import OpenAILLM
 from src.state.sdlc_state import DesignDocument, SDLCState
 from langchain.agents import Tool
 from datetime import datetime
+from typing import Optional
+import asyncio
 import re
 import os
 
+from src.context.context_builder import ContextBuilder, SummaryCache, extract_outline
+from src.context.section_index import SectionIndex
+from src.llm.router_llm import llm_step
+from src.tools.code_chunker import chunk_python_code
+from src.tools.code_tools import extract_python_code, render_modules, split_modules
 from src.tools.markdown_tool import clean_markdown
+from src.tools.patch_tool import PatchConflictError, apply_unified_diff, changed_hunks, extract_diff
+from src.tools.static_analysis import AnalysisReport, analyze_code
+from src.tools.test_runner import TestSandbox
+
+# Token budget of the assembled context per node
+CONTEXT_BUDGETS = {
+    "generate_code": int(os.getenv("CONTEXT_BUDGET_GENERATE_CODE", "12000")),
+    "generate_test_cases": int(os.getenv("CONTEXT_BUDGET_GENERATE_TEST_CASES", "8000")),
+    "qa_testing": int(os.getenv("CONTEXT_BUDGET_QA_TESTING", "10000")),
+}
+
+# Design sections retrieved per user story
+DESIGN_SECTIONS_PER_STORY = int(os.getenv("DESIGN_SECTIONS_PER_STORY", "3"))
+
+# Reviews that send the graph back to generate_code: (review, status field, feedback field)
+CODE_FEEDBACK_FIELDS = [
+    ("code review", "code_review_status", "code_review_feedback"),
+    ("security review", "security_review_status", "security_review_feedback"),
+    ("QA testing", "qa_testing_status", "qa_testing_feedback"),
+]
+
+# Query pulling the architecture sections into the scaffolding (merge) step of map-reduce code generation
+SCAFFOLDING_QUERY = "system architecture technology stack configuration entry point deployment environments"
+
+# Query pulling the security related design sections into the security review
+SECURITY_QUERY = "security authentication authorization permissions roles encryption passwords tokens validation sensitive data"
 
 class DesignNode:
-    def __init__(self, llm):
+    def __init__(
+        self,
+        llm,
+        context_budgets: Optional[dict] = None,
+        summarize_context: bool = os.getenv("CONTEXT_SUMMARIES", "") == "1",
+        code_generation_mode: str = os.getenv("CODE_GENERATION_MODE", "single"),
+        code_concurrency: int = int(os.getenv("CODE_GENERATION_CONCURRENCY", "4")),
+        security_concurrency: int = int(os.getenv("SECURITY_REVIEW_CONCURRENCY", "4")),
+        incremental_code_updates: bool = os.getenv("INCREMENTAL_CODE_UPDATES", "1") == "1",
+        test_sandbox: Optional[TestSandbox] = None,
+        execute_tests: bool = os.getenv("QA_EXECUTE_TESTS", "1") == "1",
+        max_syntax_retries: int = int(os.getenv("STATIC_ANALYSIS_MAX_RETRIES", "2")),
+        module_retries: int = int(os.getenv("CODE_MODULE_RETRIES", "1"))
+    ):
         self.llm = llm    
+        # "single": one LLM call writes the application, "map_reduce": one module per user story
+        self.code_generation_mode = code_generation_mode
+        self.code_concurrency = code_concurrency
+        self.security_concurrency = security_concurrency
+        # Feedback iterations patch the code with a diff instead of regenerating it
+        self.incremental_code_updates = incremental_code_updates
+        # QA runs the generated tests locally instead of having the LLM simulate them
+        self.test_sandbox = test_sandbox or TestSandbox()
+        self.execute_tests = execute_tests
+        # Regenerations of code that does not parse before it is reviewed anyway
+        self.max_syntax_retries = max_syntax_retries
+        # Extra attempts for a story module that failed in map_reduce mode
+        self.module_retries = module_retries
+        self.context_budgets = {**CONTEXT_BUDGETS, **(context_budgets or {})}
+        # Summaries of oversized sections, keyed by content hash, least recently used evicted
+        self.summary_cache = SummaryCache()
+        self.summarize_context = summarize_context
+
+    def _context_builder(self, node: str) -> ContextBuilder:
+        """
+            Context builder enforcing the token budget of the node
+        """
+        return ContextBuilder(
+            budget_tokens=self.context_budgets[node],
+            summary_cache=self.summary_cache,
+            summarizer=self._summarize if self.summarize_context else None
+        )
+
+    async def _summarize(self, content: str, target_tokens: int) -> str:
+        """
+            Summarizes an oversized prompt section
+        """
+        prompt = f"""
+            Summarize the following content in at most {target_tokens} tokens.
+            Keep every section heading, identifier, API, data entity and requirement; drop examples and prose.
+
+            {content}
+        """
+        response = await self.llm.ainvoke(prompt, config=llm_step("summarize_context"))
+        return response.content
             
-    def create_design_document(self, state: SDLCState):
+    async def create_design_document(self, state: SDLCState):
         """
         Generates the Design document functional and technical
         """
@@ -24,34 +110,39 @@ class DesignNode:
         if 'design_documents' in state:
             design_feedback = state.get('design_documents','')['feedback_reason']
 
-        functional_documents = self.generate_functional_design(
-            project_name=project_name,
-            requirements=requirements,
-            user_stories=user_stories,
-            design_feedback=design_feedback
-        )
-
-        technical_documents = self.generate_technical_design(
-            project_name=project_name,
-            requirements=requirements,
-            user_stories=user_stories,
-            design_feedback=design_feedback
+        # Both documents only depend on the requirements, generate them concurrently
+        functional_documents, technical_documents = await asyncio.gather(
+            self.generate_functional_design(
+                project_name=project_name,
+                requirements=requirements,
+                user_stories=user_stories,
+                design_feedback=design_feedback
+            ),
+            self.generate_technical_design(
+                project_name=project_name,
+                requirements=requirements,
+                user_stories=user_stories,
+                design_feedback=design_feedback
+            )
         )
 
         design_documents = DesignDocument(
             functional=functional_documents,
             technical = technical_documents
         )
+        design_index = SectionIndex.from_documents({
+            "functional": functional_documents,
+            "technical": technical_documents
+        })
 
         return {
-            **state,
             "current_node": "create_design_document",
             "next_required_input": "design_review",
             "design_documents": design_documents,
-            "technical_documents": technical_documents
+            "design_index": design_index.to_dict()
         }
     
-    def generate_functional_design(self, project_name, requirements, user_stories, design_feedback):
+    async def generate_functional_design(self, project_name, requirements, user_stories, design_feedback):
         """
         Helper method to generate functional design document
         """
@@ -88,12 +179,12 @@ class DesignNode:
             Make sure to maintain proper Markdown formatting throughout the document.
         """
         # invoke the llm
-        response = self.llm.invoke(prompt)
+        response = await self.llm.ainvoke(prompt, config=llm_step("generate_functional_design"))
 
         # content = self.fix_markdown(content=response.content)
         return response.content    
     
-    def generate_technical_design(self, project_name, requirements, user_stories, design_feedback):
+    async def generate_technical_design(self, project_name, requirements, user_stories, design_feedback):
             """
                 Helper method to generate technical design document in Markdown format
             """
@@ -131,7 +222,7 @@ class DesignNode:
                 For database schemas, represent tables and relationships using Markdown tables.
                 Make sure to maintain proper Markdown formatting throughout the document.
             """
-            response = self.llm.invoke(prompt)
+            response = await self.llm.ainvoke(prompt, config=llm_step("generate_technical_design"))
             return response.content
         
     def _format_list(self, items):
@@ -150,6 +241,36 @@ class DesignNode:
                 formatted_stories.append(f"- ID: {story.get('id', 'N/A')}\n  Title: {story.get('title', 'N/A')}\n  Description: {story.get('description', 'N/A')}")
         return '\n'.join(formatted_stories)
     
+    def _story_queries(self, stories):
+        """Retrieval queries, one per user story"""
+        queries = []
+        for story in stories:
+            if isinstance(story, dict):
+                queries.append(f"{story.get('title', '')} {story.get('description', '')}")
+            else:
+                queries.append(f"{story.title} {story.description}")
+        return queries
+
+    def _design_index(self, state: SDLCState) -> SectionIndex:
+        """Index built with the design document, rebuilt for states saved before it existed"""
+        if state.get('design_index'):
+            return SectionIndex.from_dict(state['design_index'])
+        return SectionIndex.from_documents({
+            "functional": state['design_documents']['functional'],
+            "technical": state['design_documents']['technical']
+        })
+
+    def _relevant_design(self, state: SDLCState, queries, source=None, k=DESIGN_SECTIONS_PER_STORY):
+        """
+            Design sections relevant to any of the queries. Falls back to the whole
+            document(s) when nothing matches.
+        """
+        index = self._design_index(state)
+        sections = index.retrieve(queries, k=k, source=source)
+        if not sections:
+            sections = [section for section in index.sections if source is None or section.source == source]
+        return "\n\n".join(section.content for section in sections)
+
     def design_review_router(self, state: SDLCState):
         """
             Evaluates design review is required or not.
@@ -162,27 +283,157 @@ class DesignNode:
         """
         pass
 
-    def generate_code(self, state: SDLCState):
+    async def generate_code(self, state: SDLCState):
         """
             Generates the code for the requirements in the design document
         """
         print("----- Generating the code ----")
+        feedback = self._code_feedback(state)
+        update = None
+        if feedback and self.incremental_code_updates:
+            update = await self.update_code_incrementally(state, feedback)
+
+        code_generation_errors = []
+        if update is not None:
+            code_generated, code_modules, code_changes = update
+        else:
+            if self.code_generation_mode == "map_reduce" and state.get('user_stories'):
+                code_generated, code_modules, code_generation_errors = await self.generate_code_map_reduce(state, feedback)
+            else:
+                code_generated = await self.generate_code_single(state, feedback)
+                code_modules = split_modules(code_generated)
+            code_changes = ""
+        next_required_input = "code_review" if state['design_documents']['review_status'] == "approved" else "create_design_document"
+        return {
+                'code_generated': code_generated, 
+                'code_modules': code_modules,
+                'code_changes': code_changes,
+                'code_generation_errors': code_generation_errors,
+                'next_required_input': next_required_input, 
+                'current_node': 'generate_code'
+            }
+
+    async def static_analysis(self, state: SDLCState):
+        """
+            Local static analysis of the generated code, run before the LLM review.
+            Code with syntax errors goes straight back to generate_code (up to
+            `max_syntax_retries` times) without any LLM review.
+        """
+        print("----- Static analysis of the code ----")
+        report = analyze_code(state.get('code_generated', ''))
+        retries = state.get('code_syntax_retries', 0)
+        if report.syntax_errors and retries < self.max_syntax_retries:
+            print(f"----- Syntax errors found, regenerating the code (retry {retries + 1} of {self.max_syntax_retries}) ----")
+            return {
+                "current_node": "static_analysis",
+                "static_analysis_report": report.model_dump(),
+                "code_syntax_retries": retries + 1
+            }
+
+        code_review_comments = await self.get_code_review_comments(
+            code=state.get('code_generated', ''),
+            report=report,
+            changes=state.get('code_changes'),
+            feedback=self._code_feedback(state)
+        )
+        return {
+            "current_node": "static_analysis",
+            "static_analysis_report": report.model_dump(),
+            "code_syntax_retries": 0,
+            "code_review_comments": code_review_comments
+        }
+
+    def static_analysis_router(self, state: SDLCState):
+        """
+            Sends code with syntax errors back to generate_code
+        """
+        return "syntax_error" if state.get('code_syntax_retries', 0) > 0 else "reviewed"
+
+    def _code_feedback(self, state: SDLCState):
+        """
+            The (review, feedback) that sent the graph back to generate_code, or None
+            on the first generation. Syntax errors found by the static analysis come first;
+            otherwise reviews run in pipeline order, so the earliest one with a "feedback"
+            status is the one that triggered this iteration.
+        """
+        if not state.get('code_generated'):
+            return None
+        report = AnalysisReport(**state['static_analysis_report']) if state.get('static_analysis_report') else None
+        if report and report.syntax_errors and state.get('code_syntax_retries', 0) > 0:
+            return "static analysis", "The code does not parse. Fix these syntax errors:\n" + report.format_findings()
+        for review, status_field, feedback_field in CODE_FEEDBACK_FIELDS:
+            if state.get(status_field) == "feedback":
+                return review, state.get(feedback_field, '')
+        return None
+
+    def _feedback_instructions(self, feedback) -> str:
+        """Prompt line asking to address the review feedback"""
+        if not feedback:
+            return ""
+        review, feedback_reason = feedback
+        return f"The previous version of the code was sent back by the {review}. Address the following feedback: {feedback_reason}"
+
+    async def update_code_incrementally(self, state: SDLCState, feedback):
+        """
+            Feedback iteration: asks for a unified diff against the current code instead
+            of a full rewrite and applies it locally. Returns (code_generated, code_modules,
+            changed hunks), or None when the patch does not apply and the code has to be
+            regenerated.
+        """
+        print("----- Updating the code from the review feedback ----")
+        code = extract_python_code(state['code_generated'])
+        prompt = f"""
+            You are updating existing Python code of the project "{state['project_name']}".
+            {self._feedback_instructions(feedback)}
+
+            ### Current code (file `code.py`):
+            ```python
+            {code}
+            ```
+
+            Return ONLY a unified diff against `code.py` (`--- a/code.py`, `+++ b/code.py`, then `@@` hunks
+            with 3 lines of unchanged context) in a single ```diff code block.
+            Change only what the feedback requires; do not repeat unchanged code.
+        """
+        response = await self.llm.ainvoke(prompt, config=llm_step("update_code_incrementally"))
+        try:
+            patched = apply_unified_diff(code, extract_diff(response.content))
+        except PatchConflictError as e:
+            print(f"----- Patch not applied ({e}), regenerating the code ----")
+            return None
+        changes = changed_hunks(code, patched)
+        if not changes:
+            print("----- Patch made no changes, regenerating the code ----")
+            return None
+        return f"```python\n{patched}\n```", split_modules(patched), changes
+
+    async def generate_code_single(self, state: SDLCState, feedback=None):
+        """
+            Generates the whole application in one LLM call
+        """
+        queries = self._story_queries(state['user_stories'])
+        context = await self._context_builder("generate_code") \
+            .add("requirements", "".join([f"- {req}\n" for req in state['requirements']]), priority=0, compressible=False) \
+            .add("user_stories", self._format_user_stories(state['user_stories']), priority=1) \
+            .add("functional", self._relevant_design(state, queries, source="functional"), priority=2) \
+            .add("technical", self._relevant_design(state, queries, source="technical"), priority=2) \
+            .fit()
         prompt = f"""
         Generate Python code based on the following SDLC state:
 
             Project Name: {state['project_name']}
 
             ### Requirements:
-            {"".join([f"- {req}\n" for req in state['requirements']])}
+            {context['requirements']}
 
             ### User Stories:
-            {"".join([f"- {story['title']}: {story['description']}\n" for story in state['user_stories']])}
+            {context['user_stories']}
 
-            ### Functional Design Document:
-            {state['design_documents']['functional']}
+            ### Functional Design (sections relevant to the user stories):
+            {context['functional']}
 
-            ### Technical Design Document:
-            {state['design_documents']['technical']}
+            ### Technical Design (sections relevant to the user stories):
+            {context['technical']}
 
             The generated Python code should include:
 
@@ -194,30 +445,175 @@ class DesignNode:
             6. **Python Formatting**: The generated code should follow Python syntax and best practices.
 
             Ensure the output code is modular, well-commented, and ready for development.
+
+            {self._feedback_instructions(feedback)}
+        """
+        response = await self.llm.ainvoke(prompt, config=llm_step("generate_code"))
+        return response.content
+
+    async def generate_code_map_reduce(self, state: SDLCState, feedback=None):
+        """
+            Map: generates one module per user story concurrently.
+            Reduce: generates the shared scaffolding (main.py) from the module interfaces.
+            Stories whose module still fails after `module_retries` retries are left out.
+            Returns the rendered code, the {file name: code} modules and the failures.
+        """
+        stories = state['user_stories']
+        module_names = [self._module_name(story, index) for index, story in enumerate(stories, start=1)]
+
+        # Bound the number of in-flight LLM calls
+        semaphore = asyncio.Semaphore(self.code_concurrency)
+
+        async def generate_with_limit(story, module_name):
+            async with semaphore:
+                return await self.generate_module(state, story, module_name, feedback)
+
+        # A failed module is retried, then reported without dropping the others
+        modules = {}
+        failures = {}
+        pending = list(zip(stories, module_names))
+        for attempt in range(self.module_retries + 1):
+            results = await asyncio.gather(
+                *[generate_with_limit(story, module_name) for story, module_name in pending],
+                return_exceptions=True
+            )
+            failed = []
+            for (story, module_name), result in zip(pending, results):
+                if isinstance(result, BaseException):
+                    print(f"Code generation failed for {module_name} (attempt {attempt + 1}): {result}")
+                    failures[module_name] = f"{module_name}: {result}"
+                    failed.append((story, module_name))
+                else:
+                    failures.pop(module_name, None)
+                    modules[module_name] = result
+            pending = failed
+            if not pending:
+                break
+
+        # Keep the story order of the generated code
+        modules = {module_name: modules[module_name] for module_name in module_names if module_name in modules}
+        scaffolding = await self.merge_modules(state, modules)
+        code_modules = {"main.py": scaffolding, **modules}
+        return render_modules(code_modules), code_modules, list(failures.values())
+
+    async def generate_module(self, state: SDLCState, story, module_name: str, feedback=None):
+        """
+            Generates the module implementing one user story
+        """
+        print(f"----- Generating module {module_name} ----")
+        queries = self._story_queries([story])
+        context = await self._context_builder("generate_code") \
+            .add("user_story", self._format_user_stories([story]), priority=0, compressible=False) \
+            .add("requirements", self._format_list(state['requirements']), priority=1) \
+            .add("functional", self._relevant_design(state, queries, source="functional"), priority=2) \
+            .add("technical", self._relevant_design(state, queries, source="technical"), priority=2) \
+            .fit()
+        prompt = f"""
+            You are writing one module of the Python application "{state['project_name']}".
+            Implement only the following user story in the module `{module_name}`:
+
+            ### User Story:
+            {context['user_story']}
+
+            ### Project Requirements (for context):
+            {context['requirements']}
+
+            ### Functional Design (relevant sections):
+            {context['functional']}
+
+            ### Technical Design (relevant sections):
+            {context['technical']}
+
+            Guidelines:
+            1. Expose the functionality as well-named public classes and functions with docstrings.
+            2. Do not write an application entry point, global configuration or code for other user stories;
+               they are generated separately and wired together afterwards.
+            3. Add the user story description and its acceptance criteria as comments.
+            4. Follow Python syntax and best practices.
+
+            {self._feedback_instructions(feedback)}
+
+            Return only the Python code of the module in a single ```python code block.
         """
-        response = self.llm.invoke(prompt)
-        next_required_input = "code_review" if state['design_documents']['review_status'] == "approved" else "create_design_document"
-        code_review_comments = self.get_code_review_comments(code=response.content)
-        return {
-                'code_generated': response.content, 
-                'next_required_input': next_required_input, 
-                'current_node': 'generate_code',
-                'code_review_comments': code_review_comments
-            }
+        response = await self.llm.ainvoke(prompt, config=llm_step("generate_module"))
+        return extract_python_code(response.content)
+
+    async def merge_modules(self, state: SDLCState, modules: dict):
+        """
+            Generates the shared scaffolding that wires the story modules together.
+            Only the module interfaces (imports, classes and signatures) are sent.
+        """
+        print("----- Merging the generated modules ----")
+        interfaces = "\n\n".join(
+            f"# {module_name}\n{extract_outline(code)}" for module_name, code in modules.items()
+        )
+        architecture = self._relevant_design(state, [SCAFFOLDING_QUERY], source="technical", k=2)
+        prompt = f"""
+            The Python application "{state['project_name']}" has been generated as one module per user story.
+            These are the public interfaces of the modules:
+
+            ```python
+            {interfaces}
+            ```
+
+            ### Technical Design (architecture):
+            {architecture}
+
+            Write `main.py` with the shared scaffolding:
+            1. Shared configuration and common data models the modules need.
+            2. The application entry point that imports the modules (by file name without `.py`) and wires them together.
+            3. Do not re-implement the functionality of the modules.
+
+            Return only the Python code of `main.py` in a single ```python code block.
+        """
+        response = await self.llm.ainvoke(prompt, config=llm_step("merge_modules"))
+        return extract_python_code(response.content)
+
+    def _module_name(self, story, index: int) -> str:
+        """File name of the module implementing a user story"""
+        title = story.get('title', '') if isinstance(story, dict) else story.title
+        slug = re.sub(r"[^a-z0-9]+", "_", title.lower()).strip("_")[:40] or "story"
+        return f"story_{index}_{slug}.py"
     
-    def get_code_review_comments(self, code: str):
+    async def get_code_review_comments(self, code: str, report: AnalysisReport, changes: Optional[str] = None, feedback=None):
         """
-        Generate code review comments for the provided code
+        Generate code review comments from the static analysis findings.
+        The LLM only gets the findings and the flagged code regions (plus the applied diff
+        of a feedback iteration); it is skipped when there is nothing to review.
         """
+        findings = report.format_findings()
+        files = ", ".join(
+            f"{file}: {metrics['lines']} lines, max complexity {metrics.get('max_complexity', '-')}"
+            for file, metrics in report.metrics.items()
+        )
+        static_section = f"## Static Analysis\n\n{files}\n\n{findings or 'No findings.'}"
+
+        if not report.findings and not changes:
+            print("----- Static analysis found no issues, skipping the LLM code review ----")
+            return f"{static_section}\n\nAPPROVED"
+
         print("----- Generating code review comments ----")
-        
-        # Create a prompt for the LLM to review the code
+        change_section = ""
+        if changes:
+            review, feedback_reason = feedback if feedback else ("review", "")
+            change_section = f"""
+                The code was changed to address this {review} feedback: {feedback_reason}
+                ### Change (unified diff):
+                ```diff
+                {changes}
+                ```
+                Check whether the change addresses the feedback and does not introduce bugs.
+            """
+
+        # Create a prompt for the LLM to review the flagged code
         prompt = f"""
-            You are a coding expert. Please review the following code and provide detailed feedback:
-            ```
-            {code}
-            ```
-            Focus on:
+            You are a coding expert. A static analysis of the generated code reported these findings:
+            {findings or "No findings."}
+
+            ### Flagged code regions:
+            {report.flagged_regions(code) or "None"}
+            {change_section}
+            For each finding, confirm whether it is a real problem and recommend a fix. Focus on:
             1. Code quality and best practices
             2. Potential bugs or edge cases
             3. Performance considerations
@@ -227,9 +623,8 @@ class DesignNode:
         """
         
         # Get the review from the LLM
-        response = self.llm.invoke(prompt)
-        review_comments = response.content
-        return review_comments
+        response = await self.llm.ainvoke(prompt, config=llm_step("get_code_review_comments"))
+        return f"{static_section}\n\n## Review\n\n{response.content}"
         
 
     def code_review(self, state: SDLCState):
@@ -244,37 +639,103 @@ class DesignNode:
         """
         return state['code_review_status']
     
-    def security_recommendations(self, state: SDLCState):
+    async def security_recommendations(self, state: SDLCState):
+        """
+            Performs security review of the code generated.
+            The code is split at file, class and function boundaries and the chunks are
+            reviewed concurrently. Verdicts are cached by chunk content hash in the state,
+            so after a code iteration only the changed chunks are reviewed again.
+        """
+        print("----- Security review of the code ----")
+        chunks = chunk_python_code(state.get('code_generated', ''))
+        design_context = self._relevant_design(
+            state,
+            [SECURITY_QUERY] + self._story_queries(state.get('user_stories', [])),
+            source="technical",
+            k=2
+        )
+        cache = state.get('security_review_cache') or {}
+        pending = [chunk for chunk in chunks if chunk.digest not in cache]
+        print(f"----- Reviewing {len(pending)} of {len(chunks)} code chunks ({len(chunks) - len(pending)} cached) ----")
+
+        # Bound the number of in-flight LLM calls
+        semaphore = asyncio.Semaphore(self.security_concurrency)
+
+        async def review_with_limit(chunk):
+            async with semaphore:
+                return await self.review_chunk_security(chunk, design_context)
+
+        results = await asyncio.gather(*[review_with_limit(chunk) for chunk in pending], return_exceptions=True)
+        failed = []
+        for chunk, result in zip(pending, results):
+            if isinstance(result, BaseException):
+                # Not cached, so it is reviewed again on the next iteration
+                print(f"Security review failed for {chunk.file} ({chunk.name}): {result}")
+                failed.append(chunk)
+            else:
+                cache[chunk.digest] = result
+
+        # Only the verdicts of the current chunks are kept
+        security_review_cache = {chunk.digest: cache[chunk.digest] for chunk in chunks if chunk.digest in cache}
+        security_review_comments = self._merge_security_reviews(chunks, security_review_cache, failed, cached=len(chunks) - len(pending))
+
+        return {
+            "current_node": "code_review",
+            "next_required_input": "security_review",
+            "security_review_comments": security_review_comments,
+            "security_review_cache": security_review_cache
+        }
+
+    async def review_chunk_security(self, chunk, design_context: str) -> dict:
         """
-            Performs security review of the code generated
+            Reviews one code chunk for security vulnerabilities
         """
-         # Get the generated code from the state
-        code_generated = state.get('code_generated', '')
-
-         # Create a prompt for the LLM to review the code for security concerns
         prompt = f"""
-            You are a security expert. Please review the following Python code for potential security vulnerabilities:
-            ```
-            {code_generated}
+            You are a security expert. Please review the following part (`{chunk.name}`) of the file `{chunk.file}`
+            for potential security vulnerabilities:
+            ```python
+            {chunk.code}
             ```
+
+            ### Relevant Technical Design Sections:
+            {design_context}
+
             Focus on:
             1. Identifying potential security risks (e.g., SQL injection, XSS, insecure data handling).
             2. Providing recommendations to mitigate these risks.
             3. Highlighting any best practices that are missing.
 
+            Only report issues in this code. If there are none, answer with NO_ISSUES.
             End your review with an explicit APPROVED or NEEDS_FEEDBACK status.
         """
-
-         # Invoke the LLM to perform the security review
-        response = self.llm.invoke(prompt)
-        security_review_comments = response.content
-
-        return {
-            **state,
-            "current_node": "code_review",
-            "next_required_input": "security_review",
-            "security_review_comments": security_review_comments
-        }
+        response = await self.llm.ainvoke(prompt, config=llm_step("review_chunk_security"))
+        content = response.content.strip()
+        status = "NEEDS_FEEDBACK" if "NEEDS_FEEDBACK" in content.upper() else "APPROVED"
+        findings = "" if "NO_ISSUES" in content.upper() else re.sub(r"\**(NEEDS_FEEDBACK|APPROVED)\**\.?\s*$", "", content).strip()
+        return {"file": chunk.file, "name": chunk.name, "status": status, "findings": findings}
+
+    def _merge_security_reviews(self, chunks, reviews: dict, failed: list, cached: int) -> str:
+        """Merges the per-chunk verdicts into one security review"""
+        sections = []
+        clean = []
+        for chunk in chunks:
+            review = reviews.get(chunk.digest)
+            if review is None:
+                continue
+            if review['findings']:
+                sections.append(f"## {chunk.file}: {chunk.name} (line {chunk.start_line})\n\n{review['findings']}")
+            else:
+                clean.append(f"{chunk.file}: {chunk.name}")
+
+        needs_feedback = bool(failed) or any(review['status'] == "NEEDS_FEEDBACK" for review in reviews.values())
+        lines = [f"# Security Review\n\nReviewed {len(chunks)} code chunks ({cached} unchanged since the last review)."]
+        lines.extend(sections)
+        if clean:
+            lines.append("## No issues found in\n\n" + "\n".join(f"- {name}" for name in clean))
+        if failed:
+            lines.append("## Not reviewed (review failed)\n\n" + "\n".join(f"- {chunk.file}: {chunk.name}" for chunk in failed))
+        lines.append("NEEDS_FEEDBACK" if needs_feedback else "APPROVED")
+        return "\n\n".join(lines)
     
     def security_review(self, state: SDLCState):
         """
@@ -288,15 +749,18 @@ class DesignNode:
         """
         return state['security_review_status']
     
-    def generate_test_cases(self, state: SDLCState):
+    async def generate_test_cases(self, state: SDLCState):
         """
             Generates the test cases based on the generated code and code review comments
         """
         print("----- Generating Test Cases ----")
     
         # Get the generated code and code review comments from the state
-        code_generated = state.get('code_generated', '')
-        code_review_comments = state.get('code_review_comments', '')
+        context = await self._context_builder("generate_test_cases") \
+            .add("code", state.get('code_generated', ''), priority=0) \
+            .add("review_comments", state.get('code_review_comments', ''), priority=1) \
+            .add("design", self._relevant_design(state, self._story_queries(state.get('user_stories', []))), priority=2) \
+            .fit()
 
          # Create a prompt for the LLM to generate test cases
         prompt = f"""
@@ -304,11 +768,14 @@ class DesignNode:
             
             ### Code:
             ```
-                {code_generated}
+                {context['code']}
                 ```
 
                 ### Code Review Comments:
-                {code_review_comments}
+                {context['review_comments']}
+
+                ### Design Sections Relevant to the User Stories:
+                {context['design']}
 
                 Focus on:
                 1. Covering all edge cases and boundary conditions.
@@ -320,12 +787,11 @@ class DesignNode:
         """
 
          # Invoke the LLM to generate the test cases
-        response = self.llm.invoke(prompt)
+        response = await self.llm.ainvoke(prompt, config=llm_step("generate_test_cases"))
         test_cases = response.content
 
         # Update the state with the generated test cases
         return {
-            **state,
             "current_node": "generate_test_cases",
             "next_required_input": "test_cases_review",
             "test_cases": test_cases,
@@ -349,14 +815,92 @@ class DesignNode:
         """
         return state['test_case_review_status']
     
-    def qa_testing(self, state: SDLCState):
+    async def qa_testing(self, state: SDLCState):
         """
-            Performs QA testing based on the generated code and test cases
+            Performs QA testing: runs the generated test cases against the generated
+            code in the local sandbox. The LLM is only asked to explain the failures.
         """
         print("----- Performing QA Testing ----")
+        if self.execute_tests:
+            result = await self.test_sandbox.run(state.get('code_generated', ''), state.get('test_cases', ''))
+            print(f"----- Test run: {result.summary()} ----")
+            explanation = await self.explain_test_failures(state, result) if result.failures else ""
+            qa_testing_comments = self._format_test_results(result, explanation)
+            qa_test_results = result.summary()
+        else:
+            qa_testing_comments = await self.simulate_qa_testing(state)
+            qa_test_results = {}
+
+        # Update the state with the QA testing results
+        return {
+            "current_node": "qa_testing",
+            "next_required_input": "qa_testing_review" if state['test_case_review_status'] == "approved" else "generate_test_cases",
+            "qa_testing_status": state['test_case_review_status'],
+            "qa_testing_comments": qa_testing_comments,
+            "qa_test_results": qa_test_results
+        }
+
+    async def explain_test_failures(self, state: SDLCState, result) -> str:
+        """
+            Asks the LLM for the root cause of the failed tests
+        """
+        failures = "\n\n".join(f"### {failure.name} ({failure.status})\n{failure.details}" for failure in result.failures)
+        context = await self._context_builder("qa_testing") \
+            .add("failures", failures, priority=0) \
+            .add("code", state.get('code_generated', ''), priority=1) \
+            .add("test_cases", state.get('test_cases', ''), priority=2) \
+            .fit()
+        prompt = f"""
+            You are a QA testing expert. The following unit tests failed when they were run against the code:
+
+            {context['failures']}
+
+            ### Code:
+            ```
+            {context['code']}
+            ```
+
+            ### Test Cases:
+            ```
+            {context['test_cases']}
+            ```
+
+            For each failed test explain the root cause, whether the code or the test case is wrong,
+            and suggest the fix. Be concise.
+        """
+        response = await self.llm.ainvoke(prompt, config=llm_step("explain_test_failures"))
+        return response.content
+
+    def _format_test_results(self, result, explanation: str) -> str:
+        """Per-test results in the format of the QA testing comments"""
+        summary = result.summary()
+        lines = [
+            "# QA Testing Results",
+            f"Ran {summary['total']} tests in {summary['duration']}s: {summary['pass']} passed, "
+            f"{summary['fail']} failed, {summary['error']} errors, {summary['skipped']} skipped."
+        ]
+        if result.timed_out:
+            lines.append("The test run was stopped after reaching its time limit.")
+        for outcome in result.outcomes:
+            entry = f"- Test Case ID: {outcome.name} ({outcome.test_id})\n  Status: {outcome.status.capitalize()}"
+            if outcome.details:
+                entry += f"\n  Feedback: {outcome.details.strip().splitlines()[-1]}"
+            lines.append(entry)
+        if not result.outcomes:
+            lines.append(f"No test results were reported. Output:\n```\n{result.output}\n```")
+        if explanation:
+            lines.append(f"## Failure Analysis\n\n{explanation}")
+        return "\n\n".join(lines)
+
+    async def simulate_qa_testing(self, state: SDLCState) -> str:
+        """
+            Asks the LLM to simulate running the test cases (used when test execution is disabled)
+        """
         # Get the generated code and test cases from the state
-        code_generated = state.get('code_generated', '')
-        test_cases = state.get('test_cases', '')
+        context = await self._context_builder("qa_testing") \
+            .add("test_cases", state.get('test_cases', ''), priority=0) \
+            .add("code", state.get('code_generated', ''), priority=1) \
+            .fit()
 
         # Create a prompt for the LLM to simulate running the test cases
         prompt = f"""
@@ -364,12 +908,12 @@ class DesignNode:
             
             ### Code:
             ```
-            {code_generated}
+            {context['code']}
             ```
 
             ### Test Cases:
             ```
-            {test_cases}
+            {context['test_cases']}
             ```
 
             Focus on:
@@ -384,19 +928,10 @@ class DesignNode:
         """
 
         # Invoke the LLM to simulate QA testing
-        response = self.llm.invoke(prompt)
-        qa_testing_comments = response.content
-
-        # Update the state with the QA testing results
-        return {
-            **state,
-            "current_node": "qa_testing",
-            "next_required_input": "qa_testing_review" if state['test_case_review_status'] == "approved" else "generate_test_cases",
-            "qa_testing_status": state['test_case_review_status'],
-            "qa_testing_comments": qa_testing_comments
-        }
+        response = await self.llm.ainvoke(prompt, config=llm_step("simulate_qa_testing"))
+        return response.content
     
-    def deployment(self, state: SDLCState):
+    async def deployment(self, state: SDLCState):
         """
             Performs teh deployment
         """
@@ -426,7 +961,7 @@ class DesignNode:
         """
 
         # Invoke the LLM to simulate deployment
-        response = self.llm.invoke(prompt)
+        response = await self.llm.ainvoke(prompt, config=llm_step("deployment"))
         deployment_feedback = response.content
 
          # Determine the deployment status based on the feedback
@@ -437,7 +972,6 @@ class DesignNode:
 
         # Update the state with the deployment results
         return {
-            **state,
             "current_node": "deployment",
             "next_required_input": "end" if deployment_status == "success" else "qa_testing",
             "deployment_status": deployment_status,
@@ -1,13 +1,17 @@
 
 import asyncio
+import os
 from typing import Literal
 from src.state.sdlc_state import SDLCState, UserStories
 from langchain_core.messages import SystemMessage
 
 
 class SDLCNode:
-    def __init__(self, llm):
+    def __init__(self, llm, max_concurrency: int = int(os.getenv("USER_STORY_CONCURRENCY", "5"))):
         self.llm = llm 
+        # Built once and reused by every user story generation
+        self.llm_with_structured = llm.with_structured_output(UserStories)
+        self.max_concurrency = max_concurrency
 
 
     def project_initilization(self, state: SDLCState):
@@ -42,9 +46,7 @@ class SDLCNode:
 
         Format the user story as a bullet point.
         """
-        system_message = prompt.format(project_name= project_name, requirement= requirement, index= index)
-        llm_with_structured = self.llm.with_structured_output(UserStories)
-        response = llm_with_structured.invoke(system_message)
+        response = await self.llm_with_structured.ainvoke(prompt)
         return response
 
     async def auto_generate_user_stories(self, state: SDLCState):
@@ -61,13 +63,35 @@ class SDLCNode:
             feedback_reason = ''
             next_required_input = 'product_owner_review'
 
+        # Bound the number of in-flight LLM calls
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def generate_with_limit(requirement, index):
+            async with semaphore:
+                return await self.generate_user_story(project_name, requirement, feedback_reason, index)
+
         tasks = [
-            self.generate_user_story(project_name, requirement, feedback_reason, index)
+            generate_with_limit(requirement, index)
             for index, requirement in enumerate(requirements, start=1)
         ]
 
-        user_stories = await asyncio.gather(*tasks)
-        return {"user_stories": user_stories, 'next_required_input': 'product_owner_review', 'current_node': 'auto_generate_user_stories'}
+        # A failed requirement is reported without dropping the stories of the others
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        user_stories = []
+        user_story_errors = []
+        for index, (requirement, result) in enumerate(zip(requirements, results), start=1):
+            if isinstance(result, Exception):
+                print(f"Failed to generate user story {index}: {result}")
+                user_story_errors.append(f"Requirement {index} ({requirement}): {result}")
+            else:
+                user_stories.append(result)
+
+        return {
+            "user_stories": user_stories,
+            "user_story_errors": user_story_errors,
+            'next_required_input': 'product_owner_review',
+            'current_node': 'auto_generate_user_stories'
+        }
     
     def product_owner_review_decision(self, state: SDLCState):
         """
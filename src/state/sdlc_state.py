@@ -1,6 +1,10 @@
 from pydantic import BaseModel, Field
 from typing import TypedDict, Any, Dict, Literal, Optional
 import json
+import os
+
+# Most items accepted by one batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
 
 class UserStories(BaseModel):
     id: int = Field(..., description="The unique identifier of the user story")
@@ -19,6 +23,37 @@ class StartWorkflowResponse(BaseModel):
     progress: int
     current_node: str
 
+class BatchStartRequest(BaseModel):
+    projects: list[StartWorkflowRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class RequirementsItem(BaseModel):
+    task_id: str
+    task: str
+
+class BatchRequirementsRequest(BaseModel):
+    items: list[RequirementsItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class ReviewItem(BaseModel):
+    task_id: str
+    review: str = Field(..., description="Review endpoint name, e.g. design_review", examples=["code_review"])
+    review_status: str
+    feedback_reason: str = ""
+
+class BatchReviewRequest(BaseModel):
+    items: list[ReviewItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class BatchItemResult(BaseModel):
+    task_id: Optional[str] = None
+    status_code: int = Field(..., description="HTTP status the single-item endpoint would have answered")
+    data: Optional[Dict[str, Any]] = Field(None, description="Status fields of the task after the item ran")
+    detail: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    duration: float
+    results: list[BatchItemResult]
+
 class DesignDocument(BaseModel):
     functional: str = Field(..., description="Holds the functional design Document")
     technical: str = Field(..., description="Holds the technical design Document")
@@ -30,6 +65,7 @@ class SDLCState(TypedDict):
     task: str
     requirements: list[str]
     user_stories: list[UserStories]
+    user_story_errors: list[str]
     progress: int
     next_required_input: Optional[str]
     current_node: str = "project_initilization"
@@ -37,17 +73,26 @@ class SDLCState(TypedDict):
     product_decision: str
     feedback_reason: str
     design_documents: DesignDocument
+    design_index: dict
     code_generated: str
+    code_modules: dict[str, str]
+    code_changes: str
+    code_generation_errors: list[str]
+    static_analysis_report: dict
+    code_syntax_retries: int
     code_review_comments: str
     code_review_status: str
+    code_review_feedback: str
     security_review_comments: str
     security_review_status: str
     security_review_feedback: str
+    security_review_cache: dict[str, dict]
     test_cases: str
     test_case_review_status: str
     test_case_review_feedback: str
     qa_testing_status: str
     qa_testing_comments: str
+    qa_test_results: dict
     qa_testing_feedback: str
     deployment_status: str
     deployment_feedback: str
@@ -0,0 +1,35 @@
+import json
+from typing import Any, AsyncIterator, Optional
+
+from src.state.sdlc_state import CustomEncoder
+
+# Headers that keep proxies from buffering the event stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+        Formats a single Server-Sent Event frame
+    """
+    payload = json.dumps(data, cls=CustomEncoder)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def stream_graph_events(graph, graph_input: Optional[dict], thread: dict) -> AsyncIterator[tuple[str, Any]]:
+    """
+        Runs the graph and yields (event, data) pairs as soon as they are produced:
+            token   - a chunk of LLM output with the node that produced it
+            update  - the state update returned by a finished node
+    """
+    async for mode, chunk in graph.astream(graph_input, thread, stream_mode=["messages", "updates"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if message.content:
+                yield "token", {"node": metadata.get("langgraph_node"), "content": message.content}
+        else:
+            for node, update in chunk.items():
+                yield "update", {"node": node, "update": update}
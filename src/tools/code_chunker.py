@@ -0,0 +1,89 @@
+import ast
+import hashlib
+
+from pydantic import BaseModel, Field
+
+from src.tools.code_tools import split_modules
+
+# Consecutive small definitions of a file are packed into chunks of about this many lines
+CHUNK_TARGET_LINES = 60
+
+
+class CodeChunk(BaseModel):
+    file: str = Field(..., description="File the chunk belongs to")
+    name: str = Field(..., description="Class / function names in the chunk, or 'module level'")
+    code: str = Field(..., description="Source code of the chunk")
+    start_line: int = Field(1, description="First line of the chunk in its file")
+
+    @property
+    def digest(self) -> str:
+        """ Content hash used to cache per-chunk results """
+        return hashlib.sha256(f"{self.file}\0{self.code}".encode()).hexdigest()
+
+
+def _definition_spans(source: str) -> list[tuple[str, int, int]]:
+    """
+        (name, first line, last line) of the top-level statements, with decorators
+        included. Raises SyntaxError when the source does not parse.
+    """
+    spans = []
+    for node in ast.parse(source).body:
+        start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            name = node.name
+        else:
+            name = "module level"
+        spans.append((name, start, node.end_lineno))
+    return spans
+
+
+def _chunk_file(file: str, source: str, target_lines: int) -> list[CodeChunk]:
+    lines = source.splitlines()
+    try:
+        spans = _definition_spans(source)
+    except SyntaxError:
+        # Fall back to blocks separated by blank lines
+        spans, start = [], None
+        for number, line in enumerate(lines + [""], start=1):
+            if line.strip() and start is None:
+                start = number
+            elif not line.strip() and start is not None:
+                spans.append(("block", start, number - 1))
+                start = None
+
+    # Comments and blank lines before a definition belong to its chunk
+    chunks, names, chunk_start, chunk_end = [], [], None, 0
+    for name, _, end in spans:
+        if chunk_start is not None and end - chunk_start + 1 > target_lines:
+            chunks.append((names, chunk_start, chunk_end))
+            names, chunk_start = [], None
+        if chunk_start is None:
+            chunk_start = chunk_end + 1
+        if name not in names:
+            names.append(name)
+        chunk_end = end
+    if chunk_start is not None:
+        chunks.append((names, chunk_start, len(lines)))
+
+    result = []
+    for names, start, end in chunks:
+        # Leading/trailing blank lines are not part of the chunk
+        while start <= end and not lines[start - 1].strip():
+            start += 1
+        while end >= start and not lines[end - 1].strip():
+            end -= 1
+        if start <= end:
+            result.append(CodeChunk(file=file, name=", ".join(names), code="\n".join(lines[start - 1:end]), start_line=start))
+    return result
+
+
+def chunk_python_code(code: str, target_lines: int = CHUNK_TARGET_LINES) -> list[CodeChunk]:
+    """
+        Splits generated code at file, class and function boundaries (using `ast`
+        when the file parses). Consecutive small definitions are packed together
+        up to `target_lines`; a larger definition is its own chunk.
+    """
+    chunks = []
+    for file, source in split_modules(code).items():
+        chunks.extend(_chunk_file(file, source, target_lines))
+    return chunks
@@ -0,0 +1,37 @@
+import re
+
+_FENCE = re.compile(r"```[ \t]*(?:python|py)?[ \t]*\n(.*?)```", re.DOTALL | re.IGNORECASE)
+_FILE_HEADER = re.compile(r"^# ===== File: (\S+) =====$", re.MULTILINE)
+
+
+def extract_python_code(content: str) -> str:
+    """
+        Returns the code of the fenced code blocks in an LLM response, or the
+        response itself when it has no fences
+    """
+    blocks = _FENCE.findall(content or "")
+    if not blocks:
+        return (content or "").strip()
+    return "\n\n".join(block.strip() for block in blocks)
+
+
+def render_modules(modules: dict[str, str]) -> str:
+    """
+        Renders {file name: code} as one Python code block, each file starting
+        with a `# ===== File: <name> =====` header
+    """
+    files = "\n\n".join(f"# ===== File: {name} =====\n{code.strip()}" for name, code in modules.items())
+    return f"```python\n{files}\n```"
+
+
+def split_modules(code: str) -> dict[str, str]:
+    """ Inverse of `render_modules`; code without file headers is returned as `main.py` """
+    code = extract_python_code(code)
+    headers = list(_FILE_HEADER.finditer(code))
+    if not headers:
+        return {"main.py": code}
+    modules = {}
+    for header, following in zip(headers, headers[1:] + [None]):
+        end = following.start() if following else len(code)
+        modules[header.group(1)] = code[header.end():end].strip()
+    return modules
@@ -0,0 +1,105 @@
+import difflib
+import re
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_DIFF_FENCE = re.compile(r"```[ \t]*(?:diff|patch|udiff)?[ \t]*\n(.*?)```", re.DOTALL | re.IGNORECASE)
+
+
+class PatchConflictError(ValueError):
+    """ Raised when a hunk's context or removed lines do not match the code """
+
+
+def extract_diff(content: str) -> str:
+    """ Returns the unified diff of an LLM response, with or without a code fence """
+    for block in _DIFF_FENCE.findall(content or ""):
+        if "@@" in block:
+            return block
+    return content or ""
+
+
+def parse_hunks(diff: str) -> list[dict]:
+    """
+        Parses the hunks of a unified diff into
+        {"old_start", "old": [lines], "new": [lines]}
+    """
+    hunks, hunk = [], None
+    for line in diff.splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            hunk = {"old_start": int(header.group(1)), "old": [], "new": []}
+            hunks.append(hunk)
+        elif hunk is None or line.startswith(("--- ", "+++ ", "\\")):
+            continue
+        elif line.startswith("-"):
+            hunk["old"].append(line[1:])
+        elif line.startswith("+"):
+            hunk["new"].append(line[1:])
+        elif line.startswith(" ") or line == "":
+            # Context line (some models drop the leading space of empty lines)
+            hunk["old"].append(line[1:])
+            hunk["new"].append(line[1:])
+        else:
+            raise PatchConflictError(f"Malformed diff line: {line!r}")
+    return hunks
+
+
+def _locate(lines: list[str], block: list[str], expected: int, start: int) -> int:
+    """
+        Position of `block` in `lines` at or after `start`: the hunk's own line
+        number when it matches there, otherwise the single match nearest to it.
+        Whitespace at line ends is ignored.
+    """
+    target = [line.rstrip() for line in block]
+    size = len(target)
+    stripped = [line.rstrip() for line in lines]
+    if stripped[expected:expected + size] == target and expected >= start:
+        return expected
+    matches = [
+        position for position in range(start, len(lines) - size + 1)
+        if stripped[position:position + size] == target
+    ]
+    if not matches:
+        raise PatchConflictError(f"Hunk at line {expected + 1} does not match the code")
+    nearest = min(matches, key=lambda position: abs(position - expected))
+    if sum(1 for position in matches if abs(position - expected) == abs(nearest - expected)) > 1:
+        raise PatchConflictError(f"Hunk at line {expected + 1} matches the code in several places")
+    return nearest
+
+
+def apply_unified_diff(original: str, diff: str) -> str:
+    """
+        Applies a unified diff to `original`.
+
+        Hunks are applied in order; a hunk whose line numbers are off is applied
+        where its context matches (only if that match is unambiguous). Raises
+        PatchConflictError when a hunk cannot be placed.
+    """
+    hunks = parse_hunks(diff)
+    if not hunks:
+        raise PatchConflictError("The diff has no hunks")
+
+    lines = original.splitlines()
+    result, cursor, offset = [], 0, 0
+    for hunk in hunks:
+        if not hunk["old"]:
+            # Pure insertion, placed by line number
+            position = max(hunk["old_start"] + offset, cursor)
+            if position > len(lines):
+                raise PatchConflictError(f"Insertion at line {hunk['old_start']} is past the end of the code")
+        else:
+            expected = max(hunk["old_start"] - 1, 0) + offset
+            position = _locate(lines, hunk["old"], expected, cursor)
+            offset = position - max(hunk["old_start"] - 1, 0)
+        result.extend(lines[cursor:position])
+        result.extend(hunk["new"])
+        cursor = position + len(hunk["old"])
+    result.extend(lines[cursor:])
+    return "\n".join(result)
+
+
+def changed_hunks(original: str, patched: str, context: int = 3) -> str:
+    """ Normalized unified diff of the applied change, used to review only what changed """
+    return "\n".join(difflib.unified_diff(
+        original.splitlines(), patched.splitlines(),
+        fromfile="a/code.py", tofile="b/code.py", n=context, lineterm=""
+    ))
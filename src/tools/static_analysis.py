@@ -0,0 +1,254 @@
+import ast
+import builtins
+import os
+import re
+
+from pydantic import BaseModel, Field
+
+from src.tools.code_tools import split_modules
+
+# Functions above this cyclomatic complexity are flagged
+COMPLEXITY_THRESHOLD = int(os.getenv("STATIC_ANALYSIS_MAX_COMPLEXITY", "10"))
+
+# Names assigned a string literal that look like credentials
+_SECRET_NAME = re.compile(r"(password|passwd|secret|api_?key|token|private_?key)", re.IGNORECASE)
+
+_BRANCHES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert, ast.comprehension)
+if hasattr(ast, "match_case"):
+    _BRANCHES += (ast.match_case,)
+
+_MODULE_NAMES = {"__name__", "__file__", "__doc__", "__spec__", "__loader__", "__package__", "__builtins__", "__annotations__"}
+
+
+class Finding(BaseModel):
+    file: str = Field(..., description="File of the finding")
+    line: int = Field(..., description="First line of the flagged region")
+    end_line: int = Field(..., description="Last line of the flagged region")
+    rule: str = Field(..., description="Check that produced the finding")
+    severity: str = Field(..., description="error, warning or info")
+    message: str = Field(..., description="Description of the problem")
+
+
+class AnalysisReport(BaseModel):
+    findings: list[Finding] = Field(default_factory=list)
+    metrics: dict[str, dict] = Field(default_factory=dict, description="Per file: lines, functions, max complexity")
+
+    @property
+    def syntax_errors(self) -> list[Finding]:
+        return [finding for finding in self.findings if finding.rule == "syntax-error"]
+
+    def format_findings(self) -> str:
+        """ One line per finding """
+        return "\n".join(
+            f"- [{finding.severity}] {finding.file}:{finding.line} {finding.rule}: {finding.message}"
+            for finding in sorted(self.findings, key=lambda finding: (finding.file, finding.line))
+        )
+
+    def flagged_regions(self, code: str, context: int = 3, max_lines: int = 40) -> str:
+        """
+            Numbered source lines around the findings, overlapping regions merged.
+            Regions longer than `max_lines` are cut.
+        """
+        modules = split_modules(code)
+        regions = []
+        for file in sorted({finding.file for finding in self.findings}):
+            lines = modules.get(file, "").splitlines()
+            spans = sorted(
+                (max(finding.line - context, 1), min(max(finding.end_line, finding.line) + context, len(lines)))
+                for finding in self.findings if finding.file == file
+            )
+            merged = []
+            for start, end in spans:
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            for start, end in merged:
+                end = min(end, start + max_lines - 1)
+                numbered = "\n".join(f"{number:4d} | {lines[number - 1]}" for number in range(start, end + 1))
+                regions.append(f"{file} lines {start}-{end}:\n{numbered}")
+        return "\n\n".join(regions)
+
+
+def _complexity(function: ast.AST) -> int:
+    """ McCabe cyclomatic complexity of a function, nested functions excluded """
+    complexity = 1
+    nodes = list(ast.iter_child_nodes(function))
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        if isinstance(node, _BRANCHES):
+            complexity += 1
+        elif isinstance(node, ast.BoolOp):
+            complexity += len(node.values) - 1
+        if isinstance(node, ast.comprehension):
+            complexity += len(node.ifs)
+        nodes.extend(ast.iter_child_nodes(node))
+    return complexity
+
+
+def _bound_names(tree: ast.AST) -> set[str]:
+    """ Every name the file binds anywhere (file-level approximation of scoping) """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif hasattr(ast, "MatchAs") and isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif hasattr(ast, "MatchMapping") and isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+    return names
+
+
+def _call_name(node: ast.Call) -> str:
+    """ Dotted name of the called function, e.g. `subprocess.run` """
+    parts = []
+    target = node.func
+    while isinstance(target, ast.Attribute):
+        parts.append(target.attr)
+        target = target.value
+    if isinstance(target, ast.Name):
+        parts.append(target.id)
+    return ".".join(reversed(parts))
+
+
+def _keyword(node: ast.Call, name: str):
+    for keyword in node.keywords:
+        if keyword.arg == name:
+            return keyword.value
+    return None
+
+
+def _is_true(node) -> bool:
+    return isinstance(node, ast.Constant) and node.value is True
+
+
+def _security_findings(file: str, tree: ast.AST) -> list[Finding]:
+    findings = []
+
+    def flag(node, rule, message, severity="warning"):
+        findings.append(Finding(
+            file=file, line=node.lineno, end_line=getattr(node, "end_lineno", node.lineno),
+            rule=rule, severity=severity, message=message
+        ))
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            name = _call_name(node)
+            if name in ("eval", "exec"):
+                flag(node, "dangerous-eval", f"`{name}` executes arbitrary code")
+            elif name in ("os.system", "os.popen"):
+                flag(node, "shell-command", f"`{name}` runs a shell command")
+            elif name.startswith("subprocess.") and _is_true(_keyword(node, "shell")):
+                flag(node, "shell-command", f"`{name}` with shell=True is open to shell injection")
+            elif name in ("pickle.load", "pickle.loads", "marshal.loads", "shelve.open"):
+                flag(node, "unsafe-deserialization", f"`{name}` can execute code from untrusted data")
+            elif name == "yaml.load" and _keyword(node, "Loader") is None:
+                flag(node, "unsafe-deserialization", "`yaml.load` without a safe Loader")
+            elif name in ("hashlib.md5", "hashlib.sha1"):
+                flag(node, "weak-hash", f"`{name}` is not suitable for passwords or signatures", "info")
+            elif name == "tempfile.mktemp":
+                flag(node, "insecure-tempfile", "`tempfile.mktemp` is race-prone, use mkstemp / NamedTemporaryFile")
+            elif _keyword(node, "verify") is not None and isinstance(_keyword(node, "verify"), ast.Constant) and _keyword(node, "verify").value is False:
+                flag(node, "tls-verification-disabled", f"`{name}` with verify=False")
+            elif name.endswith(".run") and _is_true(_keyword(node, "debug")):
+                flag(node, "debug-enabled", "Application started with debug=True", "info")
+            elif name.endswith((".execute", ".executemany")) and node.args:
+                query = node.args[0]
+                formatted = isinstance(query, ast.JoinedStr) or (
+                    isinstance(query, ast.BinOp) and isinstance(query.op, (ast.Mod, ast.Add))
+                ) or (isinstance(query, ast.Call) and _call_name(query).endswith(".format"))
+                if formatted:
+                    flag(node, "sql-injection", "SQL query built with string formatting, use query parameters", "error")
+        elif isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str) and node.value.value:
+            for target in node.targets:
+                if isinstance(target, ast.Name) and _SECRET_NAME.search(target.id):
+                    flag(node, "hardcoded-secret", f"`{target.id}` is assigned a hard-coded value")
+    return findings
+
+
+def analyze_file(file: str, source: str) -> tuple[list[Finding], dict]:
+    """ Runs every check on one file """
+    lines = source.count("\n") + 1
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        line = e.lineno or 1
+        finding = Finding(file=file, line=line, end_line=line, rule="syntax-error", severity="error", message=e.msg)
+        return [finding], {"lines": lines, "parses": False}
+
+    findings = []
+
+    # Undefined names (skipped when a star import makes the names unknowable)
+    star_import = any(isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names) for node in ast.walk(tree))
+    if not star_import:
+        known = _bound_names(tree) | set(dir(builtins)) | _MODULE_NAMES
+        reported = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in known and node.id not in reported:
+                reported.add(node.id)
+                findings.append(Finding(
+                    file=file, line=node.lineno, end_line=node.lineno, rule="undefined-name",
+                    severity="error", message=f"`{node.id}` is used but never defined or imported"
+                ))
+
+    # Unused imports
+    used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+    exported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and target.id == "__all__" for target in node.targets):
+            exported.update(element.value for element in getattr(node.value, "elts", []) if isinstance(element, ast.Constant))
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+                continue
+            for alias in node.names:
+                name = (alias.asname or alias.name).split(".")[0]
+                if alias.name != "*" and name not in used and name not in exported:
+                    findings.append(Finding(
+                        file=file, line=node.lineno, end_line=node.lineno, rule="unused-import",
+                        severity="info", message=f"`{alias.name}` is imported but never used"
+                    ))
+
+    # Complexity
+    functions = [node for node in ast.walk(tree) if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    complexities = {}
+    for function in functions:
+        complexity = _complexity(function)
+        complexities[function.name] = complexity
+        if complexity > COMPLEXITY_THRESHOLD:
+            findings.append(Finding(
+                file=file, line=function.lineno, end_line=function.lineno, rule="high-complexity",
+                severity="warning", message=f"`{function.name}` has cyclomatic complexity {complexity} (> {COMPLEXITY_THRESHOLD})"
+            ))
+
+    findings.extend(_security_findings(file, tree))
+    metrics = {
+        "lines": lines,
+        "parses": True,
+        "functions": len(functions),
+        "classes": sum(1 for node in ast.walk(tree) if isinstance(node, ast.ClassDef)),
+        "max_complexity": max(complexities.values(), default=0),
+    }
+    return findings, metrics
+
+
+def analyze_code(code: str) -> AnalysisReport:
+    """ Static analysis of the generated code (every file of a multi-module generation) """
+    report = AnalysisReport()
+    for file, source in split_modules(code).items():
+        findings, metrics = analyze_file(file, source)
+        report.findings.extend(findings)
+        report.metrics[file] = metrics
+    return report
@@ -0,0 +1,257 @@
+import ast
+import asyncio
+import multiprocessing
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from src.tools.code_tools import extract_python_code, split_modules
+
+# Limits of one test run
+TEST_TIMEOUT_SECONDS = int(os.getenv("QA_TEST_TIMEOUT", "60"))
+TEST_CPU_SECONDS = int(os.getenv("QA_TEST_CPU_SECONDS", "30"))
+TEST_MEMORY_MB = int(os.getenv("QA_TEST_MEMORY_MB", "512"))
+
+# Module written for the generated test cases
+TEST_MODULE = "test_generated"
+
+# Started instead of `python -m unittest` so networking is disabled before any test code runs
+BOOTSTRAP = '''
+import socket
+import sys
+import unittest
+
+
+def _network_disabled(*args, **kwargs):
+    raise OSError("Network access is disabled in the QA sandbox")
+
+
+for _name in ("connect", "connect_ex", "bind", "sendto", "sendmsg"):
+    setattr(socket.socket, _name, _network_disabled)
+socket.create_connection = _network_disabled
+socket.getaddrinfo = _network_disabled
+
+unittest.main(module=None, argv=["unittest", "-v", sys.argv[1]])
+'''
+
+_RESULT_LINE = re.compile(
+    r"^(?P<name>\w+) \((?P<id>[\w.]+)\)(?:\n(?:.*\n)*?.*?)? \.\.\. "
+    r"(?P<status>ok|FAIL|ERROR|skipped.*|expected failure|unexpected success)$",
+    re.MULTILINE,
+)
+_RUNNING_LINE = re.compile(r"^(?P<name>\w+) \((?P<id>[\w.]+)\)[^\n]*\.\.\. ?\Z", re.MULTILINE)
+_DETAIL_HEADER = re.compile(r"^=+\n(?P<kind>FAIL|ERROR): (?P<name>\w+) \((?P<id>[\w.]+)\)\n", re.MULTILINE)
+_STATUSES = {"ok": "pass", "FAIL": "fail", "ERROR": "error", "expected failure": "pass", "unexpected success": "fail"}
+
+
+class TestOutcome(BaseModel):
+    name: str = Field(..., description="Test method name")
+    test_id: str = Field(..., description="Dotted id of the test")
+    status: str = Field(..., description="pass, fail, error or skipped")
+    details: str = Field("", description="Traceback of a failed test")
+
+
+class TestRunResult(BaseModel):
+    outcomes: list[TestOutcome] = Field(default_factory=list)
+    returncode: Optional[int] = None
+    timed_out: bool = False
+    duration: float = 0.0
+    output: str = Field("", description="Tail of the unittest output")
+
+    @property
+    def failures(self) -> list[TestOutcome]:
+        return [outcome for outcome in self.outcomes if outcome.status in ("fail", "error")]
+
+    def summary(self) -> dict:
+        counts = {status: 0 for status in ("pass", "fail", "error", "skipped")}
+        for outcome in self.outcomes:
+            counts[outcome.status] += 1
+        return {"total": len(self.outcomes), **counts, "timed_out": self.timed_out, "duration": round(self.duration, 2)}
+
+
+def _imported_modules(source: str) -> set[str]:
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return set()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module.split(".")[0])
+    return names
+
+
+def write_workspace(directory: str, code_generated: str, test_cases: str) -> list[str]:
+    """
+        Writes the generated modules, the tests and the bootstrap script. Modules the
+        tests import that were not generated under that name (e.g. `from app import ...`
+        for a single generated file) are written as aliases re-exporting the generated code.
+    """
+    modules = split_modules(code_generated)
+    tests = extract_python_code(test_cases)
+    files = {name: code for name, code in modules.items() if name.endswith(".py")}
+    generated = {name[:-3] for name in files}
+
+    unknown = _imported_modules(tests) - generated - set(sys.stdlib_module_names) - {TEST_MODULE}
+    aliases = [name for name in unknown if not _is_installed(name)]
+    alias_code = "\n".join(f"from {module} import *" for module in sorted(generated) if module.isidentifier())
+    for name in aliases:
+        files[f"{name}.py"] = alias_code
+
+    files[f"{TEST_MODULE}.py"] = tests
+    files["sandbox_bootstrap.py"] = BOOTSTRAP
+    for name, code in files.items():
+        with open(os.path.join(directory, os.path.basename(name)), "w") as file:
+            file.write(code)
+    return sorted(files)
+
+
+def _is_installed(module: str) -> bool:
+    """ Whether an installed distribution provides the top-level module """
+    from importlib.metadata import packages_distributions
+    return module in packages_distributions()
+
+
+def _limit_resources(cpu_seconds: int, memory_mb: int):
+    """ Runs in the test process before exec """
+    import resource
+    os.setsid()
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+    memory = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    # No core dumps and at most 10 MB per written file
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (10 * 1024 * 1024, 10 * 1024 * 1024))
+
+
+def parse_unittest_output(output: str) -> list[TestOutcome]:
+    """ Per-test results of `unittest -v` output """
+    details = {}
+    headers = list(_DETAIL_HEADER.finditer(output))
+    for header, following in zip(headers, headers[1:] + [None]):
+        end = following.start() if following else len(output)
+        body = output[header.end():end]
+        body = re.split(r"^-{20,}\nRan \d+ tests?", body, flags=re.MULTILINE)[0]
+        details[(header.group("name"), header.group("id"))] = body.strip().lstrip("-").strip()
+
+    outcomes = []
+    for match in _RESULT_LINE.finditer(output):
+        status = match.group("status")
+        outcomes.append(TestOutcome(
+            name=match.group("name"),
+            test_id=match.group("id"),
+            status="skipped" if status.startswith("skipped") else _STATUSES[status],
+            details=details.get((match.group("name"), match.group("id")), ""),
+        ))
+
+    # Errors raised while loading the module are reported without a result line
+    reported = {(outcome.name, outcome.test_id) for outcome in outcomes}
+    for (name, test_id), traceback in details.items():
+        if (name, test_id) not in reported:
+            outcomes.append(TestOutcome(name=name, test_id=test_id, status="error", details=traceback))
+    return outcomes
+
+
+def run_tests(code_generated: str, test_cases: str, timeout: int, cpu_seconds: int, memory_mb: int) -> dict:
+    """
+        Runs the generated tests in a fresh interpreter inside a temporary workspace,
+        with CPU, memory and wall-clock limits, networking disabled and an empty
+        environment. Executed in a process pool worker.
+    """
+    with tempfile.TemporaryDirectory(prefix="sdlc-qa-") as workspace:
+        write_workspace(workspace, code_generated, test_cases)
+        started = time.monotonic()
+        preexec = (lambda: _limit_resources(cpu_seconds, memory_mb)) if os.name == "posix" else None
+        process = subprocess.Popen(
+            [sys.executable, "-E", "-s", "sandbox_bootstrap.py", TEST_MODULE],
+            cwd=workspace,
+            env={"PATH": os.defpath, "HOME": workspace, "PYTHONDONTWRITEBYTECODE": "1", "PYTHONHASHSEED": "0"},
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            preexec_fn=preexec,
+        )
+        timed_out = False
+        try:
+            output, _ = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+            output, _ = process.communicate()
+        output = output.decode(errors="replace")
+
+    outcomes = parse_unittest_output(output)
+    if timed_out or (process.returncode or 0) < 0:
+        # The test that was running when the process was killed
+        running = _RUNNING_LINE.search(output)
+        reason = f"Timed out after {timeout}s" if timed_out else f"Killed by signal {-process.returncode} (CPU or memory limit)"
+        if running:
+            outcomes.append(TestOutcome(name=running.group("name"), test_id=running.group("id"), status="error", details=reason))
+        else:
+            outcomes.append(TestOutcome(name=TEST_MODULE, test_id=TEST_MODULE, status="error", details=reason))
+
+    result = TestRunResult(
+        outcomes=outcomes,
+        returncode=process.returncode,
+        timed_out=timed_out,
+        duration=time.monotonic() - started,
+        output=output[-4000:],
+    )
+    return result.model_dump()
+
+
+class TestSandbox:
+    """
+        Executes generated unittest suites in a local process pool.
+
+        Each run gets its own temporary workspace and interpreter; the pool bounds how
+        many suites run at once and keeps the blocking work off the event loop.
+        Networking is disabled at the socket level of the test interpreter, which stops
+        accidental network use; it is not an OS-level isolation boundary.
+    """
+
+    def __init__(
+        self,
+        workers: int = int(os.getenv("QA_SANDBOX_WORKERS", "2")),
+        timeout: int = TEST_TIMEOUT_SECONDS,
+        cpu_seconds: int = TEST_CPU_SECONDS,
+        memory_mb: int = TEST_MEMORY_MB,
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: never fork the event loop and its threads
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def run(self, code_generated: str, test_cases: str) -> TestRunResult:
+        """ Runs the tests against the code and returns the per-test results """
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self._pool(), run_tests, code_generated, test_cases, self.timeout, self.cpu_seconds, self.memory_mb
+        )
+        return TestRunResult(**result)
+
+    def shutdown(self):
+        """ Stops the pool workers """
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,125 @@
+import pytest
+
+from src.tools.patch_tool import PatchConflictError, apply_unified_diff, changed_hunks, extract_diff, parse_hunks
+
+CODE = """import os
+
+
+def add(a, b):
+    return a + b
+
+
+def sub(a, b):
+    return a - b
+
+
+def main():
+    print(add(2, 3))"""
+
+
+def test_exact_apply():
+    diff = """--- a/code.py
++++ b/code.py
+@@ -4,2 +4,3 @@
+ def add(a, b):
++    \"\"\" Adds two numbers \"\"\"
+     return a + b
+"""
+    patched = apply_unified_diff(CODE, diff)
+
+    assert patched == CODE.replace("def add(a, b):\n", "def add(a, b):\n    \"\"\" Adds two numbers \"\"\"\n")
+
+
+def test_several_hunks_shift_the_following_line_numbers():
+    diff = """@@ -1,1 +1,2 @@
+ import os
++import sys
+@@ -8,2 +9,2 @@
+ def sub(a, b):
+-    return a - b
++    return b - a
+"""
+    patched = apply_unified_diff(CODE, diff).splitlines()
+
+    assert patched[:2] == ["import os", "import sys"]
+    assert patched[patched.index("def sub(a, b):") + 1] == "    return b - a"
+
+
+def test_hunk_with_wrong_line_numbers_is_relocated_by_its_context():
+    diff = """@@ -20,2 +20,2 @@
+ def sub(a, b):
+-    return a - b
++    return abs(a - b)
+"""
+    patched = apply_unified_diff(CODE, diff)
+
+    assert "    return abs(a - b)" in patched
+    assert "    return a - b" not in patched
+
+
+def test_trailing_whitespace_and_missing_context_space_are_tolerated():
+    diff = "@@ -4,3 +4,3 @@\n def add(a, b):   \n-    return a + b\n+    return b + a\n\n"
+    patched = apply_unified_diff(CODE, diff)
+
+    assert "    return b + a" in patched
+
+
+def test_ambiguous_location_is_rejected():
+    code = "x = 1\nprint(x)\ny = 2\nprint(x)"
+    # Line 3 does not hold the removed line, which matches one line above and one below
+    diff = """@@ -3,1 +3,1 @@
+-print(x)
++print(x + 1)
+"""
+    with pytest.raises(PatchConflictError, match="several places"):
+        apply_unified_diff(code, diff)
+
+
+def test_context_that_does_not_match_is_a_conflict():
+    diff = """@@ -4,2 +4,2 @@
+ def multiply(a, b):
+-    return a * b
++    return b * a
+"""
+    with pytest.raises(PatchConflictError, match="does not match"):
+        apply_unified_diff(CODE, diff)
+
+
+def test_malformed_hunk_line_is_an_error():
+    diff = """@@ -4,2 +4,2 @@
+ def add(a, b):
+*    return a + b
+"""
+    with pytest.raises(PatchConflictError, match="Malformed diff line"):
+        parse_hunks(diff)
+
+
+def test_diff_without_hunks_is_an_error():
+    with pytest.raises(PatchConflictError, match="no hunks"):
+        apply_unified_diff(CODE, "I changed the add function.")
+
+
+def test_pure_insertion_is_placed_by_line_number():
+    diff = """@@ -13,0 +14,3 @@
++
++
++main()
+"""
+    assert apply_unified_diff(CODE, diff).endswith("    print(add(2, 3))\n\n\nmain()")
+
+
+def test_insertion_past_the_end_is_a_conflict():
+    with pytest.raises(PatchConflictError, match="past the end"):
+        apply_unified_diff(CODE, "@@ -40,0 +41,1 @@\n+main()\n")
+
+
+def test_extract_diff_from_a_fenced_response():
+    response = "Here is the fix:\n```diff\n@@ -1,1 +1,1 @@\n-a\n+b\n```\nDone."
+
+    assert extract_diff(response) == "@@ -1,1 +1,1 @@\n-a\n+b\n"
+
+
+def test_changed_hunks_round_trips_through_apply():
+    patched = CODE.replace("return a - b", "return b - a")
+
+    assert apply_unified_diff(CODE, changed_hunks(CODE, patched)) == patched
@@ -0,0 +1,78 @@
+from src.context.section_index import SectionIndex, split_sections, tokenize
+
+FUNCTIONAL = """# Functional Design
+
+Overview of the movie booking platform.
+
+## 1. Seat Selection
+Customers pick seats on the theater map. Selected seats are held for ten minutes.
+
+## 2. Payments
+Customers pay by card or wallet. A payment receipt is emailed after checkout.
+
+## 3. Notifications
+Reminder emails are sent before the show starts.
+"""
+
+TECHNICAL = """# Technical Design
+
+## 1. System Architecture
+A FastAPI service in front of a PostgreSQL database.
+
+## 2. Payment Gateway Integration
+The payment gateway client retries declined card payments once.
+"""
+
+
+def build_index() -> SectionIndex:
+    return SectionIndex.from_documents({"functional": FUNCTIONAL, "technical": TECHNICAL})
+
+
+def test_split_sections_keeps_the_preamble_and_every_heading():
+    sections = split_sections(FUNCTIONAL, "functional")
+
+    assert [section.heading for section in sections] == ["", "1. Seat Selection", "2. Payments", "3. Notifications"]
+    assert sections[1].content.startswith("## 1. Seat Selection")
+    assert all(section.source == "functional" for section in sections)
+
+
+def test_tokenize_drops_stop_words_and_stems():
+    assert tokenize("The users are selecting seats") == ["select", "seat"]
+
+
+def test_search_ranks_the_matching_section_first():
+    index = build_index()
+
+    assert index.search("pay for the booking with a card", k=1)[0].heading == "2. Payments"
+    assert index.search("choose seats", k=1)[0].heading == "1. Seat Selection"
+
+
+def test_search_can_be_restricted_to_one_document():
+    index = build_index()
+
+    results = index.search("card payments", k=3, source="technical")
+
+    assert [section.heading for section in results] == ["2. Payment Gateway Integration"]
+
+
+def test_search_ignores_sections_without_matching_terms():
+    assert build_index().search("kubernetes") == []
+
+
+def test_retrieve_returns_the_union_in_document_order():
+    index = build_index()
+
+    results = index.retrieve(["reminder emails", "seat map"], k=1, source="functional")
+
+    assert [section.heading for section in results] == ["1. Seat Selection", "3. Notifications"]
+
+
+def test_dict_round_trip_preserves_sections_and_scores():
+    index = build_index()
+
+    restored = SectionIndex.from_dict(index.to_dict())
+
+    assert restored.to_dict() == index.to_dict()
+    assert restored.sections == index.sections
+    for query in ("card payments", "seat selection", "database architecture"):
+        assert restored.score(query) == index.score(query)
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from src.cache.state_codec import (
+    FORMAT_VERSION, HEADER_SIZE, MAGIC, Compressor, JsonCodec, MsgpackCodec, StateSerializer,
+    ZlibCompressor, ZstdCompressor,
+)
+from src.state.sdlc_state import DesignDocument, UserStories
+
+STATE = {
+    "project_name": "Shop",
+    "requirements": ["Browse the catalog", "Pay for the order"],
+    "user_stories": [UserStories(id=1, title="Browse", description="As a user I browse", status="To Do")],
+    "design_documents": DesignDocument(functional="# Functional\n" + "text " * 500, technical="# Technical"),
+    "progress": 10,
+    "next_required_input": None,
+}
+
+PLAIN_STATE = {
+    **STATE,
+    "user_stories": [{"id": 1, "title": "Browse", "description": "As a user I browse", "status": "To Do"}],
+    "design_documents": {"functional": "# Functional\n" + "text " * 500, "technical": "# Technical", "review_status": "", "feedback_reason": ""},
+}
+
+
+def codecs():
+    available = [JsonCodec()]
+    try:
+        available.append(MsgpackCodec())
+    except ImportError:
+        pass
+    return available
+
+
+def compressors():
+    available = [Compressor(), ZlibCompressor()]
+    try:
+        available.append(ZstdCompressor())
+    except ImportError:
+        pass
+    return available
+
+
+@pytest.mark.parametrize("codec", codecs(), ids=lambda codec: codec.name)
+@pytest.mark.parametrize("compressor", compressors(), ids=lambda compressor: compressor.name)
+def test_round_trip(codec, compressor):
+    serializer = StateSerializer(codec=codec, compressor=compressor)
+
+    assert serializer.decode(serializer.encode(STATE)) == PLAIN_STATE
+
+
+def test_round_trip_of_a_single_field():
+    serializer = StateSerializer()
+
+    assert serializer.decode(serializer.encode("code")) == "code"
+    assert serializer.decode(serializer.encode(STATE["user_stories"])) == PLAIN_STATE["user_stories"]
+
+
+def test_header_records_version_codec_and_compression():
+    serializer = StateSerializer(codec=JsonCodec(), compressor=ZlibCompressor(), threshold=100)
+
+    data = serializer.encode(STATE)
+
+    assert data[:len(MAGIC)] == MAGIC
+    assert list(data[len(MAGIC):HEADER_SIZE]) == [FORMAT_VERSION, JsonCodec.codec_id, ZlibCompressor.compression_id]
+
+
+def test_small_payloads_are_not_compressed():
+    serializer = StateSerializer(codec=JsonCodec(), compressor=ZlibCompressor(), threshold=1024)
+
+    data = serializer.encode({"progress": 10})
+
+    assert data[HEADER_SIZE - 1] == Compressor.compression_id
+    assert json.loads(data[HEADER_SIZE:]) == {"progress": 10}
+
+
+def test_reads_payloads_written_by_another_codec():
+    written = StateSerializer(codec=JsonCodec(), compressor=ZlibCompressor(), threshold=0).encode(STATE)
+
+    assert StateSerializer(compressor=Compressor()).decode(written) == PLAIN_STATE
+
+
+def test_rejects_newer_format_versions():
+    data = bytearray(StateSerializer().encode(STATE))
+    data[len(MAGIC)] = FORMAT_VERSION + 1
+
+    with pytest.raises(ValueError, match="Unsupported state format version"):
+        StateSerializer().decode(bytes(data))
+
+
+def test_legacy_json_snapshot_is_migrated():
+    legacy = json.dumps([PLAIN_STATE, ["next"], {"configurable": {"thread_id": "t"}}]).encode()
+
+    assert StateSerializer().decode(legacy) == PLAIN_STATE
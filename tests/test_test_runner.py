@@ -0,0 +1,175 @@
+import subprocess
+import sys
+import textwrap
+
+from src.tools.test_runner import parse_unittest_output, run_tests
+
+CODE = '''```python
+def add(a, b):
+    return a + b
+```'''
+
+SUITE = """
+import unittest
+
+from main import add
+
+
+class TestAdd(unittest.TestCase):
+    def test_ok(self):
+        self.assertEqual(add(2, 3), 5)
+
+    def test_fail(self):
+        self.assertEqual(add(2, 2), 5)
+
+    def test_error(self):
+        add(1)
+
+    @unittest.skip("not implemented")
+    def test_skipped(self):
+        pass
+
+    @unittest.expectedFailure
+    def test_expected_failure(self):
+        self.assertEqual(add(1, 1), 3)
+
+    def test_with_docstring(self):
+        ''' Adds negative numbers '''
+        self.assertEqual(add(-1, 1), 0)
+"""
+
+TESTS = f"```python{SUITE}```"
+
+EXPECTED = {
+    "test_ok": "pass",
+    "test_fail": "fail",
+    "test_error": "error",
+    "test_skipped": "skipped",
+    "test_expected_failure": "pass",
+    "test_with_docstring": "pass",
+}
+
+
+def unittest_output(tmp_path, source: str) -> str:
+    """ `unittest -v` output of a real run of `source` """
+    (tmp_path / "test_sample.py").write_text(textwrap.dedent(source))
+    process = subprocess.run(
+        [sys.executable, "-m", "unittest", "-v", "test_sample"],
+        cwd=tmp_path, capture_output=True, text=True,
+    )
+    return process.stderr
+
+
+def statuses(outcomes) -> dict:
+    return {outcome.name: outcome.status for outcome in outcomes}
+
+
+def test_parses_every_status_of_a_real_run(tmp_path):
+    (tmp_path / "main.py").write_text("def add(a, b):\n    return a + b\n")
+    output = unittest_output(tmp_path, SUITE)
+
+    outcomes = parse_unittest_output(output)
+
+    assert statuses(outcomes) == EXPECTED
+    details = {outcome.name: outcome.details for outcome in outcomes}
+    assert "AssertionError: 4 != 5" in details["test_fail"]
+    assert "TypeError" in details["test_error"]
+    assert details["test_ok"] == ""
+
+
+def test_ids_include_the_module_and_class(tmp_path):
+    output = unittest_output(tmp_path, """
+        import unittest
+
+        class TestSample(unittest.TestCase):
+            def test_one(self):
+                pass
+    """)
+
+    [outcome] = parse_unittest_output(output)
+
+    assert outcome.test_id.startswith("test_sample.TestSample")
+
+
+def test_import_error_is_reported_without_a_result_line(tmp_path):
+    output = unittest_output(tmp_path, "import missing_module\n")
+
+    [outcome] = parse_unittest_output(output)
+
+    assert outcome.status == "error"
+    assert "missing_module" in outcome.details
+
+
+def test_sample_output():
+    output = textwrap.dedent("""\
+        test_a (test_generated.TestA.test_a) ... ok
+        test_b (test_generated.TestA.test_b) ... FAIL
+        test_c (test_generated.TestA.test_c) ... skipped 'later'
+
+        ======================================================================
+        FAIL: test_b (test_generated.TestA.test_b)
+        ----------------------------------------------------------------------
+        Traceback (most recent call last):
+          File "test_generated.py", line 9, in test_b
+            self.assertTrue(False)
+        AssertionError: False is not true
+
+        ----------------------------------------------------------------------
+        Ran 3 tests in 0.001s
+
+        FAILED (failures=1, skipped=1)
+        """)
+
+    outcomes = parse_unittest_output(output)
+
+    assert statuses(outcomes) == {"test_a": "pass", "test_b": "fail", "test_c": "skipped"}
+    assert outcomes[1].details.startswith("Traceback")
+    assert outcomes[1].details.endswith("AssertionError: False is not true")
+
+
+def test_sandbox_run_reports_every_status():
+    result = run_tests(CODE, TESTS, timeout=30, cpu_seconds=10, memory_mb=512)
+
+    assert not result["timed_out"]
+    assert {outcome["name"]: outcome["status"] for outcome in result["outcomes"]} == EXPECTED
+
+
+def test_timeout_blames_the_running_test():
+    tests = '''```python
+import time
+import unittest
+
+
+class TestSlow(unittest.TestCase):
+    def test_fast(self):
+        pass
+
+    def test_hangs(self):
+        time.sleep(30)
+```'''
+    result = run_tests(CODE, tests, timeout=2, cpu_seconds=10, memory_mb=512)
+
+    outcomes = {outcome["name"]: outcome for outcome in result["outcomes"]}
+    assert result["timed_out"]
+    assert outcomes["test_fast"]["status"] == "pass"
+    assert outcomes["test_hangs"]["status"] == "error"
+    assert outcomes["test_hangs"]["details"] == "Timed out after 2s"
+
+
+def test_crash_blames_the_running_test():
+    tests = '''```python
+import os
+import unittest
+
+
+class TestCrash(unittest.TestCase):
+    def test_crashes(self):
+        os.abort()
+```'''
+    result = run_tests(CODE, tests, timeout=30, cpu_seconds=10, memory_mb=512)
+
+    [outcome] = result["outcomes"]
+    assert result["returncode"] < 0
+    assert outcome["name"] == "test_crashes"
+    assert outcome["status"] == "error"
+    assert outcome["details"].startswith("Killed by signal")